@@ -4,27 +4,51 @@ WarmbOS - Modular Flask Application
 Minimal main file that imports organized modules
 """
 
+import time
+
+# Taken before any other import so the startup log includes import time
+STARTED = time.perf_counter()
+
 from flask import Flask
 from flask_cors import CORS
 import os
 import sys
 import argparse
+import importlib.util
+import threading
 
 # Import our modular components
 from routes.static_routes import setup_static_routes
-from routes.api_routes import setup_api_routes
-from services.icon_manager import IconManager
+from routes.api_routes import setup_api_routes, start_background_services, icon_assets, icon_manager
+from routes.static_routes import static_assets, frontend_bundler, config_database, settings_store, shortcuts_store, shortcut_prober, prepare_wallpapers
+from routes.health_routes import setup_health_routes
+from routes.metrics_routes import setup_metrics_routes
+from services.instrumentation import StartupTimer
 from utils.system_utils import create_default_files
 
+startup = StartupTimer(STARTED)
+startup.mark('imports')
+
+# Seconds to wait before re-checking the icon tree, so the scan does not
+# compete with the first page loads after a restart
+ICON_PREPARE_DELAY = 5
+
 def create_app():
     """Application factory pattern"""
-    app = Flask(__name__, static_folder='.')
+    # Files are served by serve_file, which refuses server code and state
+    app = Flask(__name__, static_folder=None)
     CORS(app)
     
-    # Setup route modules
+    # Setup route modules; metrics first so its hooks time every request
+    setup_metrics_routes(app)
+    setup_health_routes(app)
     setup_static_routes(app)
     setup_api_routes(app)
     
+    # Small documents; loading them here is what /readyz reports as config
+    settings_store.get()
+    shortcuts_store.get()
+    
     return app
 
 def init_application():
@@ -34,18 +58,94 @@ def init_application():
     # Create default configuration files
     create_default_files()
     
-    # Initialize icon manager and sync if needed
-    icon_manager = IconManager()
-    status = icon_manager.get_status()
+    # Found without importing it, which would slow startup
+    if importlib.util.find_spec('PIL') is None:
+        print("Warning: Pillow is not installed; PNG icons are served unresized, "
+              "icon bundles have no PNG atlas and wallpapers are not downscaled. "
+              "Run: pip install -r requirements.txt")
+    
+    # The JSON files become the default profile the first time the database is used
+    if config_database is not None:
+        config_database.import_json('default', {
+            'settings': 'settings.json',
+            'shortcuts': 'shortcuts.json'
+        })
     
-    if not status['icons_dir_exists'] or not status['manifest_exists']:
-        print("Icons not found, syncing on startup...")
-        import threading
-        thread = threading.Thread(target=icon_manager.sync_icons)
+    # Precompute ETags and compressed variants for frontend assets and SVG icons
+    static_assets.warm_in_background(('js', 'css', 'apps', 'components'))
+    icon_assets.warm_in_background(('svg',))
+    if frontend_bundler is not None:
+        threading.Thread(target=frontend_bundler.warm, daemon=True).start()
+    
+    # Downscaled wallpapers, e.g. for a backgroundImage set before they existed
+    prepare_wallpapers()
+    
+    # Existence checks only; the catalog is mapped on the first icon request.
+    # A missing tree is synced by start_background_services, in a serving
+    # process, since this may run in the gunicorn master.
+    if icon_manager.ICONS_DIR.exists() and icon_manager.MANIFEST_FILE.exists():
+        # Trees from before the icon store (e.g. from a git checkout) are
+        # adopted, under the same cross-process lock as a sync
+        thread = threading.Timer(ICON_PREPARE_DELAY, icon_manager.prepare_icons)
         thread.daemon = True
         thread.start()
 
-def install_systemd_service(port=5000):
+def run_production(host, port, workers=2, threads=4, preload=False):
+    """Run WarmbOS under gunicorn with multiple worker processes (Linux/macOS only)
+    
+    init_application runs once in the master before any worker is forked.
+    SIGHUP to the master replaces the workers gracefully, but they fork
+    from code the master has already imported; new code needs a restart.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("Production mode requires gunicorn: pip install gunicorn")
+        sys.exit(1)
+    
+    class WarmbOSApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            app = create_app()
+            startup.mark('app')
+            return app
+    
+    def on_starting(server):
+        init_application()
+        startup.mark('init')
+    
+    def when_ready(server):
+        startup.report()
+    
+    def post_fork(server, worker):
+        start_background_services()
+        shortcut_prober.start()
+    
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        # Threaded workers keep live metric streams from tying up a process each
+        'worker_class': 'gthread',
+        'threads': threads,
+        'preload_app': preload,
+        'graceful_timeout': 30,
+        'on_starting': on_starting,
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+    }
+    
+    print(f"Production mode: {workers} workers x {threads} threads"
+          f"{', preloaded' if preload else ''}")
+    WarmbOSApplication(options).run()
+
+def install_systemd_service(port=5000, workers=2, threads=4):
     """Install WarmbOS as a systemd service (Linux only)"""
     import getpass
     import subprocess
@@ -67,7 +167,8 @@ Group={current_user}
 WorkingDirectory={working_dir}
 Environment=PATH={os.path.dirname(python_path)}
 Environment=PORT={port}
-ExecStart={python_path} {os.path.join(working_dir, 'app.py')} --port {port}
+ExecStart={python_path} {os.path.join(working_dir, 'app.py')} --port {port} --production --workers {workers} --threads {threads} --preload
+ExecReload=/bin/kill -HUP $MAINPID
 Restart=always
 RestartSec=3
 StandardOutput=journal
@@ -104,6 +205,7 @@ WantedBy=multi-user.target
         print("  sudo systemctl stop warmbos     # Stop service")
         print("  sudo systemctl start warmbos    # Start service")
         print("  sudo systemctl restart warmbos  # Restart service")
+        print("  sudo systemctl reload warmbos   # Replace workers gracefully (restart to load new code)")
         
     except Exception as e:
         print(f"Failed to install service: {e}")
@@ -115,18 +217,32 @@ if __name__ == '__main__':
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind to (default: 0.0.0.0)')
     parser.add_argument('--debug', action='store_true', help='Run in debug mode')
     parser.add_argument('--install-service', action='store_true', help='Install as systemd service (Linux only)')
+    parser.add_argument('--production', action='store_true', help='Serve with gunicorn worker processes instead of the development server')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes in production mode (default: 2)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker in production mode (default: 4)')
+    parser.add_argument('--preload', action='store_true', help='Load the app in the master before forking workers (production mode)')
     
     args = parser.parse_args()
     
     if args.install_service:
-        install_systemd_service(args.port)
+        install_systemd_service(args.port, args.workers, args.threads)
         sys.exit(0)
     
     print(f"Starting WarmbOS on http://{args.host}:{args.port}")
     
+    if args.production:
+        run_production(args.host, args.port, args.workers, args.threads, args.preload)
+        sys.exit(0)
+    
     # Initialize application
     init_application()
+    startup.mark('init')
     
     # Create and run app
     app = create_app()
+    startup.mark('app')
+    start_background_services()
+    shortcut_prober.start()
+    startup.mark('background')
+    startup.report()
     app.run(host=args.host, port=args.port, debug=args.debug)
\ No newline at end of file
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Categorization benchmark for WarmbOS
+Compares the compiled IconCategorizer against the original per-keyword loop
+
+Run from the project root: python benchmarks/categorize_benchmark.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.icon_categorizer import IconCategorizer
+from services.icon_manager import IconManager
+
+def legacy_categorize(filename, categories):
+    """The original first-match loop over every category and keyword"""
+    name_lower = filename.lower()
+    for category, keywords in categories.items():
+        if any(keyword in name_lower for keyword in keywords):
+            return category
+    return "misc"
+
+def load_names(manager):
+    """Icon stems from the local icons directory"""
+    return [os.path.splitext(path.rsplit('/', 1)[-1])[0] for path, _type, _stat in manager._scan_icons()]
+
+def timed(func, names, rounds):
+    """Best wall time of several rounds over all names"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for name in names:
+            func(name)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(rounds=5):
+    manager = IconManager()
+    rules = manager._get_categorization_patterns()
+    names = load_names(manager)
+    if not names:
+        print("No icons found; sync icons first")
+        return 1
+
+    categorizer = IconCategorizer.for_rules(rules)
+    legacy = timed(lambda name: legacy_categorize(name, rules), names, rounds)
+    compiled = timed(categorizer.tags, names, rounds)
+
+    mismatched = sum(1 for name in names if categorizer.categorize(name) != legacy_categorize(name, rules))
+    multi = sum(1 for name in names if len(categorizer.tags(name)) > 1)
+
+    print(f"Icons:               {len(names)}")
+    print(f"Legacy loop:         {legacy * 1000:.1f} ms (first match only)")
+    print(f"Compiled engine:     {compiled * 1000:.1f} ms (all tags)")
+    print(f"Speedup:             {legacy / compiled:.1f}x")
+    print(f"Multi-tagged icons:  {multi}")
+    print(f"Primary mismatches:  {mismatched}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
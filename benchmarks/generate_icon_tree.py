@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Synthetic icon tree generator for WarmbOS benchmarks
+Writes an icons/ tree shaped like the synced selfhst/icons repository
+
+Run from the project root:
+    python benchmarks/generate_icon_tree.py --count 100000 --out /tmp/warmbos-bench/icons
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.icon_manager import IconManager
+
+# Filler words so only some names hit a categorization keyword
+FILLER = [
+    "alpha", "nova", "pixel", "stack", "hub", "flow", "grid", "echo", "lumen", "orbit",
+    "vault", "forge", "atlas", "pulse", "relay", "drift", "harbor", "kite", "quartz", "ember"
+]
+VARIANTS = ["", "", "", "-light", "-dark"]
+SIZES = {"small": 16, "medium": 64, "large": 256}
+
+def _png(rng, size):
+    """A valid RGBA PNG of a random flat colour with one random row, so files differ"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    colour = bytes(rng.randrange(256) for _ in range(4))
+    row = b'\x00' + colour * size
+    noisy = b'\x00' + bytes(rng.randrange(256) for _ in range(size * 4))
+    raw = row * (size - 1) + noisy
+    header = struct.pack('>IIBBBBB', size, size, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b''))
+
+def _svg(rng):
+    shapes = ''.join(
+        f'<circle cx="{rng.randrange(64)}" cy="{rng.randrange(64)}" r="{rng.randrange(4, 20)}" '
+        f'fill="#{rng.randrange(0x1000000):06x}"/>'
+        for _ in range(rng.randrange(3, 30))
+    )
+    return f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 64 64">{shapes}</svg>'.encode('utf-8')
+
+def generate_tree(root, count, png_ratio=0.5, duplicate_ratio=0.02, png_size="medium", seed=0):
+    """Write count icons under root/svg and root/png; returns the number written
+
+    Names mix categorization keywords with filler words and carry the
+    light/dark variants the real set has. A duplicate_ratio share of files
+    reuse an earlier file's bytes, as identical variants do upstream.
+    The same arguments always produce the same tree.
+    """
+    rng = random.Random(seed)
+    keywords = sorted({k for words in IconManager()._get_categorization_patterns().values() for k in words})
+    size = SIZES[png_size]
+
+    for icon_type in ("svg", "png"):
+        os.makedirs(os.path.join(root, icon_type), exist_ok=True)
+
+    previous = {"svg": [], "png": []}
+    for i in range(count):
+        icon_type = "png" if rng.random() < png_ratio else "svg"
+        words = [rng.choice(keywords if rng.random() < 0.3 else FILLER) for _ in range(rng.randrange(1, 4))]
+        name = f"{'-'.join(words)}-{i:x}{rng.choice(VARIANTS)}"
+
+        pool = previous[icon_type]
+        if pool and rng.random() < duplicate_ratio:
+            data = rng.choice(pool)
+        else:
+            data = _png(rng, size) if icon_type == "png" else _svg(rng)
+            if len(pool) < 1000:
+                pool.append(data)
+
+        with open(os.path.join(root, icon_type, f"{name}.{icon_type}"), 'wb') as f:
+            f.write(data)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic icons/ tree')
+    parser.add_argument('--count', type=int, default=10000, help='Number of icon files (e.g. 10000, 100000, 1000000)')
+    parser.add_argument('--out', default='bench-icons', help='Directory to create')
+    parser.add_argument('--png-ratio', type=float, default=0.5, help='Share of PNG files')
+    parser.add_argument('--duplicates', type=float, default=0.02, help='Share of byte-identical files')
+    parser.add_argument('--png-size', choices=sorted(SIZES), default='medium', help='PNG dimensions')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.out) and os.listdir(args.out):
+        print(f"{args.out} already exists and is not empty")
+        return 1
+
+    start = time.perf_counter()
+    generate_tree(args.out, args.count, args.png_ratio, args.duplicates, args.png_size, args.seed)
+    print(f"Generated {args.count} icons in {args.out} in {time.perf_counter() - start:.1f} s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for WarmbOS
+Measures manifest builds, API latency under concurrency, icon serving
+throughput and concurrent config writes, and writes comparable JSON results
+
+Run from the project root:
+    python benchmarks/run_benchmarks.py --icons 10000 --output before.json
+    python benchmarks/run_benchmarks.py --url http://localhost:5000 --output live.json
+    python benchmarks/run_benchmarks.py --compare before.json after.json
+
+Without --url everything runs against the Flask test client in a scratch
+directory holding a synthetic icon tree, so results do not depend on the
+icons you have synced. Trees are cached in the scratch directory by size
+and seed, so repeated runs skip generation.
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlparse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.generate_icon_tree import generate_tree
+
+RESULTS_VERSION = 1
+BENCHMARKS = ("manifest", "api_system", "api_icons_status", "icons_serve", "icons_revalidate", "config_writes")
+# Run parameters repeated in each result rather than measurements
+PARAMETERS = {"requests", "concurrency", "icons", "distinct_icons"}
+
+class LocalClient:
+    """Flask test client with the same interface as HttpClient"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self._client.open(path, method=method, data=body, headers=headers or {})
+        return response.status_code, response.get_data(), response.headers
+
+class HttpClient:
+    """Keep-alive HTTP client for a running server; one per thread"""
+
+    def __init__(self, base_url):
+        url = urlparse(base_url)
+        self._connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+
+    def request(self, method, path, body=None, headers=None):
+        self._connection.request(method, path, body=body, headers=headers or {})
+        response = self._connection.getresponse()
+        return response.status, response.read(), response.headers
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def load_test(make_client, request, total, concurrency):
+    """Run total requests from concurrency threads and summarize latency
+
+    request(client, worker, i) makes one request and returns (status, body
+    bytes). Each thread has its own client, as browsers have connections.
+    """
+    latencies = [[] for _ in range(concurrency)]
+    statuses = [{} for _ in range(concurrency)]
+    sent = [0] * concurrency
+    errors = [0] * concurrency
+    per_worker = max(total // concurrency, 1)
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def worker(n):
+        client = make_client()
+        start_barrier.wait()
+        for i in range(per_worker):
+            started = time.perf_counter()
+            try:
+                status, size = request(client, n, i)
+            except Exception:
+                errors[n] += 1
+                continue
+            latencies[n].append(time.perf_counter() - started)
+            statuses[n][status] = statuses[n].get(status, 0) + 1
+            sent[n] += size
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    merged = sorted(value for values in latencies for value in values)
+    status_counts = {}
+    for counts in statuses:
+        for status, count in counts.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+
+    return {
+        "requests": len(merged),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(merged) / elapsed, 1) if elapsed else 0,
+        "mb_per_second": round(sum(sent) / elapsed / 1048576, 2) if elapsed else 0,
+        "mean_ms": round(sum(merged) / len(merged) * 1000, 3) if merged else 0,
+        "p50_ms": round(percentile(merged, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(merged, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(merged, 0.99) * 1000, 3),
+        "errors": sum(errors),
+        "statuses": status_counts
+    }
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1048576 if sys.platform == 'darwin' else 1024), 1)
+
+def bench_manifest(memory=True):
+    """Cold, no-op and 1%-changed manifest builds in the current directory"""
+    from services.icon_manager import IconManager
+
+    def build(clear):
+        manager = IconManager()
+        if clear:
+            for path in (manager.MANIFEST_CACHE_FILE, manager.MANIFEST_FILE, manager.CATALOG_FILE):
+                if path.exists():
+                    path.unlink()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            manager.generate_manifest()
+            return time.perf_counter() - started
+
+    result = {"cold_seconds": round(build(clear=True), 3)}
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["noop_seconds"] = round(build(clear=False), 3)
+
+    entries = IconManager()._scan_icons()
+    for relative_path, _type, _stat in random.Random(1).sample(entries, max(len(entries) // 100, 1)):
+        os.utime(os.path.join("icons", relative_path))
+    result["incremental_seconds"] = round(build(clear=False), 3)
+
+    if memory:
+        # Separate run: tracing slows the build, so its time is not reported
+        tracemalloc.start()
+        build(clear=True)
+        result["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1048576, 1)
+        tracemalloc.stop()
+    result["icons"] = len(entries)
+    return result
+
+def icon_paths(client, limit=2000):
+    """Icon URLs known to the server, read through the search API"""
+    status, body, _headers = client.request('GET', '/api/icons/search?per_page=500&page=1')
+    if status != 200:
+        return []
+    data = json.loads(body)
+    paths = [icon["path"] for icon in data["icons"]]
+    page = 2
+    while len(paths) < min(limit, data["total"]):
+        _status, body, _headers = client.request('GET', f'/api/icons/search?per_page=500&page={page}')
+        paths.extend(icon["path"] for icon in json.loads(body)["icons"])
+        page += 1
+    return paths[:limit]
+
+def bench_get(make_client, path, total, concurrency):
+    def request(client, _worker, _i):
+        status, body, _headers = client.request('GET', path)
+        return status, len(body)
+    return load_test(make_client, request, total, concurrency)
+
+def bench_icons(make_client, paths, total, concurrency, revalidate):
+    """Random icon fetches; with revalidate, conditional requests that should get 304"""
+    # Same encodings as a browser, so ETags match the variant that is served
+    accept = {'Accept-Encoding': 'gzip, br'}
+    etags = {}
+    if revalidate:
+        client = make_client()
+        for path in paths:
+            _status, _body, headers = client.request('GET', path, headers=accept)
+            etags[path] = headers.get('ETag')
+
+    def request(client, worker, i):
+        path = paths[(worker * 7919 + i * 104729) % len(paths)]
+        headers = dict(accept)
+        if revalidate and etags.get(path):
+            headers['If-None-Match'] = etags[path]
+        status, body, _headers = client.request('GET', path, headers=headers)
+        return status, len(body)
+
+    result = load_test(make_client, request, total, concurrency)
+    result["distinct_icons"] = len(paths)
+    return result
+
+def bench_config_writes(make_client, total, concurrency):
+    """Concurrent read-modify-write cycles on shortcuts.json with If-Match
+
+    Conflicting writes get 412 by design; the rate of those against
+    successful saves shows how often clients would have to retry.
+    """
+    client = make_client()
+    _status, original, headers = client.request('GET', '/shortcuts.json')
+
+    def request(client, worker, i):
+        status, body, headers = client.request('GET', '/shortcuts.json')
+        data = json.loads(body)
+        data.setdefault("benchmark", {})[str(worker)] = i
+        status, _body, _headers = client.request(
+            'POST', '/shortcuts.json',
+            body=json.dumps(data),
+            headers={'Content-Type': 'application/json', 'If-Match': headers.get('ETag')}
+        )
+        return status, 0
+
+    result = load_test(make_client, request, total, concurrency)
+    result["saved"] = result["statuses"].get("200", 0)
+    result["conflicts"] = result["statuses"].get("412", 0)
+
+    # Put the document back as it was
+    _status, _body, headers = client.request('GET', '/shortcuts.json')
+    client.request('POST', '/shortcuts.json', body=original,
+                   headers={'Content-Type': 'application/json', 'If-Match': headers.get('ETag')})
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def prepare_workdir(workdir, icons, seed):
+    """Scratch directory with a synthetic icon tree, reused when it matches"""
+    os.makedirs(workdir, exist_ok=True)
+    tree = os.path.join(workdir, f"icons-{icons}-{seed}")
+    if not os.path.isdir(tree):
+        print(f"Generating {icons} synthetic icons...")
+        generate_tree(tree + ".tmp", icons, seed=seed)
+        os.replace(tree + ".tmp", tree)
+
+    run_dir = tempfile.mkdtemp(prefix="run-", dir=workdir)
+    os.symlink(tree, os.path.join(run_dir, "icons"))
+    return run_dir
+
+def run_suite(args):
+    results = {}
+    selected = [name for name in BENCHMARKS if name not in args.skip]
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+        if "config_writes" in selected and not args.allow_writes:
+            print("Skipping config_writes against a live server; pass --allow-writes to run it")
+            selected.remove("config_writes")
+        if "manifest" in selected:
+            print("Skipping manifest; it only runs locally")
+            selected.remove("manifest")
+    else:
+        # The app resolves settings, manifests and icons relative to the
+        # working directory, so the run stays in run_dir until exit; state
+        # and cache writes must not land in the project tree
+        run_dir = prepare_workdir(args.workdir, args.icons, args.seed)
+        os.chdir(run_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            from utils.system_utils import create_default_files
+            create_default_files()
+            import app as warmbos
+            flask_app = warmbos.create_app()
+        # send_file resolves relative paths against the app's root
+        flask_app.root_path = run_dir
+        make_client = lambda: LocalClient(flask_app)
+
+    if "manifest" in selected:
+        print("manifest...")
+        results["manifest"] = bench_manifest(memory=not args.no_tracemalloc)
+    elif not args.url:
+        from services.icon_manager import IconManager
+        with contextlib.redirect_stdout(io.StringIO()):
+            IconManager().generate_manifest()
+
+    for name, path in (("api_system", "/api/system"), ("api_icons_status", "/api/icons/status")):
+        if name in selected:
+            print(f"{name}...")
+            results[name] = bench_get(make_client, path, args.requests, args.concurrency)
+
+    if "icons_serve" in selected or "icons_revalidate" in selected:
+        paths = icon_paths(make_client())
+        for name, revalidate in (("icons_serve", False), ("icons_revalidate", True)):
+            if name in selected and paths:
+                print(f"{name}...")
+                results[name] = bench_icons(make_client, paths, args.requests, args.concurrency, revalidate)
+
+    if "config_writes" in selected:
+        print("config_writes...")
+        results["config_writes"] = bench_config_writes(make_client, args.write_requests, args.concurrency)
+
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "git": git_revision(),
+            "target": args.url or "test-client",
+            "icons": None if args.url else args.icons,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "results": results
+    }
+
+def compare(before_file, after_file):
+    """Print every numeric metric side by side with its relative change"""
+    with open(before_file) as f:
+        before = json.load(f)
+    with open(after_file) as f:
+        after = json.load(f)
+
+    for key in ("icons", "requests", "concurrency", "target"):
+        if before["meta"].get(key) != after["meta"].get(key):
+            print(f"Warning: runs differ in {key}: {before['meta'].get(key)} vs {after['meta'].get(key)}")
+
+    print(f"{'metric':<45} {'before':>12} {'after':>12} {'change':>9}")
+    for bench, metrics in after["results"].items():
+        for metric, value in metrics.items():
+            old = before["results"].get(bench, {}).get(metric)
+            if metric in PARAMETERS or not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{bench + '.' + metric:<45} {old:>12} {value:>12} {change:>9}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the WarmbOS benchmark suite')
+    parser.add_argument('--icons', type=int, default=10000, help='Synthetic icon count (e.g. 10000, 100000, 1000000)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic tree')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per latency benchmark')
+    parser.add_argument('--write-requests', type=int, default=400, help='Write cycles for config_writes')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--url', help='Benchmark a running server instead of the test client')
+    parser.add_argument('--allow-writes', action='store_true', help='Allow config_writes against --url')
+    parser.add_argument('--skip', nargs='*', default=[], choices=BENCHMARKS, help='Benchmarks to leave out')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='Skip the traced peak memory run')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'warmbos-bench'),
+                        help='Scratch directory for synthetic trees and runs')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    report = run_suite(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
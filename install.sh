@@ -74,7 +74,7 @@ if [ -f "requirements.txt" ]; then
     pip install -r requirements.txt
 else
     print_warning "requirements.txt not found, installing basic dependencies..."
-    pip install Flask==3.0.0 Flask-CORS==4.0.0 psutil==5.9.6
+    pip install Flask==3.0.0 Flask-CORS==4.0.0 psutil==5.9.6 gunicorn==21.2.0
 fi
 
 # Get current user and working directory
@@ -97,7 +97,8 @@ Group=${CURRENT_USER}
 WorkingDirectory=${WORKING_DIR}
 Environment=PATH=${WORKING_DIR}/venv/bin
 Environment=PORT=5000
-ExecStart=${WORKING_DIR}/venv/bin/python app.py
+ExecStart=${WORKING_DIR}/venv/bin/python app.py --production --workers 2 --threads 4 --preload
+ExecReload=/bin/kill -HUP $MAINPID
 Restart=always
 RestartSec=3
 StandardOutput=journal
@@ -152,6 +153,7 @@ echo -e "${BLUE}Service Management:${NC}"
 echo -e "  Start:    sudo systemctl start ${SERVICE_NAME}"
 echo -e "  Stop:     sudo systemctl stop ${SERVICE_NAME}"
 echo -e "  Restart:  sudo systemctl restart ${SERVICE_NAME}"
+echo -e "  Reload:   sudo systemctl reload ${SERVICE_NAME}  (replaces workers; restart to load new code)"
 echo -e "  Status:   sudo systemctl status ${SERVICE_NAME}"
 echo -e "  Logs:     sudo journalctl -u ${SERVICE_NAME} -f"
 echo
@@ -88,14 +88,119 @@ function debugLog(message) {
             }
         }
         
-        // Load on page load
-        document.addEventListener('DOMContentLoaded', () => {
-            debugLog('DOM loaded, starting initial fetch...');
-            loadSystemInfo();
-        });
+        // === LIVE METRICS ===
+        const liveMetrics = {};
+        let metricsSource = null;
+        let pollTimer = null;
+        
+        function formatRate(bytesPerSecond) {
+            const units = ['B/s', 'KB/s', 'MB/s', 'GB/s'];
+            let value = bytesPerSecond;
+            let unit = 0;
+            while (value >= 1024 && unit < units.length - 1) {
+                value /= 1024;
+                unit++;
+            }
+            return `${value.toFixed(unit ? 1 : 0)} ${units[unit]}`;
+        }
+        
+        function formatUptime(seconds) {
+            const days = Math.floor(seconds / 86400);
+            const hours = Math.floor(seconds % 86400 / 3600);
+            const minutes = Math.floor(seconds % 3600 / 60);
+            const secs = seconds % 60;
+            const clock = [hours, minutes, secs].map(n => String(n).padStart(2, '0')).join(':');
+            return days ? `${days} day${days === 1 ? '' : 's'}, ${clock}` : clock;
+        }
+        
+        function renderLiveMetrics() {
+            const m = liveMetrics;
+            if (m.cpu) {
+                document.getElementById('live-cpu').textContent = `${m.cpu.percent}%`;
+                document.getElementById('live-cpu-progress').style.width = `${m.cpu.percent}%`;
+            }
+            if (m.memory) {
+                document.getElementById('live-memory').textContent = 
+                    `${m.memory.used_gb} GB / ${m.memory.total_gb} GB (${m.memory.percent}%)`;
+                document.getElementById('live-memory-progress').style.width = `${m.memory.percent}%`;
+            }
+            if (m.disk) {
+                document.getElementById('disk-usage').textContent = 
+                    `${m.disk.used_gb} GB / ${m.disk.total_gb} GB (${m.disk.percent}%)`;
+                document.getElementById('disk-progress').style.width = `${m.disk.percent}%`;
+            }
+            if (m.network) {
+                document.getElementById('live-network').textContent = 
+                    `↑ ${formatRate(m.network.sent_bps)}  ↓ ${formatRate(m.network.recv_bps)}`;
+            }
+            if (m.uptime !== undefined) {
+                document.getElementById('live-uptime').textContent = formatUptime(m.uptime);
+            }
+            if (m.time) {
+                document.getElementById('server-time').textContent = 
+                    new Date(m.time * 1000).toISOString().replace('T', ' ').slice(0, 19) + ' UTC';
+            }
+            document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
+        }
         
-        // Refresh every 30 seconds 
-        setInterval(() => {
-            debugLog('Refreshing system info...');
+        function startPolling() {
+            if (pollTimer) return;
+            // Refresh every 30 seconds 
+            pollTimer = setInterval(() => {
+                if (!document.getElementById('os-system')) return clearInterval(pollTimer);
+                debugLog('Refreshing system info...');
+                loadSystemInfo();
+            }, 30000);
+        }
+        
+        function connectMetricsStream() {
+            if (!window.EventSource) {
+                debugLog('EventSource not supported, falling back to polling');
+                return startPolling();
+            }
+            
+            metricsSource = new EventSource('/api/system/stream');
+            
+            const handleFrame = (event, replace) => {
+                // Stop streaming once this window has been closed
+                if (!document.getElementById('os-system')) {
+                    metricsSource.close();
+                    return;
+                }
+                const data = JSON.parse(event.data);
+                if (replace) Object.keys(liveMetrics).forEach(key => delete liveMetrics[key]);
+                Object.assign(liveMetrics, data);
+                renderLiveMetrics();
+            };
+            
+            metricsSource.addEventListener('snapshot', event => handleFrame(event, true));
+            metricsSource.addEventListener('delta', event => handleFrame(event, false));
+            metricsSource.onerror = () => {
+                if (!document.getElementById('os-system')) return metricsSource.close();
+                document.getElementById('status').textContent = 'Live metrics disconnected, retrying...';
+                document.getElementById('status').className = 'status error';
+                // EventSource gives up after an error status such as 503 when the
+                // server is at its stream limit, so reconnect by hand
+                if (metricsSource.readyState === EventSource.CLOSED) {
+                    setTimeout(connectMetricsStream, 10000);
+                }
+            };
+            metricsSource.onopen = () => {
+                document.getElementById('status').textContent = 'Connected - Live';
+                document.getElementById('status').className = 'status';
+            };
+        }
+        
+        function startComputerApp() {
+            debugLog('Starting initial fetch...');
             loadSystemInfo();
-        }, 30000);
\ No newline at end of file
+            connectMetricsStream();
+        }
+        
+        // Load on page load; the script may run after DOMContentLoaded when
+        // injected into a window
+        if (document.readyState === 'loading') {
+            document.addEventListener('DOMContentLoaded', startComputerApp);
+        } else {
+            startComputerApp();
+        }
@@ -1,9 +1,11 @@
 // Optimized Desktop State Management - Improved minimize/restore and cleaner architecture
 
-import { debounce } from './utils.js';
+import { debounce, createJsonPatch } from './utils.js';
 import { DataManager } from './core/data-manager.js';
 
 // === CONSTANTS ===
+const STATE_URL = '/api/state';
+// localStorage is only the fallback while the server is unreachable
 const STORAGE_KEY = 'warmbos-desktop-state';
 const STATE_VERSION = '1.1';
 const MAX_STATE_AGE = 24 * 60 * 60 * 1000; // 24 hours
@@ -14,30 +16,43 @@ class DesktopStateManager {
     constructor() {
         this.debouncedSave = debounce(() => this.saveState(), SAVE_DELAY);
         this.isInitialized = false;
+        // Last state the server acknowledged, and its revision
+        this.syncedState = null;
+        this.revision = null;
+        // Saves run one after another so each patch applies to the last one
+        this.saveQueue = Promise.resolve();
     }
 
     // === PUBLIC INTERFACE ===
-    saveState() {
+    saveState({ keepalive = false } = {}) {
         const state = this.collectCurrentState();
         if (this.isValidState(state)) {
-            this.writeToStorage(state);
-            console.log('Desktop state saved:', state.openWindows.length, 'windows');
+            this.saveQueue = this.saveQueue.then(() => this.pushState(state, keepalive));
         }
+        return this.saveQueue;
     }
 
-    loadState() {
+    async loadState() {
         try {
-            const savedState = this.readFromStorage();
-            if (!savedState || this.isStateExpired(savedState)) {
-                this.clearStorage();
-                return;
+            let savedState = null;
+            const server = await this.fetchServerState();
+            if (server && this.isValidState(server.state)) {
+                if (!this.isStateExpired(server.updated * 1000)) {
+                    savedState = server.state;
+                }
+            } else {
+                // Nothing on the server yet; pick up what this browser had
+                const local = this.readFromStorage();
+                if (local && !this.isStateExpired(local.timestamp)) {
+                    savedState = local;
+                }
             }
 
+            if (!savedState) return;
             console.log('Restoring desktop state:', savedState.openWindows.length, 'windows');
             this.restoreWindows(savedState.openWindows);
         } catch (error) {
             console.error('Failed to load desktop state:', error);
-            this.clearStorage();
         }
     }
 
@@ -48,6 +63,7 @@ class DesktopStateManager {
         } catch (error) {
             console.error('Failed to clear desktop state:', error);
         }
+        this.saveQueue = this.saveQueue.then(() => this.pushState({ openWindows: [], version: STATE_VERSION }, false));
     }
 
     scheduleSave() {
@@ -58,7 +74,6 @@ class DesktopStateManager {
     collectCurrentState() {
         const state = {
             openWindows: [],
-            timestamp: Date.now(),
             version: STATE_VERSION
         };
 
@@ -69,7 +84,8 @@ class DesktopStateManager {
             }
         });
 
-        return state;
+        // Drop undefined fields so the state diffs the same way it serializes
+        return JSON.parse(JSON.stringify(state));
     }
 
     extractWindowData(windowEl) {
@@ -269,6 +285,61 @@ class DesktopStateManager {
         }
     }
 
+    // === SERVER SYNC ===
+    async fetchServerState() {
+        try {
+            const response = await fetch(STATE_URL, { cache: 'no-cache' });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const server = await response.json();
+            this.syncedState = server.state;
+            this.revision = server.revision;
+            return server;
+        } catch (error) {
+            console.warn('Desktop state server unavailable:', error);
+            return null;
+        }
+    }
+
+    // Send only what changed since the last acknowledged state
+    async pushState(state, keepalive) {
+        try {
+            if (this.revision === null && !(await this.fetchServerState())) {
+                throw new Error('server unavailable');
+            }
+
+            let response = await this.sendPatch(createJsonPatch(this.syncedState, state), keepalive);
+            if (response?.status === 412) {
+                // Changed from another tab or device; patch against that instead
+                await this.fetchServerState();
+                response = await this.sendPatch(createJsonPatch(this.syncedState, state), keepalive);
+            }
+            if (response && !response.ok) throw new Error(`HTTP ${response.status}`);
+
+            if (response) {
+                this.revision = (await response.json()).revision;
+                this.syncedState = state;
+                console.log('Desktop state saved:', state.openWindows.length, 'windows');
+            }
+        } catch (error) {
+            console.error('Failed to save desktop state, keeping it locally:', error);
+            this.writeToStorage({ ...state, timestamp: Date.now() });
+        }
+    }
+
+    // Resolves to null when there is nothing to send
+    sendPatch(patch, keepalive) {
+        if (patch.length === 0) return Promise.resolve(null);
+        return fetch(STATE_URL, {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': 'application/json-patch+json',
+                'If-Match': `"${this.revision}"`
+            },
+            body: JSON.stringify(patch),
+            keepalive
+        });
+    }
+
     // === STORAGE OPERATIONS ===
     writeToStorage(state) {
         try {
@@ -299,13 +370,12 @@ class DesktopStateManager {
     // === VALIDATION ===
     isValidState(state) {
         return state && 
-               typeof state.timestamp === 'number' &&
                Array.isArray(state.openWindows) &&
                state.version === STATE_VERSION;
     }
 
-    isStateExpired(state) {
-        return Date.now() - state.timestamp > MAX_STATE_AGE;
+    isStateExpired(timestamp) {
+        return typeof timestamp !== 'number' || Date.now() - timestamp > MAX_STATE_AGE;
     }
 
     // === INITIALIZATION ===
@@ -350,12 +420,12 @@ class DesktopStateManager {
             });
         }
 
-        // Save state before page unload
+        // Save state before page unload; keepalive lets the request outlive the page
         window.addEventListener('beforeunload', () => {
-            this.saveState();
+            this.saveState({ keepalive: true });
         });
 
-        // Periodic save as backup
+        // Periodic save as backup; sends nothing when the state is unchanged
         setInterval(() => this.saveState(), 30000); // Every 30 seconds
 
         this.isInitialized = true;
@@ -0,0 +1,58 @@
+// Loads all local shortcut icons in one bundle request instead of one request per icon
+
+// 1x1 transparent GIF shown while an atlas frame is drawn as the background
+const BLANK_IMAGE = 'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7';
+
+const pendingIcons = [];
+
+// Set an icon source, deferring local /icons/ paths until the bundle arrives
+export function deferIcon(img, iconUrl) {
+    if (iconUrl && iconUrl.startsWith('/icons/')) {
+        pendingIcons.push({ img, iconUrl });
+    } else {
+        img.src = iconUrl;
+    }
+}
+
+function applyAtlasFrame(img, atlas, frame) {
+    // Percentages keep the frame aligned at whatever size CSS renders the icon
+    const columns = atlas.width / frame.w;
+    const rows = atlas.height / frame.h;
+    const x = columns > 1 ? frame.x / (atlas.width - frame.w) * 100 : 0;
+    const y = rows > 1 ? frame.y / (atlas.height - frame.h) * 100 : 0;
+    
+    img.src = BLANK_IMAGE;
+    img.style.backgroundImage = `url('${atlas.url}')`;
+    img.style.backgroundSize = `${columns * 100}% ${rows * 100}%`;
+    img.style.backgroundPosition = `${x}% ${y}%`;
+    img.style.backgroundRepeat = 'no-repeat';
+}
+
+// Fetch one bundle for every deferred icon and apply it; anything the
+// bundle does not cover falls back to its own URL
+export async function applyIconBundle() {
+    const icons = pendingIcons.splice(0);
+    if (!icons.length) return;
+    
+    let bundle = null;
+    try {
+        // GET so the browser can revalidate the bundle map with its ETag
+        const paths = [...new Set(icons.map(icon => icon.iconUrl))].sort();
+        const response = await fetch(`/api/icons/bundle?paths=${encodeURIComponent(paths.join(','))}`);
+        if (response.ok) bundle = await response.json();
+    } catch (error) {
+        console.error('Failed to load icon bundle:', error);
+    }
+    
+    icons.forEach(({ img, iconUrl }) => {
+        const symbol = bundle?.svg?.symbols[iconUrl];
+        const frame = bundle?.png?.frames[iconUrl];
+        if (symbol) {
+            img.src = `${bundle.svg.url}#${symbol}`;
+        } else if (frame) {
+            applyAtlasFrame(img, bundle.png, frame);
+        } else {
+            img.src = iconUrl;
+        }
+    });
+}
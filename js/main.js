@@ -3,17 +3,31 @@ import { initializeStartMenuToggle } from './start-menu.js';
 import { initializeClock } from './clock.js';
 import { bringWindowToFront } from './window-helpers.js';
 import { loadDesktopState, initializeStateManagement } from './desktop-state.js';
+import { deferIcon, applyIconBundle } from './icon-bundle.js';
+import { initializeShortcutHealth } from './shortcut-health.js';
 
-// Load and apply background from settings
+// Load and apply background from settings: the blurred placeholder at once, then the
+// copy sized for this screen (or the original until the server has built the copies)
 async function loadBackground() {
     try {
-        const response = await fetch('/settings.json');
-        const settings = await response.json();
-        if (settings.backgroundImage) {
+        const response = await fetch('/api/wallpaper');
+        const wallpaper = await response.json();
+        if (wallpaper.url) {
             const desktop = document.querySelector('.desktop');
-            desktop.style.backgroundImage = `url('${settings.backgroundImage}')`;
             desktop.style.backgroundSize = 'cover';
             desktop.style.backgroundPosition = 'center';
+            if (!wallpaper.ready) {
+                desktop.style.backgroundImage = `url('${wallpaper.url}')`;
+                return;
+            }
+            desktop.style.backgroundImage = `url('${wallpaper.placeholder}')`;
+            const width = Math.round(window.innerWidth * (window.devicePixelRatio || 1));
+            const src = `${wallpaper.image}?w=${width}`;
+            const image = new Image();
+            image.onload = () => {
+                desktop.style.backgroundImage = `url('${src}')`;
+            };
+            image.src = src;
         }
     } catch (error) {
         console.log('No custom background set');
@@ -28,6 +42,10 @@ async function loadComponents() {
     
     const results = await Promise.allSettled(
         components.map(async comp => {
+            // Already inlined when the server bundled the page
+            if (document.querySelector(comp.target)?.hasAttribute('data-inlined')) {
+                return {success: true, component: comp.name};
+            }
             try {
                 const response = await fetch(comp.url);
                 if (!response.ok) throw new Error(`HTTP ${response.status}`);
@@ -104,7 +122,7 @@ loadComponents().then(() => {
                     const iconDiv = document.createElement('div');
                     iconDiv.className = 'icon';
                     const img = document.createElement('img');
-                    img.src = iconUrl;
+                    deferIcon(img, iconUrl);
                     img.alt = 'icon';
                     const span = document.createElement('span');
                     span.textContent = icon.title;
@@ -133,7 +151,7 @@ loadComponents().then(() => {
                         btn.dataset.content = contentPath || '';
                         btn.dataset.icon = iconUrl || '';
                         const img = document.createElement('img');
-                        img.src = iconUrl;
+                        deferIcon(img, iconUrl);
                         img.alt = 'icon';
                         btn.appendChild(img);
                         btn.appendChild(document.createTextNode(icon.title));
@@ -157,7 +175,7 @@ loadComponents().then(() => {
                         a.dataset.content = contentPath || '';
                         a.dataset.icon = iconUrl || '';
                         const img = document.createElement('img');
-                        img.src = iconUrl;
+                        deferIcon(img, iconUrl);
                         img.alt = 'icon';
                         const span = document.createElement('span');
                         span.textContent = icon.title;
@@ -167,6 +185,8 @@ loadComponents().then(() => {
                     });
                 }
             }
+            applyIconBundle();
+            initializeShortcutHealth();
             initializeWindowCreation();
             // Initialize state management and load saved state
             initializeStateManagement();
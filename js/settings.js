@@ -3,14 +3,25 @@
 // === STATE MANAGEMENT ===
 let currentSettings = {};
 let currentShortcuts = {};
+// ETags of the loaded documents, sent as If-Match so stale saves are rejected
+let settingsEtag = null;
+let shortcutsEtag = null;
 let editingShortcut = null;
 let editingSection = null;
 let editingIndex = null;
 
 // Icon picker state
-let iconManifest = null;
-let allIcons = [];
+const ICON_PAGE_SIZE = 150;
+const ICON_SEARCH_DELAY = 150;
+// Grid cells are 64 CSS px; ask the server for a thumbnail instead of the full PNG
+const ICON_THUMB_SIZE = window.devicePixelRatio > 1 ? 128 : 64;
+let iconCategories = null;
+let iconTotalCount = 0;
 let filteredIcons = [];
+let filteredTotal = 0;
+let iconPage = 1;
+let iconSearchTimer = null;
+let iconSearchSeq = 0;
 
 // === UTILITY FUNCTIONS ===
 function normalizeShortcut(shortcut) {
@@ -85,7 +96,13 @@ function setupIconPickerEvents() {
         filterAndRenderIcons(searchInput.value.toLowerCase(), categorySelect.value);
     };
     
-    if (searchInput) searchInput.oninput = handleFilter;
+    // Debounce typing so only the last keystroke hits the server
+    const handleSearchInput = () => {
+        clearTimeout(iconSearchTimer);
+        iconSearchTimer = setTimeout(handleFilter, ICON_SEARCH_DELAY);
+    };
+    
+    if (searchInput) searchInput.oninput = handleSearchInput;
     if (categorySelect) categorySelect.onchange = handleFilter;
     
     // Escape key to close
@@ -129,6 +146,7 @@ async function loadSettings() {
     try {
         const response = await fetch('../settings.json');
         if (response.ok) {
+            settingsEtag = response.headers.get('ETag');
             currentSettings = await response.json();
             populatePreferencesForm();
         }
@@ -141,6 +159,7 @@ async function loadShortcuts() {
     try {
         const response = await fetch('../shortcuts.json');
         if (response.ok) {
+            shortcutsEtag = response.headers.get('ETag');
             currentShortcuts = await response.json();
             renderShortcuts();
         }
@@ -178,11 +197,15 @@ async function applyPreferences() {
         
         const response = await fetch('/settings.json', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'If-Match': settingsEtag || '*' },
             body: JSON.stringify(settings)
         });
         
-        if (response.ok) {
+        if (response.status === 412) {
+            showMessage('Settings were changed elsewhere. Reloaded the latest version.', 'error');
+            await loadSettings();
+        } else if (response.ok) {
+            settingsEtag = response.headers.get('ETag');
             currentSettings = settings;
             showMessage('Preferences applied!', 'success');
             setTimeout(() => window.location.reload(), 500);
@@ -297,11 +320,15 @@ async function applyShortcuts() {
     try {
         const response = await fetch('/shortcuts.json', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'If-Match': shortcutsEtag || '*' },
             body: JSON.stringify(currentShortcuts)
         });
         
-        if (response.ok) {
+        if (response.status === 412) {
+            showMessage('Shortcuts were changed elsewhere. Reloaded the latest version.', 'error');
+            await loadShortcuts();
+        } else if (response.ok) {
+            shortcutsEtag = response.headers.get('ETag');
             showMessage('Shortcuts applied!', 'success');
             setTimeout(() => window.location.reload(), 500);
         } else {
@@ -313,33 +340,28 @@ async function applyShortcuts() {
 }
 
 // === ICON PICKER ===
-async function loadIconManifest() {
+async function loadIconCategories() {
     try {
-        const response = await fetch('/js/icon-manifest.json');
+        const response = await fetch('/api/icons/categories?type=png');
         if (!response.ok) return false;
         
-        iconManifest = await response.json();
-        
-        // Filter to PNG icons only, deduplicate by name
-        const seenNames = new Set();
-        allIcons = (iconManifest.icons || [])
-            .filter(icon => icon.type === 'png' && !seenNames.has(icon.name) && seenNames.add(icon.name))
-            .sort((a, b) => a.name.localeCompare(b.name));
+        const result = await response.json();
+        iconCategories = result.categories || {};
+        iconTotalCount = Object.values(iconCategories).reduce((sum, count) => sum + count, 0);
         
-        console.log(`Loaded ${allIcons.length} unique PNG icons`);
-        return true;
+        console.log(`Icon index has ${iconTotalCount} PNG icons`);
+        return iconTotalCount > 0;
     } catch (error) {
-        console.error('Failed to load icon manifest:', error);
+        console.error('Failed to load icon categories:', error);
         return false;
     }
 }
 
 function populateCategories() {
     const categorySelect = document.getElementById('iconCategory');
-    if (!categorySelect || !iconManifest?.categories) return;
+    if (!categorySelect || !iconCategories) return;
     
-    // Get available categories from filtered icons
-    const availableCategories = [...new Set(allIcons.map(icon => icon.category).filter(Boolean))].sort();
+    const availableCategories = Object.keys(iconCategories).sort();
     
     categorySelect.innerHTML = '<option value="">All Categories</option>' + 
         availableCategories.map(category => 
@@ -347,51 +369,86 @@ function populateCategories() {
         ).join('');
 }
 
-function filterAndRenderIcons(searchTerm = '', category = '') {
-    filteredIcons = allIcons.filter(icon => {
-        const matchesCategory = !category || icon.category === category;
-        const matchesSearch = !searchTerm || 
-            icon.name.toLowerCase().includes(searchTerm) ||
-            icon.filename.toLowerCase().includes(searchTerm);
-        return matchesCategory && matchesSearch;
+async function fetchIconPage(searchTerm, category, page) {
+    const params = new URLSearchParams({
+        q: searchTerm,
+        category: category,
+        type: 'png',
+        unique: '1',
+        page: page,
+        per_page: ICON_PAGE_SIZE
     });
     
+    const response = await fetch(`/api/icons/search?${params}`);
+    if (!response.ok) throw new Error('Icon search failed');
+    return response.json();
+}
+
+async function filterAndRenderIcons(searchTerm = '', category = '', append = false) {
+    // Ignore responses that arrive after a newer search was started
+    const seq = ++iconSearchSeq;
+    iconPage = append ? iconPage + 1 : 1;
+    
+    let result;
+    try {
+        result = await fetchIconPage(searchTerm, category, iconPage);
+    } catch (error) {
+        console.error('Failed to search icons:', error);
+        return;
+    }
+    if (seq !== iconSearchSeq) return;
+    
+    filteredIcons = append ? filteredIcons.concat(result.icons) : result.icons;
+    filteredTotal = result.total;
+    
     // Update stats
     const statsEl = document.getElementById('iconStats');
     if (statsEl) {
         const totalText = searchTerm || category ? 
-            `${filteredIcons.length} of ${allIcons.length} icons` : 
-            `${allIcons.length} icons total`;
+            `${filteredTotal} icons found` : 
+            `${filteredTotal} icons total`;
         statsEl.textContent = totalText;
     }
     
     renderIcons();
 }
 
+function loadMoreIcons() {
+    const searchInput = document.getElementById('iconSearch');
+    const categorySelect = document.getElementById('iconCategory');
+    filterAndRenderIcons(searchInput.value.toLowerCase(), categorySelect.value, true);
+}
+
+// Identical images share one content-addressed URL, so the browser caches them once
+function iconThumbUrl(icon) {
+    const url = icon.hash ? `/api/icons/objects/${icon.hash}.png` : `/icons/png/${icon.filename}.png`;
+    return `${url}?s=${ICON_THUMB_SIZE}`;
+}
+
 function renderIcons() {
     const grid = document.getElementById('iconGrid');
     
     if (!filteredIcons?.length) {
-        const message = !allIcons?.length ? 
+        const message = !iconTotalCount ? 
             'No PNG icons available. <button onclick="syncIcons()" class="btn btn-secondary">Sync Icons</button>' :
             'No icons match your search.';
         grid.innerHTML = `<div class="icon-loading">${message}</div>`;
         return;
     }
     
-    const iconsToShow = filteredIcons.slice(0, 150);
-    const iconElements = iconsToShow.map((icon, index) => `
+    const iconElements = filteredIcons.map((icon, index) => `
         <div class="icon-item" data-filename="${icon.filename}.png" data-name="${icon.name}" id="icon-${index}">
-            <img src="/icons/png/${icon.filename}.png" alt="${icon.name}" onerror="this.style.opacity='0.3'" />
+            <img src="${iconThumbUrl(icon)}" alt="${icon.name}" loading="lazy" onerror="this.style.opacity='0.3'" />
             <span title="${icon.name}">${icon.name}</span>
         </div>
     `);
     
     grid.innerHTML = iconElements.join('') + 
-        (filteredIcons.length > 150 ? '<div class="icon-loading">Showing first 150 results. Use search to narrow down.</div>' : '');
+        (filteredIcons.length < filteredTotal ? 
+            `<div class="icon-loading">Showing ${filteredIcons.length} of ${filteredTotal}. <button onclick="loadMoreIcons()" class="btn btn-secondary">Load more</button></div>` : '');
     
     // Add click handlers
-    iconsToShow.forEach((icon, index) => {
+    filteredIcons.forEach((icon, index) => {
         const iconElement = document.getElementById(`icon-${index}`);
         if (iconElement) {
             iconElement.onclick = (e) => {
@@ -433,10 +490,10 @@ async function openIconPicker() {
     document.body.style.overflow = 'hidden';
     document.body.classList.add('modal-open');
     
-    // Load manifest if needed
-    if (!iconManifest) {
+    // Load categories if needed
+    if (!iconCategories) {
         document.getElementById('iconGrid').innerHTML = '<div class="icon-loading">Loading PNG icons...</div>';
-        const loaded = await loadIconManifest();
+        const loaded = await loadIconCategories();
         if (loaded) {
             populateCategories();
             filterAndRenderIcons();
@@ -467,6 +524,35 @@ function closeIconPicker() {
     if (preview) preview.innerHTML = '<span>No icon selected</span>';
 }
 
+function renderSyncProgress(job) {
+    const grid = document.getElementById('iconGrid');
+    const bytes = job.bytes_total ?
+        ` (${(job.bytes_done / 1048576).toFixed(1)} of ${(job.bytes_total / 1048576).toFixed(1)} MB)` : '';
+    grid.innerHTML = `
+        <div class="icon-loading">
+            ${job.message}${bytes} ${Math.round(job.progress)}%
+            <button onclick="cancelIconSync('${job.id}')" class="btn btn-secondary">Cancel</button>
+        </div>`;
+}
+
+async function finishIconSync(job) {
+    const grid = document.getElementById('iconGrid');
+    if (job && job.state !== 'complete') {
+        grid.innerHTML = `<div class="icon-loading">${job.message} <button onclick="syncIcons()" class="btn btn-secondary">Sync Icons</button></div>`;
+        return;
+    }
+    
+    iconCategories = null;
+    const loaded = await loadIconCategories();
+    if (loaded) {
+        populateCategories();
+        filterAndRenderIcons();
+        showMessage('Icons synchronized successfully!', 'success');
+    } else {
+        grid.innerHTML = '<div class="icon-loading">Sync completed but failed to load manifest.</div>';
+    }
+}
+
 async function syncIcons() {
     const grid = document.getElementById('iconGrid');
     grid.innerHTML = '<div class="icon-loading">Syncing icons...</div>';
@@ -474,32 +560,42 @@ async function syncIcons() {
     try {
         const response = await fetch('/api/icons/sync', { method: 'POST' });
         const result = await response.json();
+        if (!response.ok) throw new Error(result.error || 'Sync failed');
         
-        if (response.ok) {
-            setTimeout(async () => {
-                iconManifest = null;
-                allIcons = [];
-                const loaded = await loadIconManifest();
-                if (loaded) {
-                    populateCategories();
-                    filterAndRenderIcons();
-                    showMessage('Icons synchronized successfully!', 'success');
-                } else {
-                    grid.innerHTML = '<div class="icon-loading">Sync completed but failed to load manifest.</div>';
-                }
-            }, 3000);
-        } else {
-            throw new Error(result.error || 'Sync failed');
-        }
+        // Repeated clicks get the job already running, so this just reattaches to it
+        const job = result.job;
+        renderSyncProgress(job);
+        const source = new EventSource(`/api/icons/sync/${job.id}/stream`);
+        source.addEventListener('progress', event => renderSyncProgress(JSON.parse(event.data)));
+        source.addEventListener('done', event => {
+            source.close();
+            finishIconSync(JSON.parse(event.data));
+        });
+        source.onerror = () => {
+            // The job lives in the worker process that accepted it; without
+            // its stream, check back after a while instead
+            source.close();
+            setTimeout(() => finishIconSync(null), 3000);
+        };
     } catch (error) {
         grid.innerHTML = `<div class="icon-loading">Sync failed: ${error.message}</div>`;
     }
 }
 
+async function cancelIconSync(jobId) {
+    try {
+        await fetch(`/api/icons/sync/${jobId}/cancel`, { method: 'POST' });
+    } catch (error) {
+        console.error('Failed to cancel icon sync:', error);
+    }
+}
+
 // === GLOBAL FUNCTIONS FOR ONCLICK HANDLERS ===
 window.closeIconPicker = closeIconPicker;
 window.selectIconAndClose = selectIconAndClose;
 window.syncIcons = syncIcons;
+window.cancelIconSync = cancelIconSync;
+window.loadMoreIcons = loadMoreIcons;
 
 // === INITIALIZATION ===
 function initSettingsPage() {
@@ -0,0 +1,37 @@
+// Marks shortcuts whose web service is down, using the server's cached health checks
+
+const REFRESH_INTERVAL = 60000;
+
+let refreshTimer = null;
+
+async function applyShortcutHealth() {
+    let health = null;
+    try {
+        const response = await fetch('/api/shortcuts/health');
+        if (response.ok) health = await response.json();
+    } catch (error) {
+        console.error('Failed to load shortcut health:', error);
+    }
+    const results = health?.shortcuts || {};
+
+    document.querySelectorAll('.open-window[data-content]').forEach(el => {
+        const result = results[el.dataset.content];
+        if (!result) {
+            delete el.dataset.health;
+            el.removeAttribute('title');
+            return;
+        }
+        el.dataset.health = result.status;
+        el.title = result.status === 'up'
+            ? `${el.dataset.title}: up (${result.latency_ms} ms)`
+            : `${el.dataset.title}: unreachable${result.error ? ` (${result.error})` : ''}`;
+    });
+}
+
+// Apply now and keep badges current; the server does the probing, so this is one small request
+export function initializeShortcutHealth() {
+    applyShortcutHealth();
+    if (refreshTimer === null) {
+        refreshTimer = setInterval(applyShortcutHealth, REFRESH_INTERVAL);
+    }
+}
@@ -10,3 +10,41 @@ export function debounce(func, wait) {
         timeout = setTimeout(later, wait);
     };
 }
+
+// JSON Patch (RFC 6902) operations that turn `from` into `to`
+export function createJsonPatch(from, to, path = '', operations = []) {
+    if (from === to) return operations;
+
+    const isObject = value => value !== null && typeof value === 'object' && !Array.isArray(value);
+    const escape = key => String(key).replace(/~/g, '~0').replace(/\//g, '~1');
+
+    if (isObject(from) && isObject(to)) {
+        for (const key of Object.keys(from)) {
+            if (!Object.hasOwn(to, key)) {
+                operations.push({ op: 'remove', path: `${path}/${escape(key)}` });
+            }
+        }
+        for (const key of Object.keys(to)) {
+            const child = `${path}/${escape(key)}`;
+            if (Object.hasOwn(from, key)) {
+                createJsonPatch(from[key], to[key], child, operations);
+            } else {
+                operations.push({ op: 'add', path: child, value: to[key] });
+            }
+        }
+    } else if (Array.isArray(from) && Array.isArray(to)) {
+        const common = Math.min(from.length, to.length);
+        for (let i = 0; i < common; i++) {
+            createJsonPatch(from[i], to[i], `${path}/${i}`, operations);
+        }
+        for (let i = from.length - 1; i >= to.length; i--) {
+            operations.push({ op: 'remove', path: `${path}/${i}` });
+        }
+        for (let i = from.length; i < to.length; i++) {
+            operations.push({ op: 'add', path: `${path}/-`, value: to[i] });
+        }
+    } else if (JSON.stringify(from) !== JSON.stringify(to)) {
+        operations.push({ op: 'replace', path, value: to });
+    }
+    return operations;
+}
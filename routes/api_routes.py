@@ -3,15 +3,92 @@ API routes for WarmbOS
 Handles system info, icons, and other API endpoints
 """
 
-from flask import jsonify, send_from_directory, request
+from flask import Response, jsonify, send_from_directory, request
 from pathlib import Path
+import os
+import re
 import threading
 
+from services.icon_bundler import BundleError, IconBundler
 from services.icon_manager import IconManager
-from utils.system_utils import get_system_info
+from services.icon_proxy import IconProxy, IconProxyError
+from services.metrics_history import METRICS, MetricsHistory
+from services.metrics_stream import MetricsBroadcaster, TooManySubscribers
+from services.state_store import RevisionConflict, StateStore
+from services.static_assets import StaticAssets
+from services.sync_jobs import SyncScheduler
+from services.system_info import SystemInfoCollector
+from utils.http_utils import send_precompressed
+from utils.json_patch import JsonPatchError
 
-# Initialize icon manager
+# Initialize icon manager, system info collector and live metrics
 icon_manager = IconManager()
+system_info_collector = SystemInfoCollector()
+metrics_history = MetricsHistory(Path("metrics-history.bin"))
+# Each stream holds a server thread; keep the per-worker count below --threads
+metrics_broadcaster = MetricsBroadcaster(
+    history=metrics_history,
+    live_path=Path("metrics-live.json"),
+    max_subscribers=int(os.environ.get('WARMBOS_METRICS_MAX_STREAMS', '2'))
+)
+# Icons change only on sync, so let browsers reuse them for a day between revalidations
+icon_assets = StaticAssets(IconManager.ICONS_DIR, max_age=86400, resizer=icon_manager.resizer)
+# Store objects are named by content hash, so every response is immutable
+icon_objects = StaticAssets(icon_manager.store.objects_dir, resizer=icon_manager.resizer)
+icon_bundler = IconBundler(IconManager.ICONS_DIR, StaticAssets.CACHE_DIR / "bundles")
+# Open windows and their geometry, shared by every browser
+state_store = StateStore(Path("desktop-state.json"), Path("desktop-state.log"))
+# Remote shortcut icons cached locally; WARMBOS_ICON_PROXY=0 turns it off
+icon_proxy = None
+if os.environ.get('WARMBOS_ICON_PROXY', '1') != '0':
+    icon_proxy = IconProxy(
+        StaticAssets.CACHE_DIR / "iconproxy",
+        max_bytes=int(os.environ.get('WARMBOS_ICON_PROXY_CACHE_MB', '64')) * 1024 * 1024,
+        # Only for a local stand-in server in tests; the proxy must not reach internal hosts
+        allow_private=os.environ.get('WARMBOS_ICON_PROXY_ALLOW_PRIVATE') == '1'
+    )
+
+def run_sync_job(job):
+    """Run one scheduled sync, then refresh the icon caches"""
+    if icon_manager.sync_icons(delta=job.delta, job=job):
+        icon_assets.warm()
+
+sync_scheduler = SyncScheduler(run_sync_job, IconManager.DOWNLOAD_DIR)
+
+def start_background_services():
+    """Start per-process background threads
+    
+    Called once in each serving process; under a pre-forking server that
+    means after the fork, since threads do not survive it.
+    """
+    # Record metrics history from startup, not just while someone is watching
+    metrics_broadcaster.start()
+    system_info_collector.start()
+    
+    # Every worker asks, but the shared job file lets only the first one start a sync
+    if not icon_manager.ICONS_DIR.exists() or not icon_manager.MANIFEST_FILE.exists():
+        job, created = sync_scheduler.submit()
+        if created:
+            print(f"Icons not found, syncing on startup (job {job['id']})...")
+
+HISTORY_RANGE_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+HISTORY_RANGE = re.compile(r'^([0-9]{1,9})([smhd]?)$')
+
+def parse_range(value):
+    """Parse a range like '90', '15m', '24h' or '30d' into seconds"""
+    match = HISTORY_RANGE.match(value.strip().lower())
+    if match is None:
+        raise ValueError(f"Invalid range: {value}")
+    return int(match.group(1)) * HISTORY_RANGE_UNITS[match.group(2)]
+
+def parse_icon_size(args):
+    """Read the optional ?s= icon size in pixels"""
+    if 's' not in args:
+        return None
+    size = int(args['s'])
+    if size <= 0:
+        raise ValueError("size must be positive")
+    return size
 
 def setup_api_routes(app):
     """Register all API routes"""
@@ -20,11 +97,42 @@ def setup_api_routes(app):
     def system_info():
         """Get comprehensive system information"""
         try:
-            return jsonify(get_system_info())
+            return jsonify(system_info_collector.snapshot())
         except Exception as e:
             print(f"System info error: {e}")
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/system/stream')
+    def system_stream():
+        """Stream live system metrics as Server-Sent Events"""
+        try:
+            frames = metrics_broadcaster.stream()
+        except TooManySubscribers:
+            retry = metrics_broadcaster.RETRY_AFTER
+            response = Response(f"retry: {retry * 1000}\n\n", status=503, mimetype='text/event-stream')
+            response.headers['Retry-After'] = str(retry)
+            return response
+        return Response(
+            frames,
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @app.route('/api/system/history')
+    def system_history():
+        """Get recorded metrics for a time range"""
+        metric = request.args.get('metric', 'cpu')
+        if metric not in METRICS:
+            return jsonify({"error": f"Unknown metric. Use one of: {', '.join(METRICS)}"}), 400
+        try:
+            seconds = parse_range(request.args.get('range', '1h'))
+        except ValueError:
+            return jsonify({"error": "Invalid range. Use seconds or a value like 15m, 24h, 30d"}), 400
+        if seconds <= 0:
+            return jsonify({"error": "Range must be positive"}), 400
+        
+        return jsonify(metrics_history.query(metric, seconds))
+
     # Legacy endpoint for compatibility
     @app.route('/api/system-info')
     def get_system_info_legacy():
@@ -33,17 +141,35 @@ def setup_api_routes(app):
 
     @app.route('/icons/<path:filename>')
     def serve_icon(filename):
-        """Serve icons from the icons directory"""
-        icons_dir = Path("icons")
-        if icons_dir.exists():
-            try:
-                return send_from_directory(str(icons_dir), filename)
-            except FileNotFoundError:
+        """Serve icons from the icons directory, optionally resized with ?s=<px>"""
+        try:
+            size = parse_icon_size(request.args)
+        except ValueError:
+            return jsonify({"error": "s must be a positive size in pixels"}), 400
+        
+        if icon_manager.ICONS_DIR.exists():
+            response = icon_assets.send(filename, version=request.args.get('v'), size=size)
+            if response is None:
                 print(f"Icon not found: {filename}")
                 return jsonify({"error": f"Icon not found: {filename}"}), 404
+            return response
         else:
             return jsonify({"error": "Icons directory not found. Sync icons first."}), 404
 
+    @app.route('/api/icons/objects/<name>')
+    def serve_icon_object(name):
+        """Serve an icon by content hash (<hash>.<ext>), one URL per unique image"""
+        file_hash = name.split('.', 1)[0]
+        try:
+            size = parse_icon_size(request.args)
+        except ValueError:
+            return jsonify({"error": "s must be a positive size in pixels"}), 400
+        
+        response = icon_objects.send(f"{file_hash[:2]}/{name}", version=file_hash, size=size)
+        if response is None:
+            return jsonify({"error": f"Icon object not found: {name}"}), 404
+        return response
+
     @app.route('/js/icon-manifest.json')
     def serve_icon_manifest():
         """Serve icon manifest"""
@@ -54,20 +180,185 @@ def setup_api_routes(app):
             # Return empty manifest if not found
             return jsonify({"icons": [], "categories": {}, "total_count": 0})
 
+    @app.route('/js/icon-manifest/<path:filename>')
+    def serve_sharded_manifest(filename):
+        """Serve the sharded manifest root index and content-hashed shards"""
+        manifest_dir = icon_manager.MANIFEST_DIR.resolve()
+        path = (manifest_dir / filename).resolve()
+        if path.parent != manifest_dir or not path.is_file():
+            return jsonify({"error": f"Manifest file not found: {filename}"}), 404
+        
+        # Shard names embed their content hash; only the root index changes in place
+        if filename == icon_manager.MANIFEST_INDEX:
+            return send_precompressed(path)
+        shard_hash = filename.rsplit('.', 2)[-2] if filename.count('.') >= 2 else None
+        return send_precompressed(path, etag=shard_hash, max_age=31536000, immutable=True)
+
+    @app.route('/api/icons/bundle', methods=['GET', 'POST'])
+    def icon_bundle():
+        """Bundle a set of icons into one SVG sprite and one PNG atlas"""
+        if request.method == 'POST':
+            data = request.get_json(silent=True)
+            if data is None:
+                data = {}
+            if not isinstance(data, dict):
+                return jsonify({"error": "Body must be a JSON object"}), 400
+            paths = data.get('paths', [])
+            size = data.get('size', IconBundler.DEFAULT_SIZE)
+        else:
+            paths = [p for p in request.args.get('paths', '').split(',') if p]
+            size = request.args.get('size', IconBundler.DEFAULT_SIZE)
+        
+        if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+            return jsonify({"error": "paths must be a list of icon paths"}), 400
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            return jsonify({"error": "size must be an integer"}), 400
+        try:
+            result = icon_bundler.bundle(paths, size)
+        except (BundleError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        response = jsonify(result)
+        response.set_etag(result["key"])
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    @app.route('/api/icons/bundle/<name>')
+    def icon_bundle_asset(name):
+        """Serve a built sprite or atlas; names are content-addressed"""
+        path = icon_bundler.asset_path(name)
+        if path is None:
+            return jsonify({"error": f"Bundle not found: {name}"}), 404
+        return send_precompressed(path, etag=path.stem, max_age=StaticAssets.IMMUTABLE_MAX_AGE, immutable=True)
+
+    @app.route('/api/iconproxy')
+    def serve_proxied_icon():
+        """Serve a remote icon (?url=) from the local cache, fetching it on first use"""
+        if icon_proxy is None:
+            return jsonify({"error": "Icon proxy is disabled"}), 404
+        try:
+            return icon_proxy.send(request.args.get('url', ''))
+        except IconProxyError as e:
+            return jsonify({"error": str(e)}), e.status
+
+    @app.route('/api/icons/search')
+    def search_icons():
+        """Search the icon index with paging and category/type filters"""
+        try:
+            page = int(request.args.get('page', 1))
+            per_page = min(max(int(request.args.get('per_page', 100)), 1), 500)
+        except ValueError:
+            return jsonify({"error": "page and per_page must be integers"}), 400
+        
+        results = icon_manager.get_index().search(
+            query=request.args.get('q', ''),
+            category=request.args.get('category') or None,
+            icon_type=request.args.get('type') or None,
+            unique=request.args.get('unique') in ('1', 'true'),
+            page=page,
+            per_page=per_page
+        )
+        return jsonify(results)
+
+    @app.route('/api/icons/categories')
+    def icon_categories():
+        """Get icon counts per category"""
+        icon_type = request.args.get('type') or None
+        return jsonify({"categories": icon_manager.catalog.category_counts(icon_type)})
+
     @app.route('/api/icons/status')
     def icons_status():
         """Get icon repository status"""
-        return jsonify(icon_manager.get_status())
+        status = icon_manager.get_status()
+        # The sync may be running in another worker
+        status["sync_status"] = sync_scheduler.latest() or status["sync_status"]
+        return jsonify(status)
 
     @app.route('/api/icons/sync', methods=['POST'])
     def sync_icons():
-        """Trigger icon synchronization in background"""
-        def sync_in_background():
-            icon_manager.sync_icons()
+        """Queue an icon sync, or return the one already queued or running"""
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Body must be a JSON object"}), 400
+        job, created = sync_scheduler.submit(delta=data.get('delta', True) is not False)
         
-        # Start sync in background thread
-        thread = threading.Thread(target=sync_in_background)
-        thread.daemon = True
-        thread.start()
+        return jsonify({
+            "success": True,
+            "message": "Icon sync started" if created else "Icon sync already in progress",
+            "deduplicated": not created,
+            "job": job
+        }), 202
+
+    @app.route('/api/icons/sync/<job_id>')
+    def sync_job_status(job_id):
+        """Get the state of a sync job"""
+        job = sync_scheduler.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Sync job not found: {job_id}"}), 404
+        return jsonify(job)
+
+    @app.route('/api/icons/sync/<job_id>/cancel', methods=['POST'])
+    def cancel_sync_job(job_id):
+        """Cancel a queued or running sync job"""
+        job = sync_scheduler.cancel(job_id)
+        if job is None:
+            return jsonify({"error": f"Sync job not found: {job_id}"}), 404
+        return jsonify(job)
+
+    @app.route('/api/icons/sync/<job_id>/stream')
+    def sync_job_stream(job_id):
+        """Stream a sync job's progress as Server-Sent Events until it finishes"""
+        job = sync_scheduler.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Sync job not found: {job_id}"}), 404
+        return Response(
+            sync_scheduler.stream(job_id),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @app.route('/api/state')
+    def get_desktop_state():
+        """Get the desktop state with its revision as the ETag"""
+        revision, updated, state = state_store.get()
+        response = jsonify({"revision": revision, "updated": updated, "state": state})
+        response.set_etag(str(revision))
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    @app.route('/api/state', methods=['PATCH'])
+    def patch_desktop_state():
+        """Apply a JSON patch to the desktop state, guarded by If-Match"""
+        if 'If-Match' not in request.headers:
+            return jsonify({"error": "If-Match header required; reload and try again"}), 428
+        
+        operations = request.get_json(force=True, silent=True)
+        if not isinstance(operations, list):
+            return jsonify({"error": "Body must be a JSON patch array"}), 400
+        
+        if_revision = None
+        if not request.if_match.star_tag:
+            try:
+                if_revision = int(next(iter(request.if_match.as_set())))
+            except (StopIteration, ValueError):
+                return jsonify({"error": "If-Match must be a revision from GET /api/state"}), 400
+        
+        try:
+            revision = state_store.patch(operations, if_revision=if_revision)
+        except RevisionConflict as e:
+            response = jsonify({"error": "Desktop state was changed elsewhere; reload and try again"})
+            response.status_code = 412
+            response.set_etag(str(e.current_revision))
+            return response
+        except JsonPatchError as e:
+            return jsonify({"error": f"Invalid patch: {e}"}), 400
+        except OSError as e:
+            return jsonify({"error": f"Could not save desktop state: {e}"}), 500
         
-        return jsonify({"success": True, "message": "Icon sync started"})
\ No newline at end of file
+        response = jsonify({"revision": revision})
+        response.set_etag(str(revision))
+        return response
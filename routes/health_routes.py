@@ -0,0 +1,40 @@
+"""
+Health routes for WarmbOS
+Liveness and readiness probes that answer from memory
+"""
+
+from flask import jsonify
+
+from routes.api_routes import icon_manager
+from routes.static_routes import config_database, settings_store, shortcuts_store
+
+def readiness_checks():
+    """Name -> passed for everything a process needs before taking traffic"""
+    if config_database is not None:
+        config_ready = config_database.loaded
+    else:
+        config_ready = settings_store.loaded and shortcuts_store.loaded
+    return {
+        "config": config_ready,
+        "icons": icon_manager.icons_ready()
+    }
+
+def setup_health_routes(app):
+    """Register /healthz and /readyz"""
+    
+    @app.route('/healthz')
+    def healthz():
+        """Liveness: the process is up and handling requests"""
+        response = jsonify({"status": "ok"})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    
+    @app.route('/readyz')
+    def readyz():
+        """Readiness: configuration is loaded and the icon catalog is in place"""
+        checks = readiness_checks()
+        ready = all(checks.values())
+        response = jsonify({"ready": ready, "checks": checks})
+        response.status_code = 200 if ready else 503
+        response.headers['Cache-Control'] = 'no-store'
+        return response
@@ -0,0 +1,120 @@
+"""
+Metrics routes for WarmbOS
+Times every request and serves the collected metrics at /metrics
+"""
+
+import os
+import time
+
+from flask import Response, g, request
+
+from services.instrumentation import registry
+
+# Requests slower than this are logged with their route and status
+SLOW_REQUEST_SECONDS = float(os.environ.get('WARMBOS_SLOW_REQUEST_SECONDS', '1.0'))
+
+# Endpoints whose responses count towards the icon byte and 304 metrics
+ICON_ENDPOINTS = {'serve_icon', 'serve_icon_object', 'icon_bundle_asset'}
+
+REQUESTS = registry.counter(
+    'warmbos_http_requests_total',
+    'HTTP requests by route, method and status',
+    labels=('route', 'method', 'status')
+)
+REQUEST_SECONDS = registry.histogram(
+    'warmbos_http_request_duration_seconds',
+    'Time to produce a response, by route',
+    labels=('route', 'method')
+)
+IN_FLIGHT = registry.gauge(
+    'warmbos_http_requests_in_flight',
+    'Requests currently being handled, by route',
+    labels=('route',)
+)
+RESPONSE_BYTES = registry.counter(
+    'warmbos_http_response_bytes_total',
+    'Response body bytes with a known length, by route',
+    labels=('route',)
+)
+SLOW_REQUESTS = registry.counter(
+    'warmbos_http_slow_requests_total',
+    'Requests slower than the slow request threshold, by route',
+    labels=('route',)
+)
+ICON_RESPONSES = registry.counter(
+    'warmbos_icon_responses_total',
+    'Icon responses, split into full bodies and 304 Not Modified',
+    labels=('result',)
+)
+ICON_BYTES = registry.counter(
+    'warmbos_icon_bytes_served_total',
+    'Icon body bytes sent'
+)
+PROCESS_MEMORY = registry.gauge('process_resident_memory_bytes', 'Resident memory size in bytes')
+PROCESS_CPU = registry.counter('process_cpu_seconds_total', 'Total user and system CPU time in seconds')
+PROCESS_START = registry.gauge('process_start_time_seconds', 'Start time of the process since the epoch')
+
+_process = None
+
+def collect_process_metrics():
+    global _process
+    # Created on the first scrape, in the worker itself rather than a pre-fork parent
+    if _process is None or _process.pid != os.getpid():
+        import psutil
+        _process = psutil.Process()
+    with _process.oneshot():
+        PROCESS_MEMORY.set(_process.memory_info().rss)
+        cpu = _process.cpu_times()
+        PROCESS_CPU.set(cpu.user + cpu.system)
+        PROCESS_START.set(_process.create_time())
+
+registry.add_collector(collect_process_metrics)
+
+def route_label():
+    """The matched URL rule, so paths with parameters share one series"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def setup_metrics_routes(app):
+    """Register request instrumentation hooks and the /metrics endpoint"""
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_route = route_label()
+        g.metrics_start = time.perf_counter()
+        IN_FLIGHT.inc(route=g.metrics_route)
+
+    @app.after_request
+    def record_request(response):
+        route = g.get('metrics_route')
+        if route is None:
+            return response
+
+        elapsed = time.perf_counter() - g.metrics_start
+        REQUEST_SECONDS.observe(elapsed, route=route, method=request.method)
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+
+        length = response.content_length
+        if length:
+            RESPONSE_BYTES.inc(length, route=route)
+
+        if request.endpoint in ICON_ENDPOINTS and response.status_code in (200, 304):
+            ICON_RESPONSES.inc(result='not_modified' if response.status_code == 304 else 'full')
+            if length:
+                ICON_BYTES.inc(length)
+
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            SLOW_REQUESTS.inc(route=route)
+            print(f"Slow request: {request.method} {request.full_path.rstrip('?')} -> "
+                  f"{response.status_code} in {elapsed * 1000:.0f} ms")
+        return response
+
+    @app.teardown_request
+    def finish_request(_error=None):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            IN_FLIGHT.dec(route=route)
+
+    @app.route('/metrics')
+    def metrics():
+        """Metrics of this process in the Prometheus text format"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
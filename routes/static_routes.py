@@ -3,11 +3,152 @@ Static file and configuration routes for WarmbOS
 Handles serving files, settings, and shortcuts
 """
 
-from flask import send_from_directory, jsonify, request
-import json
 import os
-import tempfile
-import shutil
+from pathlib import Path
+
+from flask import Response, send_from_directory, jsonify, redirect, request
+
+from routes.api_routes import icon_proxy
+from services.config_database import ConfigDatabase, valid_profile
+from services.config_store import ConfigStore, PreconditionFailed
+from services.frontend_bundler import FrontendBundler
+from services.shortcut_health import ShortcutHealthProber
+from services.static_assets import StaticAssets
+from services.wallpaper_pipeline import WallpaperPipeline
+from utils.http_utils import content_hash, send_precompressed
+
+# Parsed configuration documents, served from memory
+settings_store = ConfigStore('settings.json')
+shortcuts_store = ConfigStore('shortcuts.json')
+
+# Optional SQLite backend with separate settings and shortcuts per profile.
+# WARMBOS_CONFIG_DB names the database; without it the JSON files are used.
+# Relative names are kept in WARMBOS_DATA_DIR, outside the served tree
+DATA_DIR = Path(os.environ.get('WARMBOS_DATA_DIR', '~/.local/share/warmbos')).expanduser()
+config_database = None
+if os.environ.get('WARMBOS_CONFIG_DB'):
+    database_path = DATA_DIR / os.environ['WARMBOS_CONFIG_DB']
+    database_path.parent.mkdir(parents=True, exist_ok=True)
+    config_database = ConfigDatabase(database_path)
+PROFILE_HEADER = os.environ.get('WARMBOS_PROFILE_HEADER', 'X-WarmbOS-Profile')
+PROFILE_COOKIE = 'warmbos_profile'
+# Saved shortcuts load remote icons through /api/iconproxy instead of the origin
+ICON_PROXY_REWRITE = os.environ.get('WARMBOS_ICON_PROXY_REWRITE', '1') != '0'
+
+# Everything else under the project root, revalidated by ETag unless hashed
+static_assets = StaticAssets('.')
+# Server code and runtime state kept next to the frontend files; never served
+PRIVATE_NAMES = {
+    'desktop-state.json', 'metrics-live.json', '__pycache__',
+    'icons.store', 'icons.download', 'icons.staging', 'icons.old', 'icons.link'
+}
+PRIVATE_SUFFIXES = (
+    '.db', '.db-wal', '.db-shm', '.db-journal', '.sqlite', '.sqlite3',
+    '.log', '.lock', '.bin', '.tmp', '.py', '.pyc'
+)
+
+# Desktop page and app windows with their scripts and styles bundled.
+# WARMBOS_BUNDLE=0 serves the source files instead, e.g. while editing JS
+frontend_bundler = None
+if os.environ.get('WARMBOS_BUNDLE', '1') != '0':
+    frontend_bundler = FrontendBundler(
+        '.',
+        StaticAssets.CACHE_DIR / "frontend",
+        in_memory=os.environ.get('WARMBOS_BUNDLE_IN_MEMORY') == '1'
+    )
+
+def config_documents(name):
+    """Every settings or shortcuts document in use, across profiles"""
+    if config_database is None:
+        return [(settings_store if name == 'settings' else shortcuts_store).get()[0]]
+    return [config_database.document(profile, name).get()[0] for profile in config_database.profiles()]
+
+# Reachability of web shortcuts, checked in the background and served from memory
+shortcut_prober = ShortcutHealthProber(
+    lambda: config_documents('shortcuts'),
+    interval=float(os.environ.get('WARMBOS_SHORTCUT_HEALTH_INTERVAL', '60')),
+    timeout=float(os.environ.get('WARMBOS_SHORTCUT_HEALTH_TIMEOUT', '5')),
+    results_path=StaticAssets.CACHE_DIR / "shortcut-health.json"
+)
+
+# Downscaled copies of each backgroundImage, built when the setting is saved
+wallpaper_pipeline = WallpaperPipeline(
+    StaticAssets.CACHE_DIR / "wallpapers",
+    # Only for a local stand-in server in tests; the fetch must not reach internal hosts
+    allow_private=os.environ.get('WARMBOS_WALLPAPER_ALLOW_PRIVATE') == '1'
+)
+
+def prepare_wallpapers():
+    """Build wallpaper variants for every profile that does not have them yet"""
+    for settings in config_documents('settings'):
+        url = settings.get('backgroundImage')
+        if url:
+            wallpaper_pipeline.prepare(url)
+
+def private_file(filename):
+    """Whether a path under the project root must not be served
+
+    Hidden files and directories (the static cache, manifest cache, git
+    metadata), server code, logs, locks and databases are refused, as is
+    the configured database under any name if it lives in the root.
+    """
+    parts = filename.replace('\\', '/').lower().split('/')
+    if any(part.startswith('.') or part in PRIVATE_NAMES or part.endswith(PRIVATE_SUFFIXES) for part in parts):
+        return True
+    if config_database is not None:
+        database = os.path.realpath(config_database.path)
+        return os.path.realpath(filename).startswith(database)
+    return False
+
+def request_profile():
+    """Profile named by the request: header, then ?profile=, then cookie"""
+    return (request.headers.get(PROFILE_HEADER)
+            or request.args.get('profile')
+            or request.cookies.get(PROFILE_COOKIE)
+            or 'default')
+
+def config_store(name):
+    """The store for settings or shortcuts, or None for an invalid profile"""
+    if config_database is None:
+        return settings_store if name == 'settings' else shortcuts_store
+    profile = request_profile()
+    if not valid_profile(profile):
+        return None
+    return config_database.document(profile, name)
+
+def serve_config(store):
+    """Serve a config document with its ETag, answering 304 when unchanged"""
+    _data, body, etag = store.get()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    if config_database is not None:
+        response.vary.update((PROFILE_HEADER, 'Cookie'))
+    return response.make_conditional(request)
+
+def save_config(store, data):
+    """Save a config document, requiring If-Match to guard against lost updates
+
+    Always returns a Response, so callers can check its status_code.
+    """
+    if 'If-Match' not in request.headers:
+        response = jsonify({"error": "If-Match header required; reload and try again"})
+        response.status_code = 428
+        return response
+    
+    if_match = request.if_match
+    accepted = {'*'} if if_match.star_tag else set(if_match.as_set())
+    try:
+        etag = store.update(data, if_match=accepted)
+    except PreconditionFailed as e:
+        response = jsonify({"error": "Configuration was changed elsewhere; reload and try again"})
+        response.status_code = 412
+        response.set_etag(e.current_etag)
+        return response
+    
+    response = jsonify({"success": True})
+    response.set_etag(etag)
+    return response
 
 def setup_static_routes(app):
     """Register all static file and configuration routes"""
@@ -15,12 +156,27 @@ def setup_static_routes(app):
     @app.route('/')
     def index():
         """Serve main desktop page"""
+        if frontend_bundler is not None:
+            response = frontend_bundler.send_page(FrontendBundler.DESKTOP_PAGE)
+            if response is not None:
+                return response
         return send_from_directory('.', 'desktop.html')
 
+    @app.route('/bundle/<name>')
+    def frontend_bundle_asset(name):
+        """Serve a content-hashed script or stylesheet of the desktop bundle"""
+        response = frontend_bundler.send_asset(name) if frontend_bundler is not None else None
+        if response is None:
+            return jsonify({"error": "Bundle not found"}), 404
+        return response
+
     @app.route('/shortcuts.json')
     def get_shortcuts():
         """Get shortcuts configuration"""
-        return send_from_directory('.', 'shortcuts.json')
+        store = config_store('shortcuts')
+        if store is None:
+            return jsonify({"error": "Invalid profile name"}), 400
+        return serve_config(store)
 
     @app.route('/shortcuts.json', methods=['POST'])
     def save_shortcuts():
@@ -34,25 +190,40 @@ def setup_static_routes(app):
             if not isinstance(data, dict):
                 return jsonify({"error": "Shortcuts must be an object"}), 400
             
-            # Atomic write with cross-platform handling
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', dir='.', delete=False) as temp_file:
-                json.dump(data, temp_file, indent=2)
-                temp_name = temp_file.name
-            
-            # Replace original file
-            if os.path.exists('shortcuts.json'):
-                os.remove('shortcuts.json')
-            shutil.move(temp_name, 'shortcuts.json')
+            remote_icons = []
+            if icon_proxy is not None and ICON_PROXY_REWRITE:
+                data, remote_icons = icon_proxy.rewrite_shortcuts(data)
             
-            return jsonify({"success": True})
+            store = config_store('shortcuts')
+            if store is None:
+                return jsonify({"error": "Invalid profile name"}), 400
+            response = save_config(store, data)
+            if response.status_code == 200:
+                # Warm the cache so the next desktop render does not wait on the origin
+                if remote_icons:
+                    icon_proxy.prefetch(remote_icons)
+                shortcut_prober.refresh()
+            return response
         except Exception as e:
             print(f"Shortcuts save error: {e}")
             return jsonify({"error": str(e)}), 500
 
+    @app.route('/api/shortcuts/health')
+    def get_shortcut_health():
+        """Cached status and latency of every web shortcut"""
+        body, etag = shortcut_prober.snapshot()
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
     @app.route('/settings.json')
     def get_settings():
         """Get application settings"""
-        return send_from_directory('.', 'settings.json')
+        store = config_store('settings')
+        if store is None:
+            return jsonify({"error": "Invalid profile name"}), 400
+        return serve_config(store)
 
     @app.route('/settings.json', methods=['POST'])
     def save_settings():
@@ -79,22 +250,92 @@ def setup_static_routes(app):
                 if not isinstance(prefs, dict):
                     return jsonify({"error": "Preferences must be an object"}), 400
             
-            # Atomic write with cross-platform handling
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', dir='.', delete=False) as temp_file:
-                json.dump(data, temp_file, indent=2)
-                temp_name = temp_file.name
-            
-            # Replace original file
-            if os.path.exists('settings.json'):
-                os.remove('settings.json')
-            shutil.move(temp_name, 'settings.json')
-            
-            return jsonify({"success": True})
+            store = config_store('settings')
+            if store is None:
+                return jsonify({"error": "Invalid profile name"}), 400
+            response = save_config(store, data)
+            # Build the downscaled copies now so the next desktop load gets them
+            url = data.get('backgroundImage')
+            if response.status_code == 200 and url:
+                wallpaper_pipeline.prepare(url)
+            return response
         except Exception as e:
             print(f"Settings save error: {e}")
             return jsonify({"error": str(e)}), 500
 
+    @app.route('/api/wallpaper')
+    def get_wallpaper():
+        """The background image with its placeholder, once its variants are built"""
+        store = config_store('settings')
+        if store is None:
+            return jsonify({"error": "Invalid profile name"}), 400
+        url = store.get()[0].get('backgroundImage') or ''
+        manifest = wallpaper_pipeline.manifest(url)
+        if manifest is None and url:
+            wallpaper_pipeline.prepare(url)
+        
+        result = {"url": url, "ready": manifest is not None}
+        if manifest is not None:
+            result.update({
+                "image": "/api/wallpaper/image",
+                "placeholder": manifest["placeholder"],
+                "width": manifest["width"],
+                "height": manifest["height"]
+            })
+        response = jsonify(result)
+        response.set_etag(content_hash(response.get_data()))
+        response.cache_control.no_cache = True
+        if config_database is not None:
+            response.vary.update((PROFILE_HEADER, 'Cookie'))
+        return response.make_conditional(request)
+
+    @app.route('/api/wallpaper/image')
+    def wallpaper_image():
+        """Redirect to the best variant for ?w= device pixels and the formats the client accepts"""
+        store = config_store('settings')
+        if store is None:
+            return jsonify({"error": "Invalid profile name"}), 400
+        url = store.get()[0].get('backgroundImage') or ''
+        manifest = wallpaper_pipeline.manifest(url)
+        if manifest is None:
+            if not url:
+                return jsonify({"error": "No background image set"}), 404
+            wallpaper_pipeline.prepare(url)
+            response = redirect(url)
+        else:
+            try:
+                width = min(max(int(request.args.get('w', 0)), 0), 16384)
+            except ValueError:
+                return jsonify({"error": "w must be a width in pixels"}), 400
+            webp = request.accept_mimetypes['image/webp'] > 0
+            variant = wallpaper_pipeline.choose(manifest, width, webp=webp)
+            response = redirect(f"/api/wallpaper/{variant['name']}")
+        # The redirect depends on the current setting; the target is immutable
+        response.cache_control.no_cache = True
+        response.vary.add('Accept')
+        if config_database is not None:
+            response.vary.update((PROFILE_HEADER, 'Cookie'))
+        return response
+
+    @app.route('/api/wallpaper/<name>')
+    def wallpaper_variant(name):
+        """Serve a wallpaper variant; names are content hashes"""
+        path = wallpaper_pipeline.variant_path(name)
+        if path is None:
+            return jsonify({"error": f"Wallpaper not found: {name}"}), 404
+        return send_precompressed(path, etag=path.stem, max_age=StaticAssets.IMMUTABLE_MAX_AGE,
+                                  immutable=True, variants={})
+
     @app.route('/<path:filename>')
     def serve_file(filename):
         """Serve any other static file"""
-        return send_from_directory('.', filename)
\ No newline at end of file
+        if private_file(filename):
+            return jsonify({"error": f"File not found: {filename}"}), 404
+        if frontend_bundler is not None and frontend_bundler.bundles(filename):
+            response = frontend_bundler.send_page(filename)
+            if response is not None:
+                return response
+        response = static_assets.send(filename, version=request.args.get('v'))
+        if response is None:
+            return jsonify({"error": f"File not found: {filename}"}), 404
+        return response
\ No newline at end of file
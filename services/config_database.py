@@ -0,0 +1,372 @@
+"""
+Configuration Database for WarmbOS
+Stores settings and shortcuts per profile in SQLite (WAL mode) with
+row-level updates, for deployments with more than one user
+"""
+
+import copy
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from services.config_store import PreconditionFailed
+from utils.http_utils import content_hash
+from utils.system_utils import DEFAULT_SETTINGS, DEFAULT_SHORTCUTS
+
+PROFILE_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Seed for a document a profile has never saved
+DEFAULT_DOCUMENTS = {
+    'settings': DEFAULT_SETTINGS,
+    'shortcuts': DEFAULT_SHORTCUTS
+}
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY,
+    created REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS documents (
+    profile TEXT NOT NULL REFERENCES profiles(name) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (profile, name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS items (
+    profile TEXT NOT NULL,
+    document TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (profile, document, key, position),
+    FOREIGN KEY (profile, document) REFERENCES documents(profile, name) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+def valid_profile(name):
+    """Whether name can be used as a profile namespace"""
+    return isinstance(name, str) and bool(PROFILE_PATTERN.match(name))
+
+def _rows(data):
+    """Split a document into its shape and {(key, position): value json} rows
+
+    A top-level list gets one row per element so editing one shortcut
+    touches one row; any other value is a single row at position -1.
+    """
+    shape = []
+    rows = {}
+    for key, value in data.items():
+        if isinstance(value, list):
+            shape.append([key, True])
+            for position, element in enumerate(value):
+                rows[(key, position)] = json.dumps(element, separators=(',', ':'))
+        else:
+            shape.append([key, False])
+            rows[(key, -1)] = json.dumps(value, separators=(',', ':'))
+    return shape, rows
+
+def _assemble(shape, rows):
+    """Inverse of _rows"""
+    elements = {}
+    for (key, position), value in sorted(rows.items()):
+        elements.setdefault(key, []).append(json.loads(value))
+    data = {}
+    for key, is_list in shape:
+        values = elements.get(key, [])
+        data[key] = values if is_list else values[0]
+    return data
+
+def _encode(data):
+    """Body and ETag exactly as ConfigStore serves them"""
+    body = json.dumps(data, indent=2).encode('utf-8')
+    return body, content_hash(body)
+
+class ConnectionPool:
+    """A few SQLite connections shared by request threads
+
+    Connections are opened lazily up to size and handed out LIFO so an
+    idle pool keeps reusing the same warm connection. A forked worker
+    drops connections inherited from its parent and opens its own.
+    """
+
+    def __init__(self, path, size=4, timeout=5.0):
+        self.path = str(path)
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the block"""
+        self._check_fork()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open_or_wait()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _open_or_wait(self):
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except BaseException:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("no database connection available") from None
+
+    def _connect(self):
+        # Transactions are explicit (BEGIN IMMEDIATE), so run in autocommit
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        return conn
+
+    def _check_fork(self):
+        if os.getpid() == self._pid:
+            return
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._idle = queue.LifoQueue()
+                self._opened = 0
+                self._pid = os.getpid()
+
+class ConfigDatabase:
+    """Settings and shortcuts for any number of profiles in one database
+
+    document(profile, name) returns an object with the same get / update
+    interface as ConfigStore, so the config routes work with either.
+    Readers in WAL mode never block the writer, and each profile's
+    documents are found through the primary key.
+    """
+
+    def __init__(self, path, pool_size=4):
+        self.path = Path(path)
+        self.pool = ConnectionPool(self.path, size=pool_size)
+        self._documents = {}
+        self._lock = threading.Lock()
+        self._ready = False
+        self._init_schema()
+
+    @property
+    def loaded(self):
+        """Whether the schema is in place and the database answers queries"""
+        return self._ready
+
+    def document(self, profile, name):
+        """The ProfileDocument for a profile; raises ValueError for a bad name"""
+        if not valid_profile(profile):
+            raise ValueError(f"Invalid profile name: {profile!r}")
+        if name not in DEFAULT_DOCUMENTS:
+            raise ValueError(f"Unknown config document: {name!r}")
+        key = (profile, name)
+        with self._lock:
+            if key not in self._documents:
+                self._documents[key] = ProfileDocument(self, profile, name)
+            return self._documents[key]
+
+    def profiles(self):
+        """Names of all profiles that have saved a document"""
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute('SELECT name FROM profiles ORDER BY name')]
+
+    def import_json(self, profile, paths):
+        """Import {document name: JSON file} into a profile
+
+        Documents the profile already has are left alone, so this is safe
+        to run on every start. Returns the names that were imported.
+        """
+        imported = []
+        for name, path in paths.items():
+            path = Path(path)
+            if not path.exists():
+                continue
+            try:
+                data = json.loads(path.read_bytes())
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path} during import: {e}")
+                continue
+            if not isinstance(data, dict):
+                print(f"Skipping {path} during import: not a JSON object")
+                continue
+            if self.document(profile, name).create(data):
+                imported.append(name)
+        if imported:
+            print(f"Imported {', '.join(imported)} into profile '{profile}'")
+        return imported
+
+    @contextmanager
+    def transaction(self):
+        """A write transaction; BEGIN IMMEDIATE takes the write lock up front"""
+        with self.pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def _init_schema(self):
+        try:
+            with self.transaction() as conn:
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version < SCHEMA_VERSION:
+                    for statement in SCHEMA.split(';'):
+                        if statement.strip():
+                            conn.execute(statement)
+                    conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+            self._ready = True
+        except sqlite3.Error as e:
+            print(f"Failed to open config database {self.path}: {e}")
+
+class ProfileDocument:
+    """One profile's settings or shortcuts, cached until its revision changes
+
+    get() costs one primary-key lookup of the revision while the cached
+    copy is current. update() diffs the new document against the stored
+    rows and writes only the rows that changed, checking If-Match against
+    the stored ETag inside the same transaction.
+    """
+
+    def __init__(self, database, profile, name):
+        self.database = database
+        self.profile = profile
+        self.name = name
+        self._lock = threading.Lock()
+        self._revision = None
+        self._data = None
+        self._body = None
+        self._etag = None
+
+    @property
+    def loaded(self):
+        """Whether the document has been read into memory"""
+        return self._data is not None
+
+    def get(self):
+        """Return (data, body bytes, etag) for the current document"""
+        with self._lock:
+            with self.database.pool.connection() as conn:
+                row = conn.execute(
+                    'SELECT revision, shape FROM documents WHERE profile = ? AND name = ?',
+                    (self.profile, self.name)
+                ).fetchone()
+                if row is None:
+                    revision, data = 0, copy.deepcopy(DEFAULT_DOCUMENTS[self.name])
+                elif row[0] == self._revision:
+                    return self._data, self._body, self._etag
+                else:
+                    revision, data = row[0], _assemble(json.loads(row[1]), self._load_rows(conn))
+
+            self._revision = revision
+            self._data = data
+            self._body, self._etag = _encode(data)
+            return self._data, self._body, self._etag
+
+    def update(self, data, if_match=None):
+        """Replace the document, rejecting it if if_match is stale
+
+        Same contract as ConfigStore.update. Returns the new ETag.
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Config documents must be JSON objects")
+        body, etag = _encode(data)
+        shape, rows = _rows(data)
+
+        with self._lock:
+            with self.database.transaction() as conn:
+                row = conn.execute(
+                    'SELECT revision, etag FROM documents WHERE profile = ? AND name = ?',
+                    (self.profile, self.name)
+                ).fetchone()
+                if row is None:
+                    revision = 0
+                    current_etag = _encode(DEFAULT_DOCUMENTS[self.name])[1]
+                    stored = {}
+                else:
+                    revision, current_etag = row
+                    stored = self._load_rows(conn)
+
+                if if_match is not None and '*' not in if_match and current_etag not in if_match:
+                    raise PreconditionFailed(current_etag)
+
+                self._write(conn, revision, etag, shape, rows, stored)
+
+            self._revision = revision + 1
+            self._data = data
+            self._body, self._etag = body, etag
+            return etag
+
+    def create(self, data):
+        """Store data if the profile has no such document yet; returns whether it did"""
+        body, etag = _encode(data)
+        shape, rows = _rows(data)
+        with self._lock:
+            with self.database.transaction() as conn:
+                exists = conn.execute(
+                    'SELECT 1 FROM documents WHERE profile = ? AND name = ?',
+                    (self.profile, self.name)
+                ).fetchone()
+                if exists:
+                    return False
+                self._write(conn, 0, etag, shape, rows, {})
+            self._revision = 1
+            self._data = data
+            self._body, self._etag = body, etag
+            return True
+
+    def _load_rows(self, conn):
+        return {
+            (key, position): value
+            for key, position, value in conn.execute(
+                'SELECT key, position, value FROM items WHERE profile = ? AND document = ?',
+                (self.profile, self.name)
+            )
+        }
+
+    def _write(self, conn, revision, etag, shape, rows, stored):
+        """Bump the revision and apply the row diff; caller holds the transaction"""
+        now = time.time()
+        conn.execute('INSERT OR IGNORE INTO profiles (name, created) VALUES (?, ?)', (self.profile, now))
+        conn.execute(
+            'INSERT INTO documents (profile, name, revision, etag, shape, updated) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (profile, name) DO UPDATE SET '
+            'revision = excluded.revision, etag = excluded.etag, shape = excluded.shape, updated = excluded.updated',
+            (self.profile, self.name, revision + 1, etag, json.dumps(shape), now)
+        )
+
+        removed = [key for key in stored if key not in rows]
+        changed = [(key, value) for key, value in rows.items() if stored.get(key) != value]
+        conn.executemany(
+            'DELETE FROM items WHERE profile = ? AND document = ? AND key = ? AND position = ?',
+            [(self.profile, self.name, key, position) for key, position in removed]
+        )
+        conn.executemany(
+            'INSERT OR REPLACE INTO items (profile, document, key, position, value) VALUES (?, ?, ?, ?, ?)',
+            [(self.profile, self.name, key, position, value) for (key, position), value in changed]
+        )
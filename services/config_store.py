@@ -0,0 +1,134 @@
+"""
+Configuration Store for WarmbOS
+Keeps settings.json and shortcuts.json parsed in memory with content-hash
+ETags, optimistic concurrency and durable writes
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from utils.http_utils import content_hash
+
+class PreconditionFailed(Exception):
+    """Raised when an update's If-Match ETag no longer matches the stored document"""
+
+    def __init__(self, current_etag):
+        super().__init__("Document was modified by another request")
+        self.current_etag = current_etag
+
+class ConfigStore:
+    """One JSON document served from memory and written through to disk
+
+    Reads only stat the file to pick up changes made by other processes.
+    An update holds an flock on a sidecar <name>.lock file while it
+    re-reads the file, checks the ETag and writes, so two worker
+    processes saving at once cannot both pass the check and one of them
+    gets a 412 instead of silently losing the other's change. Each write
+    goes to a temp file that is fsynced and swapped in with os.replace,
+    so the file is never missing or half-written.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self._lock = threading.RLock()
+        self._data = None
+        self._body = None
+        self._etag = None
+        self._stat_key = None
+
+    @property
+    def loaded(self):
+        """Whether the document has been read into memory"""
+        return self._data is not None
+
+    def get(self):
+        """Return (data, body bytes, etag) for the current document"""
+        with self._lock:
+            self._refresh()
+            return self._data, self._body, self._etag
+
+    def update(self, data, if_match=None):
+        """Replace the document, rejecting it if if_match is stale
+
+        if_match is a collection of acceptable ETags ('*' matches any);
+        None skips the check. Returns the new ETag.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            if if_match is not None and '*' not in if_match and self._etag not in if_match:
+                raise PreconditionFailed(self._etag)
+
+            body = json.dumps(data, indent=2).encode('utf-8')
+            self._write(body)
+            self._set(data, body)
+            stat = self.path.stat()
+            self._stat_key = (stat.st_mtime_ns, stat.st_size)
+            return self._etag
+
+    def _refresh(self):
+        """Reload from disk if the file changed"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            if self._data is None:
+                self._set({}, b'{}')
+            return
+
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key == self._stat_key:
+            return
+
+        body = self.path.read_bytes()
+        self._set(json.loads(body), body)
+        self._stat_key = stat_key
+
+    def _set(self, data, body):
+        self._data = data
+        self._body = body
+        self._etag = content_hash(body)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Serialize updates across worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, body):
+        """Durably replace the file with body"""
+        directory = self.path.parent
+        fd, temp_name = tempfile.mkstemp(suffix='.json', dir=str(directory))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(body)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_name, self.path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        # Persist the rename itself; directories cannot be opened on Windows
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(str(directory), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
@@ -0,0 +1,355 @@
+"""
+Frontend Bundler for WarmbOS
+Builds desktop.html with its components inlined, one minified bundle of
+the ES module graph and one stylesheet, served under content-hashed URLs
+"""
+
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+from pathlib import Path
+
+from utils.http_utils import ENCODINGS, compress, content_hash, send_precompressed, send_precompressed_bytes
+from utils.minify import minify_css, minify_js
+
+class BundleBuildError(Exception):
+    """Raised when a source uses something the bundler does not handle"""
+
+IMPORT_RE = re.compile(r'^import\s*(?:(\{[^}]*\}|\*\s*as\s+[\w$]+|[\w$]+)\s*from\s*)?[\'"]([^\'"]+)[\'"];?', re.M)
+DYNAMIC_IMPORT_RE = re.compile(r'\bimport\(\s*[\'"]([^\'"]+)[\'"]\s*\)')
+EXPORT_DECLARATION_RE = re.compile(r'^export\s+((?:async\s+)?function\*?|class|const|let|var)\s+([\w$]+)', re.M)
+EXPORT_LIST_RE = re.compile(r'^export\s*\{([^}]*)\}\s*;?', re.M)
+STYLESHEET_RE = re.compile(r'<link rel="stylesheet" href="([^"]+)">')
+APP_SCRIPT_RE = re.compile(r'<script type="text/plain" src="([^"]+)"></script>')
+CSS_IMPORT_RE = re.compile(r'@import\s+url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)\s*;')
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]*)\1\s*\)')
+ASSET_NAME_RE = re.compile(r'^[\w-]+\.[0-9a-f]{16}\.(html|js|css)$')
+
+# Loads the modules of a bundle on demand, like the browser's module loader
+RUNTIME = """const __cache = {};
+function __require(name) {
+if (!(name in __cache)) {
+__modules[name](__require, __load, __cache[name] = {});
+}
+return __cache[name];
+}
+function __load(name) {
+return new Promise(resolve => resolve(__require(name)));
+}
+__require(%s);
+"""
+
+class FrontendBundler:
+    """Serves the desktop page and app windows in as few requests as possible
+
+    desktop.html gets the taskbar and start menu inlined, its stylesheet
+    flattened into one file and js/main.js plus every module it imports
+    (statically or with import()) linked into one minified script. App
+    pages get their stylesheets and scripts inlined, so opening a window
+    is a single request. Scripts and stylesheets are served under
+    content-hashed names as immutable; pages are revalidated by ETag.
+
+    Outputs are written with .br/.gz siblings to cache_dir, where every
+    worker can serve them. With in_memory they are also kept in memory
+    after the first build. Each page request stats the page's sources
+    and rebuilds it when one changed. If a build fails the source page is
+    served as is, and the next change to a source retries.
+    """
+
+    DESKTOP_PAGE = "desktop.html"
+    ENTRY_SCRIPT = "js/main.js"
+    # Placeholder element id -> component inlined into it
+    COMPONENTS = {
+        "taskbar": "components/taskbar.html",
+        "start-menu": "components/start-menu.html"
+    }
+    APPS_DIR = "apps"
+    IMMUTABLE_MAX_AGE = 31536000
+
+    def __init__(self, root, cache_dir, in_memory=False):
+        self.root = Path(root)
+        self.cache_dir = Path(cache_dir)
+        self.in_memory = in_memory
+        self._lock = threading.Lock()
+        # page -> (source stat keys, output file name or None)
+        self._pages = {}
+        # output file name -> (body, encoded variants), with in_memory
+        self._assets = {}
+
+    def bundles(self, page):
+        """Whether page is built by the bundler rather than served as a file"""
+        return page == self.DESKTOP_PAGE or (
+            posixpath.dirname(page) == self.APPS_DIR and page.endswith('.html')
+            and (self.root / page).is_file()
+        )
+
+    def send_page(self, page):
+        """Response for a built page, or None to serve the source file"""
+        name = self._current_page(page)
+        return self._send(name, immutable=False) if name else None
+
+    def send_asset(self, name):
+        """Response for a hashed script or stylesheet, or None if unknown"""
+        if not ASSET_NAME_RE.match(name) or name.endswith('.html'):
+            return None
+        return self._send(name, immutable=True)
+
+    def warm(self):
+        """Build the desktop page ahead of the first request
+
+        Only builds; responses need a request context, which a warming
+        thread does not have.
+        """
+        if self._current_page(self.DESKTOP_PAGE) is not None:
+            print("Built frontend bundle")
+
+    def _current_page(self, page):
+        """Output name of a page, rebuilt if a source changed; None if the build failed"""
+        with self._lock:
+            entry = self._pages.get(page)
+            if entry is None or self._changed(entry[0]):
+                entry = self._pages[page] = self._build_page(page)
+        return entry[1]
+
+    def _send(self, name, immutable):
+        etag = name.split('.')[-2]
+        mimetype = mimetypes.guess_type(name)[0]
+        max_age = self.IMMUTABLE_MAX_AGE if immutable else 0
+        cached = self._assets.get(name)
+        if cached is not None:
+            body, variants = cached
+            return send_precompressed_bytes(body, mimetype, etag, variants, max_age=max_age, immutable=immutable)
+
+        path = self.cache_dir / name
+        if not path.is_file():
+            return None
+        return send_precompressed(path, etag=etag, max_age=max_age, immutable=immutable)
+
+    def _changed(self, sources):
+        for path, stat_key in sources.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return True
+            if (stat.st_mtime_ns, stat.st_size) != stat_key:
+                return True
+        return False
+
+    def _build_page(self, page):
+        sources = {}
+        try:
+            if page == self.DESKTOP_PAGE:
+                html = self._build_desktop(sources)
+            else:
+                html = self._build_app(page, sources)
+            name = self._emit(Path(page).stem, '.html', html)
+        except (BundleBuildError, OSError, UnicodeDecodeError) as e:
+            print(f"Frontend bundle for {page} failed, serving it unbundled: {e}")
+            name = None
+        return sources, name
+
+    def _build_desktop(self, sources):
+        html = self._read(self.DESKTOP_PAGE, sources)
+
+        for element_id, component in self.COMPONENTS.items():
+            placeholder = f'<div id="{element_id}"></div>'
+            if placeholder not in html:
+                raise BundleBuildError(f"{placeholder} not found in {self.DESKTOP_PAGE}")
+            # data-inlined tells main.js not to fetch the component again
+            inlined = f'<div id="{element_id}" data-inlined>{self._read(component, sources)}</div>'
+            html = html.replace(placeholder, inlined)
+
+        def replace_stylesheet(match):
+            css = self._flatten_css(match.group(1), sources, set())
+            name = self._emit('desktop', '.css', minify_css(css))
+            return f'<link rel="stylesheet" href="/bundle/{name}">'
+
+        html = STYLESHEET_RE.sub(replace_stylesheet, html)
+
+        entry_tag = f'<script type="module" src="{self.ENTRY_SCRIPT}"></script>'
+        if entry_tag not in html:
+            raise BundleBuildError(f"{entry_tag} not found in {self.DESKTOP_PAGE}")
+        name = self._emit('desktop', '.js', self._link_modules(self.ENTRY_SCRIPT, sources))
+        return html.replace(entry_tag, f'<script type="module" src="/bundle/{name}"></script>')
+
+    def _build_app(self, page, sources):
+        html = self._read(page, sources)
+        base = posixpath.dirname(page)
+
+        def inline_stylesheet(match):
+            css = self._flatten_css(posixpath.join(base, match.group(1)), sources, set())
+            return f'<style>\n{minify_css(css)}</style>'
+
+        def inline_script(match):
+            script = minify_js(self._read(posixpath.join(base, match.group(1)), sources))
+            # Keep the HTML parser from ending the element early
+            script = script.replace('</', '<\\/')
+            return f'<script type="text/plain">\n{script}</script>'
+
+        html = STYLESHEET_RE.sub(inline_stylesheet, html)
+        return APP_SCRIPT_RE.sub(inline_script, html)
+
+    def _flatten_css(self, stylesheet, sources, seen):
+        """Inline @imports (each file once) and make relative url()s absolute"""
+        stylesheet = posixpath.normpath(stylesheet)
+        seen.add(stylesheet)
+        base = posixpath.dirname(stylesheet)
+
+        def rebase(match):
+            quote, url = match.groups()
+            if not url or url.startswith(('/', '#', 'data:', 'http:', 'https:')):
+                return match.group(0)
+            return f"url({quote}/{posixpath.normpath(posixpath.join(base, url))}{quote})"
+
+        def inline_import(match):
+            imported = posixpath.normpath(posixpath.join(base, match.group(1)))
+            if imported in seen:
+                return ''
+            return self._flatten_css(imported, sources, seen)
+
+        css = CSS_URL_RE.sub(rebase, CSS_IMPORT_RE.sub(lambda m: f'@import "{m.group(1)}";', self._read(stylesheet, sources)))
+        return re.sub(r'@import "([^"]+)";', inline_import, css) + '\n'
+
+    def _link_modules(self, entry, sources):
+        """One script holding every module reachable from entry"""
+        modules = {}
+        static_imports = {}
+        pending = [entry]
+        while pending:
+            name = pending.pop()
+            if name in modules:
+                continue
+            body, static, dynamic = self._link_module(name, minify_js(self._read(name, sources)))
+            modules[name] = body
+            static_imports[name] = static
+            pending.extend(static + dynamic)
+
+        self._check_cycles(entry, static_imports)
+
+        parts = ["const __modules = {\n"]
+        for name in sorted(modules):
+            parts.append(f"{json.dumps(name)}: (__require, __load, __exports) => {{\n{modules[name]}}},\n")
+        parts.append("};\n")
+        parts.append(RUNTIME % json.dumps(entry))
+        return ''.join(parts)
+
+    def _link_module(self, name, source):
+        """Rewrite an ES module's imports and exports for the bundle runtime
+
+        Returns the module body and its static and dynamic dependencies.
+        Exports become getters, so like ES bindings they always read the
+        current value.
+        """
+        static, dynamic = [], []
+
+        def resolve(specifier):
+            if not specifier.startswith('.'):
+                raise BundleBuildError(f"{name}: only relative imports can be bundled, not {specifier}")
+            return posixpath.normpath(posixpath.join(posixpath.dirname(name), specifier))
+
+        def replace_import(match):
+            clause, specifier = match.groups()
+            target = resolve(specifier)
+            static.append(target)
+            call = f"__require({json.dumps(target)})"
+            if clause is None:
+                return f"{call};"
+            if clause.startswith('{'):
+                bindings = []
+                for binding in clause.strip('{} \n').split(','):
+                    imported, _as, local = binding.strip().partition(' as ')
+                    if imported:
+                        bindings.append(f"{imported}: {local}" if local else imported)
+                return f"const {{ {', '.join(bindings)} }} = {call};"
+            if clause.startswith('*'):
+                return f"const {clause.split()[-1]} = {call};"
+            return f"const {clause} = {call}.default;"
+
+        def replace_dynamic_import(match):
+            target = resolve(match.group(1))
+            dynamic.append(target)
+            return f"__load({json.dumps(target)})"
+
+        exports = []
+
+        def replace_declaration(match):
+            exports.append((match.group(2), match.group(2)))
+            return f"{match.group(1)} {match.group(2)}"
+
+        def replace_list(match):
+            for binding in match.group(1).split(','):
+                local, _as, exported = binding.strip().partition(' as ')
+                if local:
+                    exports.append((exported or local, local))
+            return ''
+
+        body = IMPORT_RE.sub(replace_import, source)
+        body = DYNAMIC_IMPORT_RE.sub(replace_dynamic_import, body)
+        body = EXPORT_DECLARATION_RE.sub(replace_declaration, body)
+        body = EXPORT_LIST_RE.sub(replace_list, body)
+        if re.search(r'^export\b', body, re.M) or re.search(r'\bimport\.meta\b', body):
+            raise BundleBuildError(f"{name}: unsupported export or import.meta")
+
+        if exports:
+            getters = ', '.join(f"{json.dumps(exported)}: {{ enumerable: true, get: () => {local} }}"
+                                for exported, local in exports)
+            body = f"Object.defineProperties(__exports, {{ {getters} }});\n{body}"
+        return body, static, dynamic
+
+    def _check_cycles(self, entry, static_imports):
+        """Static import cycles would see unset bindings once linked; refuse them"""
+        visiting, done = set(), set()
+
+        def visit(name, chain):
+            if name in done:
+                return
+            if name in visiting:
+                raise BundleBuildError(f"import cycle: {' -> '.join(chain + [name])}")
+            visiting.add(name)
+            for dependency in static_imports.get(name, ()):
+                visit(dependency, chain + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        visit(entry, [])
+
+    def _read(self, relative_path, sources):
+        """Read a source file and record its stat key"""
+        path = self.root / relative_path
+        stat = path.stat()
+        sources[str(path)] = (stat.st_mtime_ns, stat.st_size)
+        return path.read_bytes().decode('utf-8')
+
+    def _emit(self, stem, suffix, text):
+        """Store an output under its content-hashed name; returns the name"""
+        data = text.encode('utf-8')
+        name = f"{stem}.{content_hash(data)}{suffix}"
+        path = self.cache_dir / name
+        if name in self._assets or (path.exists() and not self.in_memory):
+            return name
+
+        variants = {}
+        for encoding, _suffix in ENCODINGS:
+            compressed = compress(data, encoding)
+            if compressed is not None:
+                variants[encoding] = compressed
+
+        if not path.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            for encoding, encoding_suffix in ENCODINGS:
+                if encoding in variants:
+                    self._write(path.with_name(name + encoding_suffix), variants[encoding])
+            # The plain file goes last; its presence means the set is complete
+            self._write(path, data)
+
+        if self.in_memory:
+            self._assets[name] = (data, variants)
+        return name
+
+    def _write(self, path, data):
+        temp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_file.write_bytes(data)
+        os.replace(temp_file, path)
@@ -0,0 +1,264 @@
+"""
+Icon Bundler for WarmbOS
+Packs a set of icons into one SVG symbol sprite and one PNG atlas
+"""
+
+import io
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from werkzeug.security import safe_join
+
+from utils.http_utils import content_hash, file_etag
+from utils.lazy_imports import optional_module
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+XLINK_NS = 'http://www.w3.org/1999/xlink'
+
+URL_REF = re.compile(r'url\(\s*#([^)\s]+)\s*\)')
+
+class BundleError(ValueError):
+    """Raised for an invalid bundle request"""
+
+class IconBundler:
+    """Builds and caches icon bundles keyed by the hash of the requested set
+
+    SVGs become <symbol>s in one sprite, with a matching <view> per icon so
+    plain <img src="sprite.svg#id"> works. PNGs are scaled into equal cells
+    of one atlas image (requires Pillow); without Pillow PNGs are left out
+    and clients load them individually.
+
+    At most max_entries bundles are kept; the least recently requested
+    are evicted. As with the icon resizer, recency is mirrored to the map
+    files' mtimes, so eviction is approximate across worker processes.
+    """
+
+    MAX_ICONS = 200
+    DEFAULT_SIZE = 64
+    MIN_SIZE = 16
+    MAX_SIZE = 256
+    MAX_ENTRIES = 256
+
+    def __init__(self, icons_dir, cache_dir, max_entries=MAX_ENTRIES):
+        self.icons_dir = Path(icons_dir)
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Bundle keys, least recently used first; loaded on first use
+        self._entries = None
+        self._entries_lock = threading.Lock()
+
+    def bundle(self, paths, size=DEFAULT_SIZE):
+        """Return the bundle map for a list of /icons/... paths, building it if needed"""
+        if not self.MIN_SIZE <= size <= self.MAX_SIZE:
+            raise BundleError(f"size must be between {self.MIN_SIZE} and {self.MAX_SIZE}")
+
+        icons = self._resolve(paths)
+        Image = optional_module('PIL.Image')
+        key_source = json.dumps([size, bool(Image)] + [[p, file_etag(f)] for p, f in icons])
+        key = content_hash(key_source.encode('utf-8'))
+
+        map_file = self.cache_dir / f"{key}.json"
+        result = self._read_map(map_file)
+        if result is None:
+            with self._lock:
+                result = self._read_map(map_file)
+                if result is None:
+                    result = self._build(key, icons, size, map_file)
+
+        with self._entries_lock:
+            self._load_entries()
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+            self._evict()
+        return result
+
+    def asset_path(self, name):
+        """Path of a built sprite or atlas, or None"""
+        joined = safe_join(str(self.cache_dir), name)
+        if joined is None or not name.endswith(('.svg', '.png')) or not os.path.isfile(joined):
+            return None
+        return Path(joined)
+
+    def _read_map(self, map_file):
+        """A built bundle's map with its mtime refreshed; None if not cached"""
+        try:
+            result = json.loads(map_file.read_text(encoding='utf-8'))
+            os.utime(map_file)
+        except (FileNotFoundError, ValueError):
+            # Never built, or evicted by another worker process
+            return None
+        return result
+
+    def _load_entries(self):
+        """Index existing bundles, oldest first; caller holds _entries_lock"""
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        if not self.cache_dir.is_dir():
+            return
+        found = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.json') and entry.is_file():
+                    found.append((entry.stat().st_mtime_ns, entry.name[:-len('.json')]))
+        for _mtime, key in sorted(found):
+            self._entries[key] = None
+
+    def _evict(self):
+        """Remove least recently used bundles beyond max_entries; caller holds _entries_lock"""
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            # The map goes first, so no one is handed a bundle whose files are gone
+            for suffix in ('.json', '.svg', '.png'):
+                try:
+                    os.remove(self.cache_dir / f"{key}{suffix}")
+                except OSError:
+                    pass
+
+    def _resolve(self, paths):
+        """Map requested /icons/... paths to files, dropping duplicates and unknowns"""
+        if len(paths) > self.MAX_ICONS:
+            raise BundleError(f"At most {self.MAX_ICONS} icons per bundle")
+
+        icons = []
+        seen = set()
+        for path in sorted(set(paths)):
+            relative = path.split('?', 1)[0]
+            if relative.startswith('/icons/'):
+                relative = relative[len('/icons/'):]
+            joined = safe_join(str(self.icons_dir), relative)
+            if joined and joined not in seen and os.path.isfile(joined) and joined.endswith(('.svg', '.png')):
+                seen.add(joined)
+                icons.append((path, Path(joined)))
+        return icons
+
+    def _build(self, key, icons, size, map_file):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        result = {"key": key, "size": size, "svg": None, "png": None}
+
+        svgs = [(p, f) for p, f in icons if f.suffix == '.svg']
+        pngs = [(p, f) for p, f in icons if f.suffix == '.png']
+
+        if svgs:
+            sprite, symbols = self._build_sprite(svgs)
+            if symbols:
+                self._write(self.cache_dir / f"{key}.svg", sprite)
+                result["svg"] = {"url": f"/api/icons/bundle/{key}.svg", "symbols": symbols}
+
+        if pngs and optional_module('PIL.Image') is not None:
+            atlas, frames, width, height = self._build_atlas(pngs, size)
+            if frames:
+                self._write(self.cache_dir / f"{key}.png", atlas)
+                result["png"] = {
+                    "url": f"/api/icons/bundle/{key}.png",
+                    "width": width,
+                    "height": height,
+                    "frames": frames
+                }
+
+        self._write(map_file, json.dumps(result, separators=(',', ':')).encode('utf-8'))
+        return result
+
+    def _build_sprite(self, svgs):
+        """Combine SVGs into <symbol>s stacked vertically, each with a <view>"""
+        import xml.etree.ElementTree as ET
+        ET.register_namespace('', SVG_NS)
+        ET.register_namespace('xlink', XLINK_NS)
+        sprite = ET.Element(f'{{{SVG_NS}}}svg')
+        defs = ET.SubElement(sprite, f'{{{SVG_NS}}}defs')
+        symbols = {}
+        cell = 100
+        row = 0
+
+        for path, file in svgs:
+            try:
+                root = ET.parse(file).getroot()
+            except (ET.ParseError, OSError) as e:
+                print(f"Skipping icon in bundle {path}: {e}")
+                continue
+
+            symbol_id = f"i{len(symbols)}"
+            self._prefix_ids(root, f"{symbol_id}-")
+
+            symbol = ET.SubElement(defs, f'{{{SVG_NS}}}symbol', {'id': f"{symbol_id}-s"})
+            view_box = root.get('viewBox') or f"0 0 {root.get('width', cell)} {root.get('height', cell)}"
+            symbol.set('viewBox', view_box.replace('px', ''))
+            for name, value in root.attrib.items():
+                if name not in ('viewBox', 'width', 'height', 'version', 'x', 'y', 'id'):
+                    symbol.set(name, value)
+            symbol.extend(list(root))
+
+            y = row * cell
+            ET.SubElement(sprite, f'{{{SVG_NS}}}view', {'id': symbol_id, 'viewBox': f"0 {y} {cell} {cell}"})
+            ET.SubElement(sprite, f'{{{SVG_NS}}}use', {
+                'href': f"#{symbol_id}-s", 'x': '0', 'y': str(y), 'width': str(cell), 'height': str(cell)
+            })
+            symbols[path] = symbol_id
+            row += 1
+
+        sprite.set('viewBox', f"0 0 {cell} {max(row, 1) * cell}")
+        return ET.tostring(sprite, encoding='utf-8', xml_declaration=False), symbols
+
+    def _prefix_ids(self, root, prefix):
+        """Make ids unique across the sprite and rewrite references to them"""
+        ids = {el.get('id') for el in root.iter() if el.get('id')}
+        if not ids:
+            return
+
+        def rewrite(value):
+            value = URL_REF.sub(lambda m: f"url(#{prefix}{m.group(1)})" if m.group(1) in ids else m.group(0), value)
+            if value.startswith('#') and value[1:] in ids:
+                value = f"#{prefix}{value[1:]}"
+            return value
+
+        for el in root.iter():
+            for name, value in list(el.attrib.items()):
+                el.set(name, f"{prefix}{value}" if name == 'id' else rewrite(value))
+            if el.text and 'url(#' in el.text:
+                el.text = rewrite(el.text)
+
+    def _build_atlas(self, pngs, size):
+        """Scale PNGs into size x size cells of a square-ish grid"""
+        Image = optional_module('PIL.Image')
+        columns = math.ceil(math.sqrt(len(pngs)))
+        rows = math.ceil(len(pngs) / columns)
+        atlas = Image.new('RGBA', (columns * size, rows * size), (0, 0, 0, 0))
+        frames = {}
+
+        for path, file in pngs:
+            try:
+                with Image.open(file) as image:
+                    image = image.convert('RGBA')
+                    image.thumbnail((size, size), Image.LANCZOS)
+            except OSError as e:
+                print(f"Skipping icon in bundle {path}: {e}")
+                continue
+
+            slot = len(frames)
+            x = (slot % columns) * size
+            y = (slot // columns) * size
+            atlas.paste(image, (x + (size - image.width) // 2, y + (size - image.height) // 2))
+            frames[path] = {"x": x, "y": y, "w": size, "h": size}
+
+        output = io.BytesIO()
+        atlas.save(output, format='PNG', optimize=True)
+        return output.getvalue(), frames, atlas.width, atlas.height
+
+    def _write(self, path, data):
+        # A temp file of its own, since other workers may build the same bundle
+        fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(path.parent))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_name, path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
@@ -0,0 +1,209 @@
+"""
+Icon Catalog for WarmbOS
+Compact binary copy of the icon manifest, read through mmap
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
+MAGIC = b'WIC1'
+
+# magic, icon count, string count, tag ref count, count rows,
+# then the offsets of the records, tag refs, string offsets, strings and counts
+HEADER = struct.Struct('<4s4I5I')
+# name, filename, path, type, hash, category, first tag ref, tag count
+RECORD = struct.Struct('<7IH2x')
+# category, type, icon count
+COUNT = struct.Struct('<3I')
+U32 = struct.Struct('<I')
+
+RECORD_FIELDS = ("name", "filename", "path", "type", "hash", "category")
+
+def write_catalog(path, icons):
+    """Write icons (manifest dicts, in manifest order) as a binary catalog
+
+    Every string is stored once in a string table and records refer to it
+    by number, so repeated categories, types and tags cost four bytes each.
+    Icon counts per (category, type) are precomputed; a category counts
+    every icon tagged with it, as the search index does. Rows with the
+    empty category hold the total per type.
+    """
+    strings = {}
+
+    def intern(value):
+        value = value or ""
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    intern("")
+    records = bytearray()
+    tag_refs = bytearray()
+    tag_count = 0
+    counts = {}
+
+    for icon in icons:
+        tags = icon.get("tags") or [icon.get("category", "misc")]
+        icon_type = intern(icon.get("type"))
+        records += RECORD.pack(*(intern(icon.get(field)) for field in RECORD_FIELDS), tag_count, len(tags))
+        counts[(0, icon_type)] = counts.get((0, icon_type), 0) + 1
+        for tag in tags:
+            tag_refs += U32.pack(intern(tag))
+            key = (strings[tag], icon_type)
+            counts[key] = counts.get(key, 0) + 1
+        tag_count += len(tags)
+
+    blob = bytearray()
+    offsets = bytearray()
+    for value in strings:
+        offsets += U32.pack(len(blob))
+        blob += value.encode('utf-8')
+    offsets += U32.pack(len(blob))
+
+    count_rows = bytearray()
+    for (category, icon_type), count in sorted(counts.items()):
+        count_rows += COUNT.pack(category, icon_type, count)
+
+    records_offset = HEADER.size
+    tags_offset = records_offset + len(records)
+    offsets_offset = tags_offset + len(tag_refs)
+    strings_offset = offsets_offset + len(offsets)
+    counts_offset = strings_offset + len(blob)
+    header = HEADER.pack(
+        MAGIC, len(icons), len(strings), tag_count, len(counts),
+        records_offset, tags_offset, offsets_offset, strings_offset, counts_offset
+    )
+
+    # Replace rather than overwrite: open mappings keep reading the old file.
+    # The temp file is unique, since several workers may write the catalog
+    path = Path(path)
+    fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for section in (header, records, tag_refs, offsets, blob, count_rows):
+                f.write(section)
+        os.chmod(temp_name, 0o644)
+        os.replace(temp_name, path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+class IconCatalog:
+    """Read-only view of a catalog file shared between processes via mmap
+
+    Every worker maps the same file, so the page cache holds one copy for
+    all of them. The mapping is swapped when the file is replaced.
+    Records decode to the same dicts as manifest entries.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._map = None
+        self._stat_key = None
+
+    def exists(self):
+        return self._current() is not None
+
+    def __len__(self):
+        view = self._current()
+        return len(view) if view else 0
+
+    def icons(self):
+        """Sequence of icon dicts from the current file, or None if there is none
+
+        The sequence keeps its mapping, so it stays consistent even if the
+        catalog is replaced while it is in use.
+        """
+        return self._current()
+
+    @property
+    def version(self):
+        """Changes whenever the catalog file is replaced"""
+        self._current()
+        return self._stat_key
+
+    def type_counts(self):
+        """Icon count per type"""
+        view = self._current()
+        if view is None:
+            return {}
+        return {row_type: count for category, row_type, count in view.count_rows() if not category}
+
+    def category_counts(self, icon_type=None):
+        """Icon count per category from the precomputed table"""
+        counts = {}
+        view = self._current()
+        if view is None:
+            return counts
+        for category, row_type, count in view.count_rows():
+            if category and (icon_type is None or row_type == icon_type):
+                counts[category] = counts.get(category, 0) + count
+        return dict(sorted(counts.items()))
+
+    def _current(self):
+        """The mapping for the file on disk now, remapping if it was replaced"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stat_key == self._stat_key:
+            return self._map
+
+        with self._lock:
+            if stat_key != self._stat_key:
+                try:
+                    self._map = _CatalogView(self.path)
+                except (OSError, ValueError, struct.error) as e:
+                    print(f"Ignoring icon catalog: {e}")
+                    self._map = None
+                self._stat_key = stat_key
+        return self._map
+
+class _CatalogView:
+    """One mapped catalog file, indexable like a list of icon dicts"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.icon_count, self.string_count, _tag_count, self.count_count,
+         self.records_offset, self.tags_offset, self.offsets_offset,
+         self.strings_offset, self.counts_offset) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError("not an icon catalog")
+
+    def __len__(self):
+        return self.icon_count
+
+    def __getitem__(self, icon_id):
+        if not 0 <= icon_id < self.icon_count:
+            raise IndexError(icon_id)
+        return self.icon(icon_id)
+
+    def __iter__(self):
+        return (self.icon(i) for i in range(self.icon_count))
+
+    def string(self, string_id):
+        start, end = struct.unpack_from('<2I', self.data, self.offsets_offset + string_id * U32.size)
+        return self.data[self.strings_offset + start:self.strings_offset + end].decode('utf-8')
+
+    def icon(self, icon_id):
+        fields = RECORD.unpack_from(self.data, self.records_offset + icon_id * RECORD.size)
+        icon = {field: self.string(string_id) for field, string_id in zip(RECORD_FIELDS, fields)}
+        first_tag, tag_count = fields[6], fields[7]
+        icon["tags"] = [
+            self.string(U32.unpack_from(self.data, self.tags_offset + (first_tag + i) * U32.size)[0])
+            for i in range(tag_count)
+        ]
+        return icon
+
+    def count_rows(self):
+        for i in range(self.count_count):
+            category, icon_type, count = COUNT.unpack_from(self.data, self.counts_offset + i * COUNT.size)
+            yield self.string(category), self.string(icon_type), count
@@ -0,0 +1,65 @@
+"""
+Icon Categorization Engine for WarmbOS
+Matches all keyword rules against a filename in a single regex pass
+"""
+
+import json
+import re
+
+DEFAULT_CATEGORY = "misc"
+
+class IconCategorizer:
+    """Tags icon names with every category whose keywords appear in them"""
+
+    _compiled = {}
+
+    def __init__(self, rules):
+        # Category order decides the primary tag, as the old first-match loop did
+        self.categories = list(rules)
+        self._order = {category: i for i, category in enumerate(self.categories)}
+
+        keyword_categories = {}
+        for category, keywords in rules.items():
+            for keyword in keywords:
+                keyword_categories.setdefault(keyword.lower(), set()).add(category)
+
+        # The regex reports the longest keyword at each position, so fold the
+        # categories of every keyword that is a prefix of it into its result
+        self._keyword_tags = {}
+        for keyword in keyword_categories:
+            tags = set()
+            for other, categories in keyword_categories.items():
+                if keyword.startswith(other):
+                    tags |= categories
+            self._keyword_tags[keyword] = tags
+
+        alternation = '|'.join(re.escape(k) for k in sorted(keyword_categories, key=len, reverse=True))
+        # Zero-width lookahead so overlapping keywords are all found
+        self._pattern = re.compile(f'(?=({alternation}))') if alternation else None
+
+    @classmethod
+    def for_rules(cls, rules):
+        """Get a compiled categorizer, reusing one built for identical rules"""
+        # Category order is part of the rules, so the key must keep it
+        key = json.dumps(list(rules.items()))
+        categorizer = cls._compiled.get(key)
+        if categorizer is None:
+            categorizer = cls._compiled[key] = cls(rules)
+        return categorizer
+
+    def tags(self, name):
+        """All matching categories in rule order, or [DEFAULT_CATEGORY]"""
+        if self._pattern is None:
+            return [DEFAULT_CATEGORY]
+
+        found = set()
+        for match in self._pattern.finditer(name.lower()):
+            found |= self._keyword_tags[match.group(1)]
+
+        if not found:
+            return [DEFAULT_CATEGORY]
+        return sorted(found, key=self._order.__getitem__)
+
+    def categorize(self, name):
+        """Primary category for a name"""
+        return self.tags(name)[0]
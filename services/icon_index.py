@@ -0,0 +1,106 @@
+"""
+Icon Search Index for WarmbOS
+In-memory n-gram index over the icon manifest used by /api/icons/search
+"""
+
+GRAM_SIZE = 3
+
+class IconIndex:
+    """Substring search over icon names and filenames with category/type filters"""
+
+    def __init__(self, icons):
+        # Icons keep manifest order (sorted by name), so ids double as sort keys.
+        # A catalog view is used in place; it decodes records on access.
+        self.icons = icons if hasattr(icons, '__getitem__') else list(icons)
+        self.grams = {}
+        self.categories = {}
+        self.types = {}
+        self._names = []
+        self._search_text = []
+
+        for icon_id, icon in enumerate(self.icons):
+            self._names.append(icon.get('name'))
+            text = f"{icon.get('name', '')}\n{icon.get('filename', '')}".lower()
+            self._search_text.append(text)
+
+            for gram in self._grams_for(text):
+                self.grams.setdefault(gram, set()).add(icon_id)
+
+            for category in icon.get('tags') or [icon.get('category', 'misc')]:
+                self.categories.setdefault(category, set()).add(icon_id)
+            self.types.setdefault(icon.get('type'), set()).add(icon_id)
+
+    def search(self, query='', category=None, icon_type=None, unique=False, page=1, per_page=100):
+        """Return one page of matching icons plus the total match count"""
+        matches = self._match(query.lower().strip(), category, icon_type)
+
+        if unique:
+            seen_names = set()
+            deduped = []
+            for icon_id in matches:
+                name = self._names[icon_id]
+                if name not in seen_names:
+                    seen_names.add(name)
+                    deduped.append(icon_id)
+            matches = deduped
+
+        page = max(page, 1)
+        start = (page - 1) * per_page
+
+        return {
+            "icons": [self.icons[icon_id] for icon_id in matches[start:start + per_page]],
+            "total": len(matches),
+            "page": page,
+            "per_page": per_page
+        }
+
+    def category_counts(self, icon_type=None):
+        """Count icons per category, optionally restricted to one type"""
+        type_ids = self.types.get(icon_type, set()) if icon_type else None
+        counts = {}
+        for category, ids in self.categories.items():
+            count = len(ids & type_ids) if type_ids is not None else len(ids)
+            if count:
+                counts[category] = count
+        return dict(sorted(counts.items()))
+
+    def _match(self, query, category, icon_type):
+        """Resolve filters to a sorted list of icon ids"""
+        candidate_sets = []
+        if category:
+            candidate_sets.append(self.categories.get(category, set()))
+        if icon_type:
+            candidate_sets.append(self.types.get(icon_type, set()))
+
+        needs_verify = False
+        if query:
+            if len(query) <= GRAM_SIZE:
+                # Every substring up to GRAM_SIZE chars is indexed directly
+                candidate_sets.append(self.grams.get(query, set()))
+            else:
+                query_grams = {query[i:i + GRAM_SIZE] for i in range(len(query) - GRAM_SIZE + 1)}
+                candidate_sets.extend(self.grams.get(gram, set()) for gram in query_grams)
+                needs_verify = True
+
+        if not candidate_sets:
+            return list(range(len(self.icons)))
+
+        candidate_sets.sort(key=len)
+        candidates = set(candidate_sets[0])
+        for ids in candidate_sets[1:]:
+            candidates &= ids
+            if not candidates:
+                break
+
+        if needs_verify:
+            candidates = [i for i in candidates if query in self._search_text[i]]
+
+        return sorted(candidates)
+
+    def _grams_for(self, text):
+        """All distinct substrings of length 1..GRAM_SIZE"""
+        grams = set()
+        for size in range(1, GRAM_SIZE + 1):
+            for i in range(len(text) - size + 1):
+                grams.add(text[i:i + size])
+        return grams
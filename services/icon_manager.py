@@ -3,46 +3,102 @@ Icon Management Service for WarmbOS
 Handles icon library synchronization and manifest generation
 """
 
+import hashlib
 import json
 import os
 import re
 import shutil
 import tempfile
 import threading
-import urllib.request
-import zipfile
+import time
 from datetime import datetime
 from pathlib import Path
 
+from services.icon_catalog import IconCatalog, write_catalog
+from services.icon_categorizer import IconCategorizer
+from services.icon_index import IconIndex
+from services.icon_resizer import IconResizer
+from services.icon_store import IconStore
+from services.instrumentation import ICON_MANIFEST_SECONDS, ICON_SYNC_PHASE_SECONDS
+from services.sync_jobs import SyncCancelled, SyncJob
+
+from utils.http_utils import content_hash, file_etag, write_precompressed
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 class IconManager:
     """Manages icon library synchronization and manifest generation"""
     
-    ICONS_REPO_URL = "https://github.com/selfhst/icons/archive/refs/heads/main.zip"
+    # Set ICONS_REPO_URL to sync from a mirror; file:// URLs work too
+    ICONS_REPO_URL = os.environ.get("ICONS_REPO_URL", "https://github.com/selfhst/icons/archive/refs/heads/main.zip")
     ICONS_DIR = Path("icons")
     MANIFEST_FILE = Path("js/icon-manifest.json")
+    MANIFEST_DIR = Path("js/icon-manifest")
+    MANIFEST_INDEX = "index.json"
+    MANIFEST_FIELDS = ["name", "filename", "path", "type", "hash"]
+    # "legacy" is the single indented file, "sharded" the compact per-category shards
+    MANIFEST_OUTPUTS = ("legacy", "sharded")
+    MANIFEST_CACHE_FILE = Path(".icon-manifest-cache.json")
+    # Binary copy of the manifest that status, categories and search read via mmap
+    CATALOG_FILE = Path("icon-catalog.bin")
+    # Bump when the shape of per-icon results changes
+    MANIFEST_CACHE_VERSION = 3
+    CATEGORY_RULES_FILE = Path("icon-categories.json")
+    ICON_TYPES = {".svg": "svg", ".png": "png"}
+    # Below this many uncached icons a worker pool costs more than it saves
+    PARALLEL_THRESHOLD = 2000
+    PARALLEL_BATCH_SIZE = 500
+    STAGING_DIR = Path("icons.staging")
+    PREVIOUS_DIR = Path("icons.old")
+    # Synced trees are icons.<content hash>, with ICONS_DIR a symlink to the live one
+    TREE_NAME = re.compile(r'^icons\.[0-9a-f]{16}$')
+    STORE_DIR = Path("icons.store")
+    CHUNK_SIZE = 1024 * 1024
+    DOWNLOAD_DIR = Path("icons.download")
+    DOWNLOAD_TIMEOUT = 30
+    RESIZE_CACHE_DIR = Path(".static-cache/resized")
+    RESIZE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    # Sizes the desktop, taskbar and icon picker request
+    RESIZE_WARM_SIZES = (48, 64)
     
     def __init__(self):
         self.sync_lock = threading.Lock()
-        self.sync_status = {"status": "idle", "progress": 0, "message": ""}
+        self.last_job = None
+        self.catalog = IconCatalog(self.CATALOG_FILE)
+        self._index = None
+        self._index_version = None
+        self.resizer = IconResizer(self.RESIZE_CACHE_DIR, self.RESIZE_CACHE_MAX_BYTES)
+        self.store = IconStore(self.STORE_DIR)
+        self._icons_ready = False
+        self._sync_lock_file = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def icons_ready(self):
+        """Whether a catalog is in place to serve status, categories and search
+        
+        Only stats the file until it first succeeds. Syncs replace the
+        catalog atomically, so once present it stays present.
+        """
+        if not self._icons_ready:
+            self._icons_ready = self.CATALOG_FILE.exists()
+        return self._icons_ready
     
     def get_status(self):
         """Get current icon library status"""
         status = {
             "icons_dir_exists": self.ICONS_DIR.exists(),
             "manifest_exists": self.MANIFEST_FILE.exists(),
-            "icon_count": 0,
+            "sharded_manifest_exists": (self.MANIFEST_DIR / self.MANIFEST_INDEX).exists(),
+            "catalog_exists": self.catalog.exists(),
+            "icon_count": len(self.catalog),
             "last_sync": None,
-            "sync_status": self.sync_status.copy()
+            "sync_status": self.last_job.to_dict() if self.last_job else {"state": "idle"}
         }
         
-        if status["manifest_exists"]:
-            try:
-                with open(self.MANIFEST_FILE, 'r') as f:
-                    manifest = json.load(f)
-                    status["icon_count"] = manifest.get("total_count", 0)
-            except Exception:
-                pass
-        
         if status["icons_dir_exists"]:
             try:
                 stat = self.ICONS_DIR.stat()
@@ -52,49 +108,349 @@ class IconManager:
         
         return status
     
-    def sync_icons(self):
-        """Download and sync icons from selfhst/icons repository"""
+    def get_index(self):
+        """Get the search index, rebuilding it if the catalog was replaced"""
+        version = self.catalog.version
+        if self._index is None or version != self._index_version:
+            icons = self.catalog.icons()
+            self._index = IconIndex(icons if icons is not None else [])
+            self._index_version = version
+        return self._index
+    
+    def sync_icons(self, delta=True, job=None):
+        """Download and sync icons from the icon repository (ICONS_REPO_URL)
+        
+        Files are kept once each in the content-addressed icon store and the
+        tree is built from hardlinks to them. In delta mode (the default)
+        only entries the store has not seen are decompressed; the finished
+        tree is swapped in by replacing a symlink, so /icons/ never serves
+        from a half-written or missing directory. Pass delta=False to
+        re-extract every file.
+        
+        Progress and cancellation go through job (a SyncJob); callers
+        normally go through SyncScheduler rather than calling this directly.
+        """
+        if job is None:
+            job = SyncJob(delta=delta)
+            job.start()
+        self.last_job = job
+        
         with self.sync_lock:
             try:
-                self._update_status("downloading", 10, "Downloading icons...")
+                lock_file = self._lock_sync_process()
+            except BlockingIOError:
+                job.finish("error", "Another WarmbOS process is already syncing icons")
+                return False
+            except OSError as e:
+                job.finish("error", f"Could not lock the icon sync: {e}")
+                return False
+            
+            try:
+                with ICON_SYNC_PHASE_SECONDS.time(phase="download"):
+                    zip_path = self._download_archive(job)
                 
-                # Create temp directory and download
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    zip_path = Path(temp_dir) / "icons.zip"
-                    
-                    self._update_status("downloading", 20, "Downloading repository...")
-                    urllib.request.urlretrieve(self.ICONS_REPO_URL, zip_path)
-                    
-                    self._update_status("extracting", 40, "Extracting files...")
-                    
-                    # Extract zip file
-                    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                        zip_ref.extractall(temp_dir)
-                    
-                    # Find the extracted directory
-                    extracted_dir = self._find_extracted_dir(temp_dir)
-                    if not extracted_dir:
-                        raise Exception("Could not find extracted icons directory")
-                    
-                    self._update_status("installing", 60, "Installing icons...")
+                if not delta:
+                    self.store.reset()
+                changed = self._sync_delta(zip_path, job)
+                
+                if changed or not self.MANIFEST_FILE.exists():
+                    job.report("generating", 90, "Generating manifest...")
+                    with ICON_SYNC_PHASE_SECONDS.time(phase="manifest"):
+                        self.generate_manifest(warm_sizes=self.RESIZE_WARM_SIZES)
+                
+                # Only a finished sync discards the download; anything else resumes from it
+                zip_path.unlink()
+                job.finish("complete", "Icons synchronized successfully!")
+                return True
+            
+            except SyncCancelled:
+                job.finish("cancelled", "Sync cancelled")
+                return False
+            except Exception as e:
+                job.finish("error", f"Sync failed: {str(e)}")
+                return False
+            finally:
+                self._unlock_sync_process(lock_file)
+    
+    def _lock_sync_process(self):
+        """Take an exclusive lock shared by every worker process; raises BlockingIOError if held
+        
+        Returns the open lock file, or None where file locks are unavailable.
+        """
+        if fcntl is None:
+            return None
+        self.DOWNLOAD_DIR.mkdir(exist_ok=True)
+        lock_file = open(self.DOWNLOAD_DIR / "sync.lock", 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise
+        self._sync_lock_file = lock_file
+        return lock_file
+    
+    def _unlock_sync_process(self, lock_file):
+        if lock_file is not None:
+            self._sync_lock_file = None
+            lock_file.close()
+    
+    def _reset_after_fork(self):
+        # A lock taken by a thread of the parent (e.g. the gunicorn master)
+        # stays the parent's: drop the inherited descriptor without
+        # unlocking, so the parent's close still releases it
+        self.sync_lock = threading.Lock()
+        if self._sync_lock_file is not None:
+            self._sync_lock_file.close()
+            self._sync_lock_file = None
+    
+    def prepare_icons(self):
+        """Move an icons tree that predates the store into it, then refresh the manifest
+        
+        Takes the same locks as a sync, so it never runs alongside one in
+        any process. If a sync holds them this is skipped; the sync
+        generates the manifest itself.
+        """
+        with self.sync_lock:
+            try:
+                lock_file = self._lock_sync_process()
+            except BlockingIOError:
+                print("Icon sync in progress, skipping the startup icon check")
+                return
+            except OSError as e:
+                print(f"Could not lock the icon check: {e}")
+                return
+            try:
+                if self.ICONS_DIR.exists() and not self.store.paths:
+                    print("Moving icons into the content-addressed store...")
+                    self.store.adopt(self.ICONS_DIR)
+                # Cached per file, so this only rewrites the manifest when
+                # icons or the manifest format changed
+                self.generate_manifest()
+            finally:
+                self._unlock_sync_process(lock_file)
+    
+    def _download_archive(self, job):
+        """Download the icon archive, resuming a partial download if possible
+        
+        The partial file is kept with the validator (ETag or Last-Modified)
+        of the response it came from. A retry asks for the remaining bytes
+        with Range and If-Range, so a changed archive is sent whole instead.
+        """
+        # Imported here so processes that never sync skip loading ssl
+        import urllib.error
+        import urllib.request
+        
+        self.DOWNLOAD_DIR.mkdir(exist_ok=True)
+        part_file = self.DOWNLOAD_DIR / "icons.zip.part"
+        meta_file = self.DOWNLOAD_DIR / "icons.zip.json"
+        zip_path = self.DOWNLOAD_DIR / "icons.zip"
+        
+        meta = {}
+        try:
+            meta = json.loads(meta_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            pass
+        
+        offset = part_file.stat().st_size if part_file.exists() else 0
+        validator = meta.get("etag") or meta.get("last_modified")
+        request = urllib.request.Request(self.ICONS_REPO_URL)
+        if offset and validator and meta.get("url") == self.ICONS_REPO_URL:
+            request.add_header("Range", f"bytes={offset}-")
+            request.add_header("If-Range", validator)
+        else:
+            offset = 0
+        
+        job.report("downloading", 0, "Connecting...")
+        try:
+            response = urllib.request.urlopen(request, timeout=self.DOWNLOAD_TIMEOUT)
+        except urllib.error.HTTPError as e:
+            if e.code != 416:
+                raise
+            # The partial file is no longer a prefix of the archive; start over
+            part_file.unlink(missing_ok=True)
+            return self._download_archive(job)
+        
+        with response:
+            resumed = getattr(response, "status", 200) == 206
+            if not resumed:
+                offset = 0
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length else None
+            
+            meta = {
+                "url": self.ICONS_REPO_URL,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            }
+            meta_file.write_text(json.dumps(meta), encoding='utf-8')
+            if resumed:
+                print(f"Resuming icon download at {offset} bytes")
+            
+            done = offset
+            with open(part_file, 'ab' if resumed else 'wb') as f:
+                for chunk in iter(lambda: response.read(self.CHUNK_SIZE), b''):
+                    job.raise_if_cancelled()
+                    f.write(chunk)
+                    done += len(chunk)
+                    progress = 50 * done / total if total else 0
+                    job.report("downloading", progress, f"Downloading icons... {done / 1048576:.1f} MB", done, total)
+        
+        os.replace(part_file, zip_path)
+        meta_file.unlink()
+        return zip_path
+    
+    def _sync_delta(self, zip_path, job):
+        """Build a staging tree of store links from the archive
+        
+        Entries are matched against the store by their CRC-32 and size from
+        the zip directory, so only new or changed files are decompressed and
+        hashed. Returns True if anything changed.
+        """
+        import zipfile
+        
+        job.report("extracting", 50, "Comparing icons...")
+        extract_start = time.perf_counter()
+        
+        if self.STAGING_DIR.exists():
+            shutil.rmtree(self.STAGING_DIR)
+        self.STAGING_DIR.mkdir()
+        
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        previous = self.store.paths if self.ICONS_DIR.exists() else {}
+        paths = {}
+        
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                prefix = self._find_archive_prefix(zip_ref)
+                if prefix is None:
+                    raise Exception("Could not find icons directory in archive")
+                
+                entries = [i for i in zip_ref.infolist() if not i.is_dir() and i.filename.startswith(prefix)]
+                total = sum(info.file_size for info in entries)
+                done = 0
+                
+                for info in entries:
+                    job.raise_if_cancelled()
+                    done += info.file_size
+                    job.report("extracting", 50 + 35 * done / max(total, 1), "Extracting icons...", done, total)
                     
-                    # Replace old icons directory
-                    if self.ICONS_DIR.exists():
-                        shutil.rmtree(self.ICONS_DIR)
-                    shutil.move(str(extracted_dir), str(self.ICONS_DIR))
+                    relative = info.filename[len(prefix):]
+                    parts = relative.split('/')
+                    if not relative or any(part in ('', '.', '..') for part in parts):
+                        continue
                     
-                    self._update_status("generating", 80, "Generating manifest...")
-                    self.generate_manifest()
+                    suffix = os.path.splitext(relative)[1].lower()
+                    file_hash = self.store.lookup(info.CRC, info.file_size, suffix)
+                    if file_hash is None:
+                        with zip_ref.open(info) as src:
+                            file_hash = self.store.add(src, suffix, info.CRC, info.file_size)
                     
-                    self._update_status("complete", 100, "Icons synchronized successfully!")
-                    return True
+                    target = self.STAGING_DIR.joinpath(*parts)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    self.store.link(file_hash, suffix, target)
+                    paths[relative] = file_hash
                     
-            except Exception as e:
-                self._update_status("error", 0, f"Sync failed: {str(e)}")
-                return False
+                    if relative not in previous:
+                        counts["added"] += 1
+                    elif previous[relative] != file_hash:
+                        counts["updated"] += 1
+                    else:
+                        counts["unchanged"] += 1
+            
+            counts["removed"] = len(previous.keys() - paths.keys())
+        except Exception:
+            shutil.rmtree(self.STAGING_DIR, ignore_errors=True)
+            raise
+        
+        print(f"Icon delta: {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['removed']} removed, {counts['unchanged']} unchanged "
+              f"({len(set(paths.values()))} unique files)")
+        ICON_SYNC_PHASE_SECONDS.observe(time.perf_counter() - extract_start, phase="extract")
+        
+        if self.ICONS_DIR.exists() and previous and not (counts["added"] or counts["updated"] or counts["removed"]):
+            shutil.rmtree(self.STAGING_DIR)
+            self.store.commit(paths)
+            return False
+        
+        job.raise_if_cancelled()
+        job.report("installing", 85, "Installing icons...")
+        with ICON_SYNC_PHASE_SECONDS.time(phase="install"):
+            self._swap_in_staging(paths)
+            self.store.commit(paths)
+        return True
     
-    def generate_manifest(self):
-        """Generate icon manifest for the web interface"""
+    def _find_archive_prefix(self, zip_ref):
+        """Find the top-level icons directory prefix inside the archive"""
+        for name in zip_ref.namelist():
+            top = name.split('/', 1)[0]
+            if top.startswith('icons-'):
+                return top + '/'
+        return None
+    
+    def _swap_in_staging(self, paths):
+        """Make the staging tree the live icons directory
+        
+        The tree is renamed to icons.<hash of its contents>, and a new
+        symlink to it replaces ICONS_DIR with one os.replace, so requests
+        see the old tree or the new one but never a missing directory. A
+        plain directory from before (e.g. a git checkout) has to be moved
+        aside first, which leaves that one swap with a brief gap. Where
+        symlinks cannot be created the trees are swapped by renaming.
+        """
+        tree = self.ICONS_DIR.with_name(f"icons.{content_hash(json.dumps(paths, sort_keys=True).encode('utf-8'))}")
+        current = self.ICONS_DIR.resolve() if self.ICONS_DIR.is_symlink() else None
+        if current is not None and current == tree.resolve():
+            # Same contents as the live tree, e.g. after a forced re-extract
+            shutil.rmtree(self.STAGING_DIR)
+            return
+        if tree.exists():
+            shutil.rmtree(tree)
+        os.replace(self.STAGING_DIR, tree)
+        
+        temp_link = self.ICONS_DIR.with_name(self.ICONS_DIR.name + ".link")
+        if temp_link.is_symlink():
+            temp_link.unlink()
+        try:
+            os.symlink(tree.name, temp_link, target_is_directory=True)
+        except (OSError, NotImplementedError):
+            self._swap_by_rename(tree)
+            return
+        
+        if current is None and self.ICONS_DIR.exists():
+            if self.PREVIOUS_DIR.exists():
+                shutil.rmtree(self.PREVIOUS_DIR)
+            os.replace(self.ICONS_DIR, self.PREVIOUS_DIR)
+        os.replace(temp_link, self.ICONS_DIR)
+        
+        shutil.rmtree(self.PREVIOUS_DIR, ignore_errors=True)
+        # The previous tree, and any left by an interrupted sync
+        for path in self.ICONS_DIR.parent.iterdir():
+            if self.TREE_NAME.match(path.name) and path.name != tree.name and not path.is_symlink():
+                shutil.rmtree(path, ignore_errors=True)
+    
+    def _swap_by_rename(self, tree):
+        """Replace a plain icons directory with tree by renaming both"""
+        if self.PREVIOUS_DIR.exists():
+            shutil.rmtree(self.PREVIOUS_DIR)
+        
+        if self.ICONS_DIR.exists():
+            os.replace(self.ICONS_DIR, self.PREVIOUS_DIR)
+        os.replace(tree, self.ICONS_DIR)
+        
+        shutil.rmtree(self.PREVIOUS_DIR, ignore_errors=True)
+    
+    def generate_manifest(self, warm_sizes=None):
+        """Generate icon manifest for the web interface
+        
+        Results are cached per file by mtime and size, so after a small sync
+        only new or changed icons are processed. Large batches of uncached
+        icons are spread across a process pool. With warm_sizes, resized PNG
+        variants for those sizes are pre-generated in the background.
+        """
+        with ICON_MANIFEST_SECONDS.time():
+            self._generate_manifest(warm_sizes)
+    
+    def _generate_manifest(self, warm_sizes):
         manifest = {
             "categories": {},
             "icons": [],
@@ -106,39 +462,164 @@ class IconManager:
         
         print(f"Scanning icons in: {self.ICONS_DIR}")
         
-        # Scan for SVG and PNG icons
-        for icon_type, pattern in [("svg", "*.svg"), ("png", "*.png")]:
-            for icon_path in self.ICONS_DIR.rglob(pattern):
-                if icon_path.is_file():
-                    try:
-                        icon_data = self._process_icon(icon_path, icon_type, categories)
-                        if icon_data:
-                            manifest["icons"].append(icon_data)
-                            self._add_to_category(manifest["categories"], icon_data)
-                    except Exception as e:
-                        print(f"Error processing icon {icon_path}: {e}")
-                        continue
+        entries = self._scan_icons()
+        cache = self._load_manifest_cache(categories)
+        new_cache = {}
+        pending = []
+        
+        for relative_path, icon_type, stat_key in entries:
+            cached = cache.get(relative_path)
+            if cached and cached[0] == stat_key:
+                new_cache[relative_path] = cached
+            else:
+                pending.append((relative_path, icon_type, stat_key))
+        
+        for (relative_path, icon_type, stat_key), icon_data in zip(pending, self._process_pending(pending, categories)):
+            if icon_data:
+                new_cache[relative_path] = [stat_key, icon_data]
+        
+        print(f"Processed {len(pending)} new or changed icons, {len(entries) - len(pending)} cached")
+        
+        for relative_path, _icon_type, _stat_key in entries:
+            cached = new_cache.get(relative_path)
+            if cached:
+                icon_data = dict(cached[1])
+                manifest["icons"].append(icon_data)
+                self._add_to_category(manifest["categories"], icon_data)
         
         # Finalize manifest
         manifest["total_count"] = len(manifest["icons"])
+        
+        if warm_sizes:
+            self.warm_resized_icons(manifest["icons"], warm_sizes)
+        
+        if not pending and new_cache.keys() == cache.keys() and self._manifest_outputs_exist():
+            print(f"Manifest up to date with {manifest['total_count']} icons")
+            return
+        
         self._sort_manifest(manifest)
-        self._write_manifest(manifest)
+        if "legacy" in self.MANIFEST_OUTPUTS:
+            self._write_manifest(manifest)
+        if "sharded" in self.MANIFEST_OUTPUTS:
+            self._write_sharded_manifest(manifest)
+        self._write_catalog(manifest)
+        self._save_manifest_cache(categories, new_cache)
         
         print(f"Generated manifest with {manifest['total_count']} icons")
     
-    def _update_status(self, status, progress, message):
-        """Update sync status"""
-        self.sync_status = {"status": status, "progress": progress, "message": message}
+    def warm_resized_icons(self, icons, sizes):
+        """Pre-generate resized variants of PNG icons on a background thread"""
+        paths = [self.ICONS_DIR / icon["path"][len("/icons/"):] for icon in icons if icon["type"] == "png"]
+        thread = threading.Thread(target=self.resizer.warm, args=(paths, sizes))
+        thread.daemon = True
+        thread.start()
     
-    def _find_extracted_dir(self, temp_dir):
-        """Find the extracted icons directory"""
-        for item in Path(temp_dir).iterdir():
-            if item.is_dir() and item.name.startswith('icons-'):
-                return item
-        return None
+    def _manifest_outputs_exist(self):
+        """Check that every configured manifest output is on disk"""
+        if "legacy" in self.MANIFEST_OUTPUTS and not self.MANIFEST_FILE.exists():
+            return False
+        if "sharded" in self.MANIFEST_OUTPUTS and not (self.MANIFEST_DIR / self.MANIFEST_INDEX).exists():
+            return False
+        return self.CATALOG_FILE.exists()
+    
+    def _scan_icons(self):
+        """Walk the icons directory once, returning (path, type, (mtime, size)) entries"""
+        entries = []
+        if not self.ICONS_DIR.exists():
+            return entries
+        
+        stack = [(str(self.ICONS_DIR), "")]
+        while stack:
+            directory, prefix = stack.pop()
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, f"{prefix}{entry.name}/"))
+                        continue
+                    
+                    icon_type = self.ICON_TYPES.get(os.path.splitext(entry.name)[1])
+                    if icon_type and entry.is_file():
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((f"{prefix}{entry.name}", icon_type, [stat.st_mtime_ns, stat.st_size]))
+        
+        # SVGs first, then PNGs, matching the order the manifest has always used
+        entries.sort(key=lambda e: (e[1] != "svg", e[0]))
+        return entries
+    
+    def _process_pending(self, pending, categories):
+        """Process uncached icons, using a process pool for large batches"""
+        items = [(relative_path, icon_type) for relative_path, icon_type, _stat_key in pending]
+        
+        if len(items) < self.PARALLEL_THRESHOLD:
+            return _process_icon_batch(self.ICONS_DIR, items, categories)
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        batches = [items[i:i + self.PARALLEL_BATCH_SIZE] for i in range(0, len(items), self.PARALLEL_BATCH_SIZE)]
+        try:
+            with ProcessPoolExecutor() as executor:
+                results = executor.map(
+                    _process_icon_batch,
+                    [self.ICONS_DIR] * len(batches), batches, [categories] * len(batches)
+                )
+                return [icon_data for batch in results for icon_data in batch]
+        except Exception as e:
+            print(f"Worker pool unavailable, processing serially: {e}")
+            return _process_icon_batch(self.ICONS_DIR, items, categories)
+    
+    def _rules_fingerprint(self, categories):
+        """Hash of the categorization rules; cached results are only valid for the same rules
+        
+        Category order decides the primary tag, so it is part of the hash.
+        """
+        key = [self.MANIFEST_CACHE_VERSION, list(categories.items())]
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+    
+    def _load_manifest_cache(self, categories):
+        """Load per-file results from the previous generation"""
+        try:
+            with open(self.MANIFEST_CACHE_FILE, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        if cache.get("rules") != self._rules_fingerprint(categories):
+            return {}
+        return cache.get("files", {})
+    
+    def _save_manifest_cache(self, categories, files):
+        """Persist per-file results for the next generation"""
+        cache = {"rules": self._rules_fingerprint(categories), "files": files}
+        temp_name = None
+        try:
+            fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(self.MANIFEST_CACHE_FILE.parent))
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(self._compact_json(cache))
+            os.replace(temp_name, self.MANIFEST_CACHE_FILE)
+        except OSError as e:
+            print(f"Failed to save manifest cache: {e}")
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
     
     def _get_categorization_patterns(self):
-        """Get icon categorization patterns"""
+        """Get icon categorization patterns
+        
+        Rules are read from icon-categories.json ({"category": ["keyword", ...]})
+        when present; category order decides which tag is primary.
+        """
+        if self.CATEGORY_RULES_FILE.exists():
+            try:
+                with open(self.CATEGORY_RULES_FILE, 'r', encoding='utf-8') as f:
+                    rules = json.load(f)
+                if isinstance(rules, dict) and all(isinstance(v, list) for v in rules.values()):
+                    return rules
+                print(f"Ignoring {self.CATEGORY_RULES_FILE}: expected an object of keyword lists")
+            except (OSError, ValueError) as e:
+                print(f"Failed to load {self.CATEGORY_RULES_FILE}: {e}")
+        
         return {
             "applications": ["app", "application", "software", "program"],
             "system": ["system", "settings", "config", "admin", "gear", "wrench"],
@@ -154,42 +635,12 @@ class IconManager:
             "utilities": ["utility", "tool", "calculator", "archive", "zip"]
         }
     
-    def _categorize_icon(self, filename, categories):
-        """Categorize icon based on filename"""
-        name_lower = filename.lower()
-        for category, keywords in categories.items():
-            if any(keyword in name_lower for keyword in keywords):
-                return category
-        return "misc"
-    
-    def _process_icon(self, icon_path, icon_type, categories):
-        """Process a single icon file"""
-        relative_path = icon_path.relative_to(self.ICONS_DIR)
-        relative_path_str = str(relative_path).replace(os.sep, '/')
-        
-        filename = icon_path.stem
-        category = self._categorize_icon(filename, categories)
-        
-        # Clean up the name for display
-        display_name = re.sub(r'[-_]', ' ', filename).title()
-        
-        # Ensure the path starts with /icons/
-        clean_path = f"/icons/{relative_path_str}"
-        
-        return {
-            "name": display_name,
-            "filename": filename,
-            "path": clean_path,
-            "category": category,
-            "type": icon_type
-        }
-    
     def _add_to_category(self, categories, icon_data):
-        """Add icon to its category"""
-        category = icon_data["category"]
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(icon_data)
+        """Add icon to every category it is tagged with"""
+        for category in icon_data.get("tags") or [icon_data["category"]]:
+            if category not in categories:
+                categories[category] = []
+            categories[category].append(icon_data)
     
     def _sort_manifest(self, manifest):
         """Sort manifest data"""
@@ -213,4 +664,114 @@ class IconManager:
         if manifest["icons"]:
             print("Sample icon paths:")
             for icon in manifest["icons"][:5]:
-                print(f"  {icon['name']}: {icon['path']}")
\ No newline at end of file
+                print(f"  {icon['name']}: {icon['path']}")
+    
+    def _write_sharded_manifest(self, manifest):
+        """Write compact per-category shards plus a small root index
+        
+        Icons are stored once, as field arrays, grouped by primary category.
+        Each category in the root index points at its shard and the global
+        index range its icons occupy; icons also tagged with a category are
+        listed under "tagged" by global index. Shard filenames carry a content
+        hash so they can be cached forever; index.json is revalidated by ETag.
+        """
+        self.MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+        
+        index = {
+            "total_count": manifest["total_count"],
+            "fields": self.MANIFEST_FIELDS,
+            "categories": {},
+            "tagged": {}
+        }
+        written = {self.MANIFEST_INDEX}
+        offset = 0
+        
+        by_category = {}
+        for icon in manifest["icons"]:
+            by_category.setdefault(icon["category"], []).append(icon)
+        
+        positions = {}
+        for category in sorted(by_category):
+            icons = by_category[category]
+            positions.update((id(icon), offset + i) for i, icon in enumerate(icons))
+            shard = {
+                "category": category,
+                "offset": offset,
+                "icons": [[icon[field] for field in self.MANIFEST_FIELDS] for icon in icons]
+            }
+            data = self._compact_json(shard)
+            shard_name = f"{category}.{content_hash(data)}.json"
+            
+            shard_path = self.MANIFEST_DIR / shard_name
+            if not shard_path.exists():
+                write_precompressed(shard_path, data)
+            written.update(p.name for p in self.MANIFEST_DIR.glob(shard_name + "*"))
+            
+            index["categories"][category] = {"shard": shard_name, "offset": offset, "count": len(icons)}
+            offset += len(icons)
+        
+        for icon in manifest["icons"]:
+            for tag in icon.get("tags", [])[1:]:
+                index["tagged"].setdefault(tag, []).append(positions[id(icon)])
+        for tagged in index["tagged"].values():
+            tagged.sort()
+        
+        data = self._compact_json(index)
+        index["version"] = content_hash(data)
+        write_precompressed(self.MANIFEST_DIR / self.MANIFEST_INDEX, self._compact_json(index))
+        written.update(p.name for p in self.MANIFEST_DIR.glob(self.MANIFEST_INDEX + "*"))
+        
+        # Drop shards from previous generations
+        for path in self.MANIFEST_DIR.iterdir():
+            if path.name not in written:
+                path.unlink()
+    
+    def _write_catalog(self, manifest):
+        """Write the binary catalog that icon endpoints read through mmap"""
+        try:
+            write_catalog(self.CATALOG_FILE, manifest["icons"])
+        except OSError as e:
+            # Windows cannot replace a file another process has mapped
+            print(f"Failed to write icon catalog: {e}")
+    
+    def _compact_json(self, data):
+        """Serialize without whitespace"""
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _process_icon_batch(icons_dir, items, categories):
+    """Process a list of (relative path, type) pairs
+    
+    Module level and given only what it needs, so worker pool processes
+    can run it without building an IconManager per batch.
+    """
+    categorizer = IconCategorizer.for_rules(categories)
+    results = []
+    for relative_path, icon_type in items:
+        try:
+            results.append(_process_icon(icons_dir, relative_path, icon_type, categorizer))
+        except Exception as e:
+            print(f"Error processing icon {relative_path}: {e}")
+            results.append(None)
+    return results
+
+def _process_icon(icons_dir, relative_path_str, icon_type, categorizer):
+    """Process a single icon file given its path relative to the icons directory"""
+    filename = os.path.splitext(relative_path_str.rsplit('/', 1)[-1])[0]
+    tags = categorizer.tags(filename)
+    
+    # Clean up the name for display
+    display_name = re.sub(r'[-_]', ' ', filename).title()
+    
+    # Ensure the path starts with /icons/
+    clean_path = f"/icons/{relative_path_str}"
+    
+    return {
+        "name": display_name,
+        "filename": filename,
+        "path": clean_path,
+        "category": tags[0],
+        "tags": tags,
+        "type": icon_type,
+        "hash": file_etag(Path(icons_dir) / relative_path_str)
+    }
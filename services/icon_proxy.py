@@ -0,0 +1,277 @@
+"""
+Icon Proxy for WarmbOS
+Fetches remote shortcut icons once and serves them from a size-bounded
+on-disk LRU cache, revalidating with ETag / Last-Modified
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from flask import send_file
+
+from utils.http_client import FetchError, HttpConnectionPool
+from utils.http_utils import content_hash
+
+class IconProxyError(FetchError):
+    """Raised when an icon cannot be served; status is the HTTP status to answer with"""
+
+class IconProxy:
+    """Remote icons cached on disk and served with long cache headers
+
+    Each URL is stored as <key>.bin plus <key>.json metadata (upstream
+    validators, content type, last check). Copies younger than
+    REVALIDATE_AFTER are served without contacting the origin; older ones
+    are revalidated with a conditional GET, and kept if the origin is
+    down. Concurrent misses for one URL share a single fetch. When the
+    cache passes max_bytes the least recently served icons are removed.
+
+    Only http(s) URLs answering with an image/* type are proxied, and
+    hosts resolving to private or loopback addresses are refused unless
+    allow_private is set (as for a local test server).
+    """
+
+    ROUTE = '/api/iconproxy'
+    MAX_BYTES = 64 * 1024 * 1024
+    MAX_ICON_BYTES = 2 * 1024 * 1024
+    REVALIDATE_AFTER = 86400
+    # Browsers reuse a proxied icon for a week and may show it stale for a day while revalidating
+    CLIENT_MAX_AGE = 7 * 86400
+    CLIENT_STALE = 86400
+    MAX_REDIRECTS = 3
+    USER_AGENT = 'WarmbOS-IconProxy/1.0'
+
+    def __init__(self, cache_dir, max_bytes=None, allow_private=False, timeout=10):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.allow_private = allow_private
+        self.timeout = timeout
+        self.pool = HttpConnectionPool(timeout=timeout)
+        self._lock = threading.RLock()
+        # key -> metadata, least recently served first
+        self._entries = None
+        self._total = 0
+        self._inflight = {}
+
+    def proxy_url(self, url):
+        """The local URL serving a remote icon"""
+        return f"{self.ROUTE}?url={quote(url, safe='')}"
+
+    def rewrite_shortcuts(self, data):
+        """Point every remote iconUrl in a shortcuts document at the proxy
+
+        Returns (new data, remote URLs that were rewritten). Anything
+        already local, including proxy URLs, is left as it is.
+        """
+        rewritten = []
+
+        def visit(value):
+            if isinstance(value, list):
+                return [visit(item) for item in value]
+            if not isinstance(value, dict):
+                return value
+            result = {key: visit(item) for key, item in value.items()}
+            icon_url = result.get('iconUrl')
+            if isinstance(icon_url, str) and icon_url.lower().startswith(('http://', 'https://')):
+                result['iconUrl'] = self.proxy_url(icon_url)
+                rewritten.append(icon_url)
+            return result
+
+        return visit(data), rewritten
+
+    def prefetch(self, urls):
+        """Fetch icons in the background so the first desktop render hits the cache"""
+        def run():
+            for url in urls:
+                try:
+                    self.fetch(url)
+                except IconProxyError as e:
+                    print(f"Icon prefetch failed for {url}: {e}")
+
+        if urls:
+            threading.Thread(target=run, daemon=True).start()
+
+    def send(self, url):
+        """Response for a remote icon; raises IconProxyError"""
+        key, meta = self.fetch(url)
+        response = send_file(self._body_path(key), mimetype=meta["content_type"],
+                             etag=meta["hash"], conditional=True, max_age=self.CLIENT_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.stale_while_revalidate = self.CLIENT_STALE
+        # Served from our origin, so keep a hostile SVG from running script
+        response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+
+    def fetch(self, url):
+        """Return (key, metadata) for a cached, fresh copy of url"""
+        self._check_url(url)
+        key = content_hash(url.encode('utf-8'), 32)
+
+        with self._lock:
+            meta = self._lookup(key)
+            if meta is not None and time.time() - meta["checked"] < self.REVALIDATE_AFTER:
+                self._touch(key)
+                return key, meta
+            future = self._inflight.get(url)
+            leader = future is None
+            if leader:
+                future = self._inflight[url] = Future()
+
+        if not leader:
+            try:
+                return future.result(timeout=self.timeout * (self.MAX_REDIRECTS + 2))
+            except FutureTimeout:
+                raise IconProxyError("Timed out waiting for the icon", 504) from None
+
+        try:
+            result = key, self._refresh(url, key, meta)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def _refresh(self, url, key, meta):
+        """Fetch or revalidate url; a stale copy is kept if the origin fails"""
+        headers = {'User-Agent': self.USER_AGENT, 'Accept': 'image/*'}
+        if meta is not None:
+            if meta.get("etag"):
+                headers['If-None-Match'] = meta["etag"]
+            if meta.get("last_modified"):
+                headers['If-Modified-Since'] = meta["last_modified"]
+
+        try:
+            status, response_headers, body = self.pool.fetch(
+                url, headers, self.MAX_ICON_BYTES, self.MAX_REDIRECTS, allow_private=self.allow_private
+            )
+            if status == 304 and meta is not None:
+                meta = dict(meta, checked=time.time())
+                self._write_meta(key, meta)
+                return self._store(key, meta)
+            if status != 200:
+                raise IconProxyError(f"Origin answered {status}")
+            content_type = (response_headers.get('Content-Type') or '').split(';')[0].strip().lower()
+            if not content_type.startswith('image/'):
+                raise IconProxyError(f"Not an image: {content_type or 'no content type'}")
+        except (OSError, FetchError) as e:
+            if meta is not None:
+                print(f"Serving stale icon for {url}: {e}")
+                return meta
+            if isinstance(e, FetchError):
+                raise IconProxyError(str(e), e.status) from None
+            raise IconProxyError(f"Could not fetch icon: {e}") from None
+
+        meta = {
+            "url": url,
+            "content_type": content_type,
+            "etag": response_headers.get('ETag'),
+            "last_modified": response_headers.get('Last-Modified'),
+            "checked": time.time(),
+            "hash": content_hash(body),
+            "size": len(body)
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(self._body_path(key), body)
+        self._write_meta(key, meta)
+        return self._store(key, meta)
+
+    def _check_url(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise IconProxyError("url must be an absolute http(s) URL", 400)
+
+    def _lookup(self, key):
+        """Metadata for key from memory, or from disk if another process cached it"""
+        self._load_index()
+        meta = self._entries.get(key)
+        if meta is not None:
+            if self._body_path(key).exists():
+                return meta
+            # Evicted by another worker
+            self._forget(key)
+        try:
+            meta = json.loads(self._meta_path(key).read_bytes())
+        except (OSError, ValueError):
+            return None
+        if not self._body_path(key).exists():
+            return None
+        return self._store(key, meta)
+
+    def _load_index(self):
+        """Rebuild LRU order from body mtimes, which _touch bumps on every hit"""
+        if self._entries is not None:
+            return
+        self._entries = OrderedDict()
+        self._total = 0
+        bodies = []
+        for path in self.cache_dir.glob('*.bin'):
+            try:
+                bodies.append((path.stat().st_mtime, path.stem))
+            except FileNotFoundError:
+                continue
+        for _mtime, key in sorted(bodies):
+            try:
+                meta = json.loads(self._meta_path(key).read_bytes())
+            except (OSError, ValueError):
+                continue
+            self._entries[key] = meta
+            self._total += meta.get("size", 0)
+
+    def _store(self, key, meta):
+        """Record meta as most recently used and evict down to max_bytes"""
+        with self._lock:
+            self._load_index()
+            self._forget(key)
+            self._entries[key] = meta
+            self._total += meta.get("size", 0)
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_key = next(iter(self._entries))
+                self._forget(old_key)
+                for path in (self._body_path(old_key), self._meta_path(old_key)):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+        return meta
+
+    def _forget(self, key):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._total -= old.get("size", 0)
+
+    def _touch(self, key):
+        self._entries.move_to_end(key)
+        try:
+            os.utime(self._body_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _write_meta(self, key, meta):
+        self._write_atomic(self._meta_path(key), json.dumps(meta).encode('utf-8'))
+
+    def _write_atomic(self, path, data):
+        fd, temp_name = tempfile.mkstemp(dir=str(self.cache_dir))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_name, path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+    def _body_path(self, key):
+        return self.cache_dir / f"{key}.bin"
+
+    def _meta_path(self, key):
+        return self.cache_dir / f"{key}.json"
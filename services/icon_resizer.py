@@ -0,0 +1,183 @@
+"""
+Icon Resizer for WarmbOS
+Generates downscaled PNG icon variants on demand and keeps them in a
+size-capped LRU cache on disk
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from utils.http_utils import file_etag
+from utils.lazy_imports import optional_module
+
+class IconResizer:
+    """Serves PNG icons scaled to a fixed set of sizes
+
+    Requested sizes are snapped up to the next entry in SIZES so the cache
+    holds a bounded number of variants per icon. Variants are named after
+    the source's content hash, so a changed icon never serves a stale
+    variant and the old one simply ages out. Recency is tracked in memory
+    and mirrored to file mtimes, which is how other worker processes and
+    the next start pick it up; eviction is therefore approximate across
+    processes but the cache never grows far past max_bytes.
+
+    Without Pillow every request falls back to the original file.
+    """
+
+    SIZES = (16, 24, 32, 48, 64, 96, 128, 256)
+    RESIZABLE = {'.png'}
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = None
+        self._total = 0
+        self._evictions = 0
+        self._building = {}
+        # Variants that would not be smaller than their source
+        self._originals = set()
+
+    @property
+    def available(self):
+        return optional_module('PIL.Image') is not None
+
+    def snap(self, size):
+        """Smallest supported size at least as large as size"""
+        return next((s for s in self.SIZES if s >= size), self.SIZES[-1])
+
+    def resize(self, path, etag, size):
+        """Return (variant path, variant etag), or None to serve the original"""
+        if path.suffix.lower() not in self.RESIZABLE or not self.available:
+            return None
+
+        size = self.snap(size)
+        name = f"{etag}-{size}.png"
+        variant = self.cache_dir / name
+        if name in self._originals:
+            return None
+        if self._touch(name, variant):
+            return variant, f"{etag}-{size}"
+
+        if not self._build(path, variant, size):
+            return None
+        return variant, f"{etag}-{size}"
+
+    def warm(self, paths, sizes):
+        """Pre-generate variants for icon files, stopping once the cache is full"""
+        if not self.available:
+            return
+        created = 0
+        evictions = self._evictions
+        for path in paths:
+            path = Path(path)
+            if path.suffix.lower() not in self.RESIZABLE:
+                continue
+            try:
+                etag = file_etag(path)
+            except OSError:
+                continue
+            for size in sizes:
+                name = f"{etag}-{self.snap(size)}.png"
+                if name in self._originals or self._touch(name, self.cache_dir / name):
+                    continue
+                if self._build(path, self.cache_dir / name, self.snap(size)):
+                    created += 1
+                # Warming past this point would only evict what was just built
+                if self._evictions != evictions:
+                    print(f"Icon resize cache full after warming {created} variants")
+                    return
+        print(f"Warmed {created} resized icon variants")
+
+    def _load_entries(self):
+        """Index existing variants, oldest first; caller holds the lock"""
+        self._entries = OrderedDict()
+        self._total = 0
+        if not self.cache_dir.is_dir():
+            return
+        found = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.png') and entry.is_file():
+                    stat = entry.stat()
+                    found.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        for _mtime, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+
+    def _touch(self, name, variant):
+        """Mark a cached variant as recently used; False if it is not cached"""
+        with self._lock:
+            if self._entries is None:
+                self._load_entries()
+            if name not in self._entries:
+                return False
+            self._entries.move_to_end(name)
+        try:
+            os.utime(variant)
+        except FileNotFoundError:
+            # Evicted by another worker process
+            with self._lock:
+                self._total -= self._entries.pop(name, 0)
+            return False
+        return True
+
+    def _build(self, path, variant, size):
+        """Render one variant, letting concurrent requests for it wait on a single build"""
+        with self._lock:
+            event = self._building.get(variant.name)
+            owner = event is None
+            if owner:
+                event = self._building[variant.name] = threading.Event()
+        if not owner:
+            event.wait()
+            return variant.exists()
+
+        try:
+            data = self._render(path, size)
+            if data is None:
+                with self._lock:
+                    self._originals.add(variant.name)
+                return False
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = variant.with_name(variant.name + f'.{os.getpid()}.tmp')
+            temp_file.write_bytes(data)
+            os.replace(temp_file, variant)
+            with self._lock:
+                self._entries[variant.name] = len(data)
+                self._total += len(data)
+                self._evict()
+            return True
+        except OSError as e:
+            print(f"Failed to resize icon {path}: {e}")
+            return False
+        finally:
+            with self._lock:
+                del self._building[variant.name]
+            event.set()
+
+    def _render(self, path, size):
+        """Downscale to fit size x size, or None if the icon is already that small"""
+        Image = optional_module('PIL.Image')
+        with Image.open(path) as image:
+            if image.width <= size and image.height <= size:
+                return None
+            image = image.convert('RGBA')
+            image.thumbnail((size, size), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format='PNG', optimize=True)
+        return output.getvalue()
+
+    def _evict(self):
+        """Remove least recently used variants until under max_bytes; caller holds the lock"""
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            self._evictions += 1
+            try:
+                os.remove(self.cache_dir / name)
+            except OSError:
+                pass
@@ -0,0 +1,161 @@
+"""
+Icon Store for WarmbOS
+Content-addressed storage for synced icon files
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+class IconStore:
+    """Holds each unique icon once, under objects/<aa>/<hash><ext>
+
+    The /icons/ tree is built from hardlinks to these objects, so identical
+    files share one inode on disk and in the page cache. Hashes are the same
+    short content hashes used for ETags, so an icon's hash is also its
+    ?v= version.
+
+    index.json maps archive entry fingerprints (CRC-32, size, extension) to
+    hashes, which lets a sync recognise unchanged files from the zip
+    directory alone, and maps every /icons/ path to its hash.
+    """
+
+    INDEX_FILE = "index.json"
+    INDEX_VERSION = 1
+    # Matches utils.http_utils.content_hash, so hashes double as ETags
+    HASH_LENGTH = 16
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self._index = None
+
+    @property
+    def paths(self):
+        """Relative icon path -> hash for the current tree"""
+        return self._load()["paths"]
+
+    def object_path(self, file_hash, suffix):
+        return self.objects_dir / file_hash[:2] / f"{file_hash}{suffix}"
+
+    def lookup(self, crc, size, suffix):
+        """Hash of a stored object matching an archive entry, or None"""
+        file_hash = self._load()["archive"].get(self._fingerprint(crc, size, suffix))
+        if file_hash and self.object_path(file_hash, suffix).exists():
+            return file_hash
+        return None
+
+    def add(self, source, suffix, crc=None, size=None):
+        """Store the contents of a binary file object, returning its hash"""
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_name = tempfile.mkstemp(dir=str(self.objects_dir))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            file_hash = digest.hexdigest()[:self.HASH_LENGTH]
+
+            target = self.object_path(file_hash, suffix)
+            if target.exists():
+                os.remove(temp_name)
+            else:
+                target.parent.mkdir(exist_ok=True)
+                os.chmod(temp_name, 0o644)
+                os.replace(temp_name, target)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        if crc is not None:
+            self._load()["archive"][self._fingerprint(crc, size, suffix)] = file_hash
+        return file_hash
+
+    def link(self, file_hash, suffix, target):
+        """Hardlink an object into a tree, copying where links are not supported"""
+        source = self.object_path(file_hash, suffix)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+    def commit(self, paths):
+        """Record the path table of a newly installed tree, drop unreferenced
+        objects and save the index"""
+        index = self._load()
+        index["paths"] = paths
+        live = set(paths.values())
+        index["archive"] = {k: v for k, v in index["archive"].items() if v in live}
+
+        removed = 0
+        if self.objects_dir.exists():
+            for directory in self.objects_dir.iterdir():
+                if not directory.is_dir():
+                    continue
+                for path in directory.iterdir():
+                    if path.name.split('.', 1)[0] not in live:
+                        path.unlink()
+                        removed += 1
+        if removed:
+            print(f"Removed {removed} unreferenced icon objects")
+        self._save()
+
+    def adopt(self, tree):
+        """Move an existing tree into the store, replacing its files with links"""
+        tree = Path(tree)
+        paths = {}
+        # Links are made under a private directory, then renamed over each file
+        links_dir = Path(tempfile.mkdtemp(prefix='.adopt-', dir=str(tree.parent)))
+        try:
+            for directory, _dirs, files in os.walk(tree):
+                for name in files:
+                    path = Path(directory) / name
+                    suffix = path.suffix.lower()
+                    with open(path, 'rb') as f:
+                        file_hash = self.add(f, suffix)
+                    if not os.path.samefile(path, self.object_path(file_hash, suffix)):
+                        temp_file = links_dir / name
+                        self.link(file_hash, suffix, temp_file)
+                        os.replace(temp_file, path)
+                    paths[path.relative_to(tree).as_posix()] = file_hash
+        finally:
+            shutil.rmtree(links_dir, ignore_errors=True)
+        self.commit(paths)
+        print(f"Stored {len(paths)} icons as {len(set(paths.values()))} unique files")
+
+    def reset(self):
+        """Forget archive fingerprints so the next sync re-extracts every file"""
+        self._load()["archive"] = {}
+
+    def _fingerprint(self, crc, size, suffix):
+        return f"{crc:08x}:{size}:{suffix}"
+
+    def _load(self):
+        if self._index is None:
+            self._index = {"version": self.INDEX_VERSION, "archive": {}, "paths": {}}
+            try:
+                with open(self.root / self.INDEX_FILE, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get("version") == self.INDEX_VERSION:
+                    self._index = index
+            except (OSError, ValueError):
+                pass
+        return self._index
+
+    def _save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        index_file = self.root / self.INDEX_FILE
+        fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(self.root))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(json.dumps(self._index, separators=(',', ':')).encode('utf-8'))
+            os.replace(temp_name, index_file)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
@@ -0,0 +1,223 @@
+"""
+Instrumentation for WarmbOS
+Counters, gauges and histograms rendered in the Prometheus text format
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; request latencies and long-running jobs need different ranges
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None, const=()):
+    pairs = list(const) + list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    """Base for one named metric family with a fixed set of label names"""
+
+    TYPE = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self, const=()):
+        """Exposition lines; const is (name, value) label pairs added to every series"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value, const))
+        return lines
+
+    def _render_sample(self, key, value, const=()):
+        return [f"{self.name}{_format_labels(self.label_names, key, const=const)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    TYPE = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Mirror a total kept elsewhere, such as process CPU time"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Gauge(_Metric):
+    TYPE = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (not cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, state, const=()):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.label_names, key, ('le', _format_value(bound)), const)
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key, ('le', '+Inf'), const)
+        lines.append(f"{self.name}_bucket{labels} {count}")
+        plain = _format_labels(self.label_names, key, const=const)
+        lines.append(f"{self.name}_sum{plain} {_format_value(total)}")
+        lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+class Registry:
+    """Named metrics of one process, rendered together for /metrics
+
+    Every series carries a worker label with the process id, read at
+    render time so it is right after a fork. Workers behind one port then
+    show up as separate series instead of one counter that jumps between
+    their totals; sum over worker to aggregate.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collect):
+        """Call collect() before every render, e.g. to refresh gauges"""
+        self._collectors.append(collect)
+
+    def render(self):
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        const = (('worker', os.getpid()),)
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render(const))
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            return self._metrics[metric.name]
+        self._metrics[metric.name] = metric
+        return metric
+
+# Shared by the request hooks, the icon services and /metrics
+registry = Registry()
+
+ICON_SYNC_PHASE_SECONDS = registry.histogram(
+    'warmbos_icon_sync_phase_seconds',
+    'Duration of each icon sync phase',
+    labels=('phase',),
+    buckets=JOB_BUCKETS
+)
+ICON_MANIFEST_SECONDS = registry.histogram(
+    'warmbos_icon_manifest_generation_seconds',
+    'Duration of icon manifest generation',
+    buckets=JOB_BUCKETS
+)
+STARTUP_PHASE_SECONDS = registry.gauge(
+    'warmbos_startup_phase_seconds',
+    'Time spent in each startup phase of this process',
+    labels=('phase',)
+)
+
+class StartupTimer:
+    """Splits process startup into consecutive named phases for the log
+
+    Each mark() ends the current phase where the previous one stopped, so
+    the phases add up to the total since started.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []
+        self._last = self.started
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        seconds = now - self._last
+        self.phases.append((phase, seconds))
+        STARTUP_PHASE_SECONDS.set(seconds, phase=phase)
+        self._last = now
+
+    def report(self):
+        total = self._last - self.started
+        breakdown = ', '.join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+        print(f"Started in {total * 1000:.0f} ms ({breakdown})")
@@ -0,0 +1,194 @@
+"""
+Metrics History Store for WarmbOS
+Fixed-size array ring buffers with automatic downsampling tiers
+"""
+
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+METRICS = ('cpu', 'memory', 'disk', 'net_sent', 'net_recv')
+
+# (seconds per point, number of points): 1 s for an hour, 1 min for a day, 15 min for a month
+TIERS = ((1, 3600), (60, 1440), (900, 2880))
+
+FILE_MAGIC = b'WMH1'
+
+class _Tier:
+    """One resolution level: a ring of time buckets addressed by bucket number"""
+
+    def __init__(self, step, slots):
+        self.step = step
+        self.slots = slots
+        self.times = array('d', [0.0]) * slots
+        self.values = {metric: array('d', [math.nan]) * slots for metric in METRICS}
+        self._bucket = None
+        self._sums = dict.fromkeys(METRICS, 0.0)
+        self._count = 0
+
+    def add(self, timestamp, values):
+        """Accumulate a sample into the current bucket, closing the previous one"""
+        bucket = int(timestamp // self.step) * self.step
+        if self._bucket is not None and bucket != self._bucket:
+            self._flush()
+        self._bucket = bucket
+        for metric in METRICS:
+            self._sums[metric] += values[metric]
+        self._count += 1
+
+    def query(self, metric, start, end):
+        """Points between start and end, read by direct slot addressing
+        
+        Only the buckets the ring can still hold are visited, so the work
+        is bounded by its size however wide the range is.
+        """
+        values = self.values[metric]
+        points = []
+        last = int(end // self.step) * self.step
+        first = max(int(start // self.step) * self.step, last - (self.slots - 1) * self.step)
+        for bucket in range(first, last + 1, self.step):
+            slot = (bucket // self.step) % self.slots
+            if self.times[slot] == bucket and not math.isnan(values[slot]):
+                points.append([bucket, round(values[slot], 2)])
+        return points
+
+    def _flush(self):
+        slot = (self._bucket // self.step) % self.slots
+        self.times[slot] = self._bucket
+        for metric in METRICS:
+            self.values[metric][slot] = self._sums[metric] / self._count
+            self._sums[metric] = 0.0
+        self._count = 0
+
+class MetricsHistory:
+    """In-process time series of system metrics with optional binary persistence
+
+    Every worker process keeps its own copy in memory, but only one owns
+    the file: the one holding an flock on <name>.lock. The others keep
+    trying at each save, so a new owner takes over if the old one exits.
+    """
+
+    SAVE_INTERVAL = 60
+    # Longer ranges are clamped to what the coarsest tier keeps
+    MAX_RANGE = max(step * slots for step, slots in TIERS)
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.lock_path = self.path.with_name(self.path.name + '.lock') if self.path else None
+        self._lock = threading.Lock()
+        self._tiers = [_Tier(step, slots) for step, slots in TIERS]
+        self._last_save = time.monotonic()
+        self._owner_file = None
+        if self.path and self.path.exists():
+            self.load()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    @property
+    def owner(self):
+        """Whether this process writes the history file, claiming it if it is free"""
+        if not self.path:
+            return False
+        if fcntl is None or self._owner_file is not None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        except OSError:
+            lock_file.close()
+            raise
+        # Held open for the life of the process; closing it releases the claim
+        self._owner_file = lock_file
+        return True
+
+    def record(self, sample):
+        """Add one sample from MetricsBroadcaster to every tier"""
+        values = {
+            'cpu': sample['cpu']['percent'],
+            'memory': sample['memory']['percent'],
+            'disk': sample['disk']['percent'],
+            'net_sent': sample['network']['sent_bps'],
+            'net_recv': sample['network']['recv_bps']
+        }
+        with self._lock:
+            for tier in self._tiers:
+                tier.add(sample['time'], values)
+
+        if self.path and time.monotonic() - self._last_save >= self.SAVE_INTERVAL:
+            self.save()
+
+    def query(self, metric, seconds, end=None):
+        """Points for the last `seconds`, from the finest tier that covers the range"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
+        end = time.time() if end is None else end
+        seconds = min(seconds, self.MAX_RANGE)
+        tier = next((t for t in self._tiers if t.step * t.slots >= seconds), self._tiers[-1])
+        with self._lock:
+            points = tier.query(metric, end - seconds, end)
+        return {"metric": metric, "step": tier.step, "points": points}
+
+    def save(self):
+        """Write all tiers to the binary history file if this process owns it"""
+        self._last_save = time.monotonic()
+        temp_name = None
+        try:
+            if not self.owner:
+                return
+            fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(self.path.parent))
+            with self._lock, os.fdopen(fd, 'wb') as f:
+                f.write(FILE_MAGIC)
+                f.write(struct.pack('<II', len(self._tiers), len(METRICS)))
+                for tier in self._tiers:
+                    f.write(struct.pack('<II', tier.step, tier.slots))
+                    tier.times.tofile(f)
+                    for metric in METRICS:
+                        tier.values[metric].tofile(f)
+            os.replace(temp_name, self.path)
+        except OSError as e:
+            print(f"Failed to save metrics history: {e}")
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
+
+    def load(self):
+        """Restore tiers from the binary history file if its layout matches"""
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(4) != FILE_MAGIC:
+                    return
+                tier_count, metric_count = struct.unpack('<II', f.read(8))
+                if tier_count != len(self._tiers) or metric_count != len(METRICS):
+                    return
+                for tier in self._tiers:
+                    step, slots = struct.unpack('<II', f.read(8))
+                    if (step, slots) != (tier.step, tier.slots):
+                        return
+                    times = array('d')
+                    times.fromfile(f, slots)
+                    values = {}
+                    for metric in METRICS:
+                        values[metric] = array('d')
+                        values[metric].fromfile(f, slots)
+                    tier.times, tier.values = times, values
+        except (OSError, EOFError, struct.error) as e:
+            print(f"Ignoring metrics history file: {e}")
+
+    def _reset_after_fork(self):
+        # A claim inherited from the parent is not this process's to keep
+        if self._owner_file is not None:
+            self._owner_file.close()
+            self._owner_file = None
@@ -0,0 +1,291 @@
+"""
+Live Metrics Stream for WarmbOS
+One background psutil sampler fanned out to Server-Sent Events subscribers
+"""
+
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class TooManySubscribers(Exception):
+    """Raised when this process already streams to max_subscribers clients"""
+
+class MetricsBroadcaster:
+    """Samples system metrics once per interval and pushes changes to all subscribers
+
+    Each frame is serialized once and shared by every client. Subscribers get
+    a full snapshot when they connect and only changed fields afterwards. A
+    subscriber whose queue fills up has its backlog replaced by a fresh
+    snapshot, so slow consumers skip ahead instead of holding memory or
+    blocking the sampler.
+
+    With live_path set, only the process holding an flock on <name>.lock
+    reads psutil; it writes each sample to live_path and the other worker
+    processes fan out what they read from there. If the sampler exits,
+    the next process to try the lock takes over.
+
+    Every stream holds a server thread for as long as it is open, so each
+    process accepts at most max_subscribers of them and raises
+    TooManySubscribers beyond that, leaving threads for other requests.
+
+    With a history store attached the sampler runs continuously and records
+    every sample, whether or not anyone is subscribed.
+    """
+
+    INTERVAL = 1
+    QUEUE_SIZE = 10
+    KEEPALIVE = 15
+    MAX_SUBSCRIBERS = 2
+    # Seconds a refused client should wait before connecting again
+    RETRY_AFTER = 10
+
+    def __init__(self, disk_path='.', history=None, live_path=None, max_subscribers=None):
+        self.disk_path = disk_path
+        self.history = history
+        self.live_path = Path(live_path) if live_path else None
+        self.max_subscribers = max_subscribers or self.MAX_SUBSCRIBERS
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._sampler = None
+        self._last_sample = None
+        self._last_net = None
+        self._live_key = None
+        self._sampler_lock_file = None
+        self._primed = False
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """Register a subscriber queue, starting the sampler if needed
+
+        Raises TooManySubscribers when this process is at max_subscribers.
+        """
+        subscriber = queue.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            if self._last_sample is not None:
+                subscriber.put_nowait(self._frame('snapshot', self._last_sample))
+            self._subscribers.add(subscriber)
+            self._ensure_sampler()
+        return subscriber
+
+    def start(self):
+        """Start sampling ahead of the first subscriber"""
+        with self._lock:
+            self._ensure_sampler()
+
+    def _ensure_sampler(self):
+        """Start the sampler thread if it is not running; caller holds the lock"""
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop)
+            self._sampler.daemon = True
+            self._sampler.start()
+
+    def unsubscribe(self, subscriber):
+        """Remove a subscriber; the sampler stops once nobody is listening"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self):
+        """SSE frames for one client; raises TooManySubscribers before any are sent"""
+        return self._frames(self.subscribe())
+
+    def _frames(self, subscriber):
+        try:
+            yield f"retry: {self.INTERVAL * 3000}\n\n"
+            while True:
+                try:
+                    yield subscriber.get(timeout=self.KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _sample_loop(self):
+        """Sample while there are subscribers or a history store, then exit"""
+        while True:
+            # Followers poll more often so they pass samples on promptly
+            time.sleep(self.INTERVAL if self._claim_sampler() else self.INTERVAL / 4)
+            with self._lock:
+                if not self._subscribers and self.history is None:
+                    self._sampler = None
+                    self._last_sample = None
+                    self._last_net = None
+                    self._live_key = None
+                    return
+
+            try:
+                sample = self._next_sample()
+            except Exception as e:
+                print(f"Metrics sample error: {e}")
+                continue
+            if sample is None:
+                continue
+
+            if self.history is not None:
+                self.history.record(sample)
+
+            with self._lock:
+                previous = self._last_sample
+                self._last_sample = sample
+                subscribers = list(self._subscribers)
+
+            if not subscribers:
+                continue
+
+            if previous is None:
+                self._publish(subscribers, self._frame('snapshot', sample), sample)
+            else:
+                delta = {k: v for k, v in sample.items() if previous.get(k) != v}
+                self._publish(subscribers, self._frame('delta', delta), sample)
+
+    def _next_sample(self):
+        """A fresh sample if this process is the sampler, else the sampler's latest; None if nothing new"""
+        if not self._claim_sampler():
+            return self._read_live()
+        # Imported by the sampler only, so startup and follower workers skip it
+        import psutil
+
+        if not self._primed:
+            psutil.cpu_percent(interval=None)  # prime the CPU counter
+            self._primed = True
+            return None
+        sample = self._sample()
+        if self.live_path is not None:
+            self._write_live(sample)
+        return sample
+
+    def _claim_sampler(self):
+        """Whether this process samples psutil, taking the role if it is free"""
+        if self.live_path is None or fcntl is None or self._sampler_lock_file is not None:
+            return True
+        lock_file = open(self.live_path.with_name(self.live_path.name + '.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        except OSError:
+            lock_file.close()
+            raise
+        # Held open for the life of the process; closing it releases the role
+        self._sampler_lock_file = lock_file
+        return True
+
+    def _read_live(self):
+        """The sampler's latest sample, or None if it has not changed"""
+        try:
+            stat = self.live_path.stat()
+        except FileNotFoundError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key == self._live_key:
+            return None
+        self._live_key = key
+        try:
+            sample = json.loads(self.live_path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        if self._last_sample is not None and sample.get('time') == self._last_sample.get('time'):
+            return None
+        return sample
+
+    def _write_live(self, sample):
+        fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(self.live_path.parent))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+                json.dump(sample, temp_file, separators=(',', ':'))
+            os.replace(temp_name, self.live_path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+    def _reset_after_fork(self):
+        # The sampler thread and the role it held stay with the parent
+        if self._sampler_lock_file is not None:
+            self._sampler_lock_file.close()
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._sampler = None
+        self._sampler_lock_file = None
+        self._primed = False
+        self._live_key = None
+
+    def _publish(self, subscribers, frame, sample):
+        """Hand a frame to every subscriber without blocking on slow ones"""
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(frame)
+            except queue.Full:
+                # Dropped deltas would leave the client inconsistent, so
+                # replace the backlog with one full snapshot
+                self._drain(subscriber)
+                try:
+                    subscriber.put_nowait(self._frame('snapshot', sample))
+                except queue.Full:
+                    pass
+
+    def _drain(self, subscriber):
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                return
+
+    def _sample(self):
+        """Read CPU, memory, disk, network and uptime"""
+        import psutil
+
+        now = time.time()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        net = psutil.net_io_counters()
+
+        sent_rate = recv_rate = 0
+        if self._last_net is not None:
+            last_time, last_net = self._last_net
+            elapsed = max(now - last_time, 1e-6)
+            sent_rate = round((net.bytes_sent - last_net.bytes_sent) / elapsed)
+            recv_rate = round((net.bytes_recv - last_net.bytes_recv) / elapsed)
+        self._last_net = (now, net)
+
+        return {
+            'time': round(now, 3),
+            'uptime': int(now - psutil.boot_time()),
+            'cpu': {
+                'percent': psutil.cpu_percent(interval=None)
+            },
+            'memory': {
+                'used_gb': round(memory.used / (1024**3), 1),
+                'total_gb': round(memory.total / (1024**3), 1),
+                'percent': memory.percent
+            },
+            'disk': {
+                'used_gb': round(disk.used / (1024**3), 1),
+                'total_gb': round(disk.total / (1024**3), 1),
+                'percent': disk.percent
+            },
+            'network': {
+                'sent_bps': sent_rate,
+                'recv_bps': recv_rate
+            }
+        }
+
+    def _frame(self, event, data):
+        """Serialize one SSE frame"""
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,348 @@
+"""
+Shortcut Health Prober for WarmbOS
+Checks every web shortcut concurrently in the background and caches
+whether it answers and how fast
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from utils.http_utils import content_hash
+
+def shortcut_urls(document):
+    """Absolute http(s) contentPath / url values anywhere in a shortcuts document"""
+    urls = []
+
+    def visit(value):
+        if isinstance(value, list):
+            for item in value:
+                visit(item)
+        elif isinstance(value, dict):
+            for field in ('contentPath', 'url'):
+                target = value.get(field)
+                if isinstance(target, str) and target.lower().startswith(('http://', 'https://')):
+                    urls.append(target)
+            for item in value.values():
+                if isinstance(item, (list, dict)):
+                    visit(item)
+
+    visit(document)
+    return list(dict.fromkeys(urls))
+
+class AsyncConnectionPool:
+    """Keep-alive HTTP/1.1 connections for probes, reused per host
+
+    Just enough HTTP for a health check: a HEAD (or GET when HEAD is not
+    allowed) whose latency is the time to the status line. Bodies are
+    never read; a connection is only kept when none was sent.
+    """
+
+    MAX_IDLE_PER_HOST = 2
+    USER_AGENT = 'WarmbOS-HealthCheck/1.0'
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._idle = {}
+        self._ssl = None
+
+    async def probe(self, url):
+        """Return (status code, seconds to first response line)"""
+        parts = urlsplit(url)
+        status, latency = await self._request(parts, 'HEAD')
+        if status in (405, 501):
+            status, latency = await self._request(parts, 'GET')
+        return status, latency
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _reader, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    async def _request(self, parts, method):
+        https = parts.scheme == 'https'
+        port = parts.port or (443 if https else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        request = (
+            f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {self.USER_AGENT}\r\n"
+            f"Accept: */*\r\nConnection: keep-alive\r\n\r\n"
+        ).encode('latin-1')
+
+        idle = self._idle.get(key)
+        if idle:
+            try:
+                return await self._exchange(key, idle.pop(), request, method)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                # The server dropped the idle connection; retry on a new one
+                pass
+
+        started = time.perf_counter()
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port, ssl=self._ssl_context() if https else None),
+            self.timeout
+        )
+        return await self._exchange(key, connection, request, method, started)
+
+    async def _exchange(self, key, connection, request, method, started=None):
+        reader, writer = connection
+        try:
+            started = started or time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            latency = time.perf_counter() - started
+            if not status_line:
+                raise ConnectionResetError("connection closed")
+            status = int(status_line.split()[1])
+
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _sep, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip().lower()
+        except BaseException:
+            writer.close()
+            raise
+
+        no_body = method == 'HEAD' or status in (204, 304) or headers.get('content-length') == '0'
+        idle = self._idle.setdefault(key, [])
+        if no_body and headers.get('connection') != 'close' and len(idle) < self.MAX_IDLE_PER_HOST:
+            idle.append(connection)
+        else:
+            writer.close()
+        return status, latency
+
+    def _ssl_context(self):
+        if self._ssl is None:
+            import ssl
+            # A liveness check sends nothing and reads no body, and self-hosted
+            # services often use self-signed certificates, so skip verification
+            self._ssl = ssl.create_default_context()
+            self._ssl.check_hostname = False
+            self._ssl.verify_mode = ssl.CERT_NONE
+        return self._ssl
+
+class ShortcutHealthProber:
+    """Probes every web shortcut on an interval from one background thread
+
+    All checks in a round run concurrently on an asyncio loop, bounded by
+    MAX_CONCURRENCY overall and PER_HOST_CONCURRENCY per host, with at
+    least PER_HOST_SPACING seconds between requests to one host. A
+    shortcut is "up" when it answers with a status below 500. Results are
+    kept in memory and serialized once per round for the health endpoint.
+
+    With results_path set, only the process holding an flock on
+    <name>.lock probes, so the limits above hold for the whole server
+    rather than per worker. It writes each round to results_path, which
+    the other workers serve from, and starts a round early when any
+    worker touches <name>.refresh. The others retry the lock every
+    FOLLOWER_RETRY seconds and take over if the prober exits.
+    """
+
+    MAX_CONCURRENCY = 16
+    PER_HOST_CONCURRENCY = 2
+    PER_HOST_SPACING = 0.25
+    FOLLOWER_RETRY = 5
+    # How often the probing process looks for a refresh asked for by another worker
+    REFRESH_POLL = 1
+
+    def __init__(self, sources, interval=60, timeout=5, results_path=None):
+        """sources is a callable returning the shortcuts documents to probe"""
+        self.sources = sources
+        self.interval = interval
+        self.timeout = timeout
+        self.results_path = Path(results_path) if results_path else None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._results = {}
+        self._body = None
+        self._etag = None
+        self._checked = None
+        self._wake = None
+        self._loop = None
+        self._lock_file = None
+        self._results_key = None
+
+    def start(self):
+        """Start probing in the background; safe to call more than once"""
+        with self._lock:
+            if self._thread is None and self.interval > 0:
+                self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        """Start the next round now, e.g. after shortcuts were saved"""
+        if self.results_path is not None:
+            try:
+                self._refresh_path().touch()
+            except OSError as e:
+                print(f"Failed to request a shortcut health check: {e}")
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            loop.call_soon_threadsafe(wake.set)
+
+    def snapshot(self):
+        """Return (body bytes, etag) of the latest results"""
+        with self._lock:
+            if self.results_path is not None and self._lock_file is None:
+                self._load_results_locked()
+            if self._body is None:
+                self._publish_locked()
+            return self._body, self._etag
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        pool = AsyncConnectionPool(self.timeout)
+        try:
+            while True:
+                if not self._claim():
+                    await self._sleep(time.time() + self.FOLLOWER_RETRY)
+                    continue
+                started = time.time()
+                try:
+                    await self._probe_round(pool)
+                except Exception as e:
+                    print(f"Shortcut health check error: {e}")
+                await self._sleep(started + self.interval, started)
+        finally:
+            await pool.close()
+
+    async def _sleep(self, deadline, round_started=None):
+        """Wait until deadline, a local refresh, or (if round_started) a refresh from another worker"""
+        while time.time() < deadline:
+            timeout = deadline - time.time()
+            if round_started is not None and self.results_path is not None:
+                timeout = min(timeout, self.REFRESH_POLL)
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(timeout, 0))
+                break
+            except asyncio.TimeoutError:
+                if round_started is not None and self._refresh_requested(round_started):
+                    break
+        self._wake.clear()
+
+    def _claim(self):
+        """Whether this process probes, taking the role if it is free"""
+        if self.results_path is None or fcntl is None or self._lock_file is not None:
+            return True
+        self.results_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.results_path.with_suffix('.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        except OSError:
+            lock_file.close()
+            raise
+        # Held open for the life of the process; closing it releases the role
+        self._lock_file = lock_file
+        return True
+
+    def _refresh_path(self):
+        return self.results_path.with_suffix('.refresh')
+
+    def _refresh_requested(self, since):
+        try:
+            return self._refresh_path().stat().st_mtime > since
+        except FileNotFoundError:
+            return False
+
+    def _load_results_locked(self):
+        """Serve the probing process's latest round"""
+        try:
+            stat = self.results_path.stat()
+        except FileNotFoundError:
+            return
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key == self._results_key:
+            return
+        try:
+            body = self.results_path.read_bytes()
+        except OSError:
+            return
+        self._results_key = key
+        self._body, self._etag = body, content_hash(body)
+
+    async def _probe_round(self, pool):
+        urls = []
+        for document in self.sources():
+            urls.extend(shortcut_urls(document))
+        urls = list(dict.fromkeys(urls))
+
+        limit = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        hosts = {}
+
+        async def check(url):
+            host = urlsplit(url).netloc.lower()
+            if host not in hosts:
+                hosts[host] = {"limit": asyncio.Semaphore(self.PER_HOST_CONCURRENCY), "next": 0.0}
+            gate = hosts[host]
+            async with limit, gate["limit"]:
+                # Space requests to one host out instead of bursting them
+                now = time.monotonic()
+                wait = gate["next"] - now
+                gate["next"] = max(now, gate["next"]) + self.PER_HOST_SPACING
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return url, await self._check(pool, url)
+
+        results = dict(await asyncio.gather(*(check(url) for url in urls)))
+        with self._lock:
+            self._results = results
+            self._checked = time.time()
+            self._publish_locked()
+            body = self._body
+        if self.results_path is not None:
+            self._write_results(body)
+
+    async def _check(self, pool, url):
+        result = {"checked": time.time()}
+        try:
+            status, latency = await pool.probe(url)
+        except asyncio.TimeoutError:
+            result.update(status="down", error=f"No response within {self.timeout}s")
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+            result.update(status="down", error=str(e) or type(e).__name__)
+        else:
+            result.update(
+                status="up" if status < 500 else "down",
+                code=status,
+                latency_ms=round(latency * 1000, 1)
+            )
+        return result
+
+    def _publish_locked(self):
+        body = json.dumps({
+            "interval": self.interval,
+            "checked": self._checked,
+            "shortcuts": self._results
+        }, separators=(',', ':')).encode('utf-8')
+        self._body, self._etag = body, content_hash(body)
+
+    def _write_results(self, body):
+        fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(self.results_path.parent))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(body)
+            os.replace(temp_name, self.results_path)
+        except OSError as e:
+            print(f"Failed to write {self.results_path}: {e}")
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
@@ -0,0 +1,231 @@
+"""
+Desktop State Store for WarmbOS
+Keeps the desktop state document in memory, updates it with JSON patches
+and persists it through an append-only log compacted into snapshots
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from utils.json_patch import JsonPatchError, apply_patch
+
+class RevisionConflict(Exception):
+    """Raised when a patch was made against an older revision of the state"""
+
+    def __init__(self, current_revision):
+        super().__init__("Desktop state was modified by another client")
+        self.current_revision = current_revision
+
+class StateStore:
+    """A versioned JSON object changed only by patches
+
+    Each accepted patch bumps the revision and becomes one line of the log.
+    A patch holds an flock on a sidecar lock file while it reads any lines
+    other processes appended, checks the revision and appends its own, so
+    it is only acknowledged once it is on disk and every worker agrees on
+    the order; the loser of a race gets RevisionConflict. When the log
+    passes COMPACT_ENTRIES lines or COMPACT_BYTES, the state is written
+    out as a snapshot and the log is emptied, so disk use and startup
+    replay stay bounded.
+
+    Loading reads the snapshot and replays the log. A line only applies to
+    the revision it was made against, which skips lines already in the
+    snapshot (after a crash between snapshot and truncation) and a torn
+    last line. As with ConfigStore, other processes' changes are picked up
+    by stat, and while only the log has grown just its new tail is read.
+    """
+
+    COMPACT_ENTRIES = 200
+    COMPACT_BYTES = 256 * 1024
+
+    def __init__(self, snapshot_path, log_path):
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = Path(log_path)
+        self.lock_path = self.log_path.with_name(self.log_path.name + '.lock')
+        self._lock = threading.RLock()
+        self._state = None
+        self._revision = 0
+        self._updated = None
+        self._log_entries = 0
+        # Bytes of the log already applied to _state
+        self._log_offset = 0
+        self._disk_key = None
+
+    def get(self):
+        """Return (revision, last update time or None, state)"""
+        with self._lock:
+            self._refresh()
+            return self._revision, self._updated, self._state
+
+    def patch(self, operations, if_revision=None):
+        """Apply a JSON patch and return the new revision
+
+        if_revision None skips the revision check. Raises RevisionConflict
+        for a stale revision and JsonPatchError for a patch that does not
+        apply; either way the state is unchanged.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            if if_revision is not None and if_revision != self._revision:
+                raise RevisionConflict(self._revision)
+
+            state = apply_patch(self._state, operations)
+            if not isinstance(state, dict):
+                raise JsonPatchError("the desktop state must be an object")
+
+            entry = {
+                "base": self._revision,
+                "revision": self._revision + 1,
+                "updated": time.time(),
+                "ops": operations
+            }
+            self._drop_torn_tail()
+            with open(self.log_path, 'ab') as f:
+                f.write(json.dumps(entry, separators=(',', ':')).encode('utf-8') + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+                self._log_offset = f.tell()
+            self._log_entries += 1
+            self._state = state
+            self._revision = entry["revision"]
+            self._updated = entry["updated"]
+
+            try:
+                if self._log_entries >= self.COMPACT_ENTRIES or self._log_offset >= self.COMPACT_BYTES:
+                    self._compact()
+            except OSError as e:
+                # The patch is already durable in the log; compaction is retried on the next one
+                print(f"Failed to compact {self.log_path}: {e}")
+            self._disk_key = self._stat_key()
+            return self._revision
+
+    def _refresh(self):
+        """Catch up with the files, reading only the log's new tail if that is all that changed"""
+        key = self._stat_key()
+        if key == self._disk_key and self._state is not None:
+            return
+        if (self._state is not None and self._disk_key is not None and key[0] == self._disk_key[0]
+                and key[1] is not None and key[1][1] >= self._log_offset):
+            self._read_log()
+        else:
+            self._load()
+        self._disk_key = key
+
+    def _load(self):
+        state, revision, updated = {}, 0, None
+        try:
+            snapshot = json.loads(self.snapshot_path.read_bytes())
+            state, revision, updated = snapshot["state"], snapshot["revision"], snapshot.get("updated")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable {self.snapshot_path}: {e}")
+
+        self._state, self._revision, self._updated = state, revision, updated
+        self._log_entries = 0
+        self._log_offset = 0
+        self._read_log()
+
+    def _read_log(self):
+        """Apply the complete log lines past _log_offset"""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Torn final line from a crash mid-append
+                        break
+                    self._log_offset += len(line)
+                    self._log_entries += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("base") != self._revision:
+                        continue
+                    try:
+                        state = apply_patch(self._state, entry["ops"])
+                    except (JsonPatchError, KeyError):
+                        continue
+                    self._state, self._revision, self._updated = state, entry["revision"], entry["updated"]
+        except FileNotFoundError:
+            pass
+
+    def _compact(self):
+        """Write the state as a snapshot and empty the log; caller holds both locks"""
+        # Rebuild from disk so lines appended by other processes are kept
+        self._load()
+        body = json.dumps({
+            "revision": self._revision,
+            "updated": self._updated,
+            "state": self._state
+        }, separators=(',', ':')).encode('utf-8')
+
+        directory = self.snapshot_path.parent
+        fd, temp_name = tempfile.mkstemp(suffix='.json', dir=str(directory))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(body)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_name, self.snapshot_path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        # Only after the snapshot is durable; lines left by a crash here
+        # are skipped on replay because their base revision is too old
+        with open(self.log_path, 'wb') as f:
+            os.fsync(f.fileno())
+        self._log_entries = 0
+        self._log_offset = 0
+
+    def _drop_torn_tail(self):
+        """Cut a partial last line left by a crash, so appends start on a fresh line"""
+        try:
+            with open(self.log_path, 'r+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size == 0:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b'\n':
+                    return
+                f.seek(0)
+                data = f.read()
+                f.truncate(data.rfind(b'\n') + 1)
+        except FileNotFoundError:
+            pass
+
+    def _stat_key(self):
+        key = []
+        for path in (self.snapshot_path, self.log_path):
+            try:
+                stat = path.stat()
+                key.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                key.append(None)
+        return tuple(key)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Serialize patches and compaction across worker processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
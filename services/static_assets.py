@@ -0,0 +1,130 @@
+"""
+Static Asset Service for WarmbOS
+Serves files with content-hash ETags, long-lived caching for hashed URLs
+and precompressed variants
+"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from werkzeug.security import safe_join
+
+from utils.http_utils import ENCODINGS, compress, file_etag, send_precompressed
+
+class StaticAssets:
+    """Conditional, compressed serving for one directory tree
+
+    A request whose ?v= matches the file's content hash is a hashed URL and
+    is cached as immutable; anything else is revalidated by ETag. SVG, JS,
+    CSS and JSON files are served from .br/.gz siblings when present, or
+    from variants compressed once into CACHE_DIR keyed by content hash.
+    With a resizer attached, a requested size serves a scaled variant.
+    """
+
+    CACHE_DIR = Path(".static-cache")
+    COMPRESSIBLE = {'.svg', '.js', '.css', '.json'}
+    MIN_COMPRESS_SIZE = 512
+    IMMUTABLE_MAX_AGE = 31536000
+
+    def __init__(self, root, max_age=0, resizer=None):
+        self.root = Path(root)
+        self.max_age = max_age
+        self.resizer = resizer
+        self._compress_lock = threading.Lock()
+
+    def resolve(self, filename):
+        """Path of a file under root, or None if missing or outside it"""
+        joined = safe_join(str(self.root), filename)
+        if joined is None or not os.path.isfile(joined):
+            return None
+        return Path(joined)
+
+    def send(self, filename, version=None, size=None):
+        """Response for a file; callers handle None (not found)"""
+        path = self.resolve(filename)
+        if path is None:
+            return None
+
+        etag = file_etag(path)
+        # ?v= names the source file; its resized variants are derived from it
+        immutable = version is not None and version == etag
+        if size is not None and self.resizer is not None:
+            resized = self.resizer.resize(path, etag, size)
+            if resized is not None:
+                path, etag = resized
+        return send_precompressed(
+            path,
+            etag=etag,
+            max_age=self.IMMUTABLE_MAX_AGE if immutable else self.max_age,
+            immutable=immutable,
+            variants=self._variants(path, etag)
+        )
+
+    def warm(self, subdirectories=('',)):
+        """Precompute ETags and compressed variants for every file"""
+        count = 0
+        for subdirectory in subdirectories:
+            base = self.root / subdirectory
+            if not base.is_dir():
+                continue
+            for directory, _dirs, files in os.walk(base):
+                for name in files:
+                    path = Path(directory) / name
+                    if name.endswith(tuple(suffix for _encoding, suffix in ENCODINGS)):
+                        continue
+                    try:
+                        self._variants(path, file_etag(path))
+                        count += 1
+                    except OSError:
+                        continue
+        print(f"Warmed static cache for {count} files under {self.root}")
+
+    def warm_in_background(self, subdirectories=('',)):
+        thread = threading.Thread(target=self.warm, args=(subdirectories,))
+        thread.daemon = True
+        thread.start()
+
+    def _variants(self, path, etag):
+        """Compressed variants of a file, creating cached ones on first use"""
+        if path.suffix.lower() not in self.COMPRESSIBLE:
+            return {}
+
+        variants = {}
+        for encoding, suffix in ENCODINGS:
+            sibling = path.with_name(path.name + suffix)
+            if sibling.exists():
+                variants[encoding] = sibling
+
+        if len(variants) == len(ENCODINGS) or path.stat().st_size < self.MIN_COMPRESS_SIZE:
+            return variants
+
+        for encoding, suffix in ENCODINGS:
+            if encoding in variants:
+                continue
+            cached = self.CACHE_DIR / f"{etag}{path.suffix.lower()}{suffix}"
+            if not cached.exists():
+                self._write_variant(path, encoding, cached)
+            if cached.exists():
+                variants[encoding] = cached
+        return variants
+
+    def _write_variant(self, path, encoding, cached):
+        with self._compress_lock:
+            if cached.exists():
+                return
+            compressed = compress(path.read_bytes(), encoding)
+            if compressed is None:
+                return
+            self.CACHE_DIR.mkdir(exist_ok=True)
+            # A temp file of its own, since other workers may compress the same file
+            fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=str(self.CACHE_DIR))
+            try:
+                with os.fdopen(fd, 'wb') as temp_file:
+                    temp_file.write(compressed)
+                os.replace(temp_name, cached)
+            except BaseException:
+                if os.path.exists(temp_name):
+                    os.remove(temp_name)
+                raise
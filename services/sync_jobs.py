@@ -0,0 +1,373 @@
+"""
+Sync Job Scheduler for WarmbOS
+Runs icon syncs one at a time as jobs with IDs, progress and cancellation
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FINISHED_STATES = ('complete', 'error', 'cancelled')
+
+class SyncCancelled(Exception):
+    """Raised inside a running job once it has been asked to stop"""
+
+class SyncJob:
+    """State of one sync run, updated by the process running it
+
+    Every change bumps `version` and is handed to on_change, which the
+    scheduler uses to publish the job to other worker processes.
+    Byte-level reports are throttled to REPORT_INTERVAL unless the phase
+    changes. cancel_check, when given, is polled every
+    CANCEL_CHECK_INTERVAL for a cancel requested by another process.
+    """
+
+    REPORT_INTERVAL = 0.25
+    CANCEL_CHECK_INTERVAL = 0.5
+    FINISHED = FINISHED_STATES
+
+    def __init__(self, delta=True, on_change=None, cancel_check=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.delta = delta
+        self.state = 'queued'
+        self.phase = 'queued'
+        self.progress = 0
+        self.message = 'Waiting to start...'
+        self.bytes_done = 0
+        self.bytes_total = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self._on_change = on_change
+        self._cancel_check = cancel_check
+        self._cancel = threading.Event()
+        self._changed = threading.RLock()
+        self._last_report = 0
+        self._last_cancel_check = 0
+
+    @property
+    def done(self):
+        return self.state in self.FINISHED
+
+    @property
+    def cancel_requested(self):
+        if self._cancel.is_set():
+            return True
+        now = time.monotonic()
+        if self._cancel_check is not None and now - self._last_cancel_check >= self.CANCEL_CHECK_INTERVAL:
+            self._last_cancel_check = now
+            if self._cancel_check():
+                self._cancel.set()
+        return self._cancel.is_set()
+
+    def start(self):
+        """Move from queued to running; False if the job was cancelled first"""
+        self._last_cancel_check = 0
+        if self.cancel_requested:
+            self.finish('cancelled', 'Sync cancelled')
+            return False
+        with self._changed:
+            if self.state != 'queued':
+                return False
+            self._set(state='running', phase='starting', message='Starting...', started=time.time())
+            return True
+
+    def report(self, phase, progress, message, bytes_done=None, bytes_total=None):
+        """Record progress; byte counters within one phase are throttled"""
+        now = time.monotonic()
+        if phase == self.phase and bytes_done is not None and now - self._last_report < self.REPORT_INTERVAL:
+            return
+        self._last_report = now
+        self._set(
+            phase=phase,
+            progress=round(progress, 1),
+            message=message,
+            bytes_done=bytes_done or 0,
+            bytes_total=bytes_total
+        )
+
+    def finish(self, state, message):
+        """Record the outcome; the first call wins"""
+        with self._changed:
+            if self.done:
+                return
+            progress = 100 if state == 'complete' else self.progress
+            self._set(state=state, phase=state, progress=progress, message=message, finished=time.time())
+
+    def cancel(self):
+        """Ask the job to stop; a queued job stops at once"""
+        self._cancel.set()
+        with self._changed:
+            if self.state == 'queued':
+                self.finish('cancelled', 'Sync cancelled')
+
+    def raise_if_cancelled(self):
+        if self.cancel_requested:
+            raise SyncCancelled()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "phase": self.phase,
+            "progress": self.progress,
+            "message": self.message,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "delta": self.delta,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "version": self.version
+        }
+
+    def _set(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            if self._on_change is not None:
+                self._on_change(self)
+
+class SyncScheduler:
+    """Runs sync jobs one at a time, with their state shared by every process
+
+    Jobs are recorded in a JSON file in state_dir, next to the icon sync
+    lock, and every change is written through under an flock. Any worker
+    can therefore answer status, stream and cancel requests, and a request
+    made while a job is queued or running anywhere gets that job back
+    instead of starting another, so repeated clicks collapse into one
+    sync. The job runs in the process that accepted it; a job whose
+    process has died is reported as failed. Finished jobs are kept for a
+    while so their status can still be read.
+
+    Jobs must only be submitted from serving processes: a job accepted
+    before a fork would be recorded as running in a process whose worker
+    thread the children do not have.
+    """
+
+    HISTORY_SIZE = 20
+    KEEPALIVE = 15
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, run, state_dir):
+        self.run = run
+        self.state_dir = Path(state_dir)
+        self.state_path = self.state_dir / "sync-jobs.json"
+        self.lock_path = self.state_dir / "sync-jobs.lock"
+        self._lock = threading.Condition()
+        self._local = {}
+        self._queue = []
+        self._worker = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def submit(self, delta=True):
+        """Return (job dict, created): the active job, or a newly queued one"""
+        with self._file_lock():
+            state = self._read()
+            active = self._find(state, state["active"])
+            if active is not None and active["state"] not in FINISHED_STATES:
+                if self._owner_alive(active):
+                    return self._public(active), False
+                self._mark_orphaned(active)
+
+            job = SyncJob(delta=delta, on_change=self._save_job, cancel_check=lambda: self._cancel_recorded(job.id))
+            state["jobs"].append(self._record(job))
+            state["active"] = job.id
+            self._write(state)
+
+        with self._lock:
+            self._local[job.id] = job
+            self._queue.append(job)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work)
+                self._worker.daemon = True
+                self._worker.start()
+            self._lock.notify()
+        return job.to_dict(), True
+
+    def get(self, job_id):
+        """A job's state as a dict, or None"""
+        record = self._find(self._read(), job_id)
+        if record is None:
+            return None
+        if record["state"] not in FINISHED_STATES and not self._owner_alive(record):
+            self._mark_orphaned(record)
+        return self._public(record)
+
+    def latest(self):
+        """The active job, or the most recently finished one"""
+        state = self._read()
+        active = state["active"] or (state["jobs"][-1]["id"] if state["jobs"] else None)
+        return self.get(active) if active else None
+
+    def cancel(self, job_id):
+        """Ask a job to stop, wherever it runs; returns its state or None"""
+        with self._file_lock():
+            state = self._read()
+            record = self._find(state, job_id)
+            if record is None:
+                return None
+            if record["state"] not in FINISHED_STATES:
+                record["cancel_requested"] = True
+                if record["state"] == 'queued':
+                    record.update(state='cancelled', phase='cancelled', message='Sync cancelled',
+                                  finished=time.time(), version=record["version"] + 1)
+                self._write(state)
+
+        job = self._local.get(job_id)
+        if job is not None:
+            job.cancel()
+        return self.get(job_id)
+
+    def stream(self, job_id):
+        """Generator of SSE frames with the job's state until it finishes"""
+        version = None
+        last_sent = time.monotonic()
+        yield "retry: 3000\n\n"
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            now = time.monotonic()
+            if job["version"] != version:
+                version = job["version"]
+                last_sent = now
+                event = 'done' if job["state"] in FINISHED_STATES else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(job, separators=(',', ':'))}\n\n"
+                if event == 'done':
+                    return
+            elif now - last_sent >= self.KEEPALIVE:
+                last_sent = now
+                yield ": keepalive\n\n"
+            time.sleep(self.POLL_INTERVAL)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: self._queue)
+                job = self._queue.pop(0)
+
+            try:
+                if not job.start():
+                    continue
+                self.run(job)
+            except SyncCancelled:
+                job.finish('cancelled', 'Sync cancelled')
+            except Exception as e:
+                job.finish('error', f"Sync failed: {e}")
+            else:
+                job.finish('complete', 'Icons synchronized successfully!')
+            finally:
+                self._local.pop(job.id, None)
+
+    def _save_job(self, job):
+        """Publish a local job's change, keeping a cancel request made elsewhere"""
+        try:
+            with self._file_lock():
+                state = self._read()
+                record = self._record(job)
+                existing = self._find(state, job.id)
+                if existing is not None:
+                    record["cancel_requested"] = record["cancel_requested"] or existing.get("cancel_requested", False)
+                    state["jobs"][state["jobs"].index(existing)] = record
+                else:
+                    state["jobs"].append(record)
+                self._write(state)
+        except OSError as e:
+            print(f"Failed to record sync job {job.id}: {e}")
+
+    def _cancel_recorded(self, job_id):
+        record = self._find(self._read(), job_id)
+        return bool(record and record.get("cancel_requested"))
+
+    def _record(self, job):
+        record = job.to_dict()
+        record["owner"] = os.getpid()
+        record["cancel_requested"] = job._cancel.is_set()
+        return record
+
+    def _public(self, record):
+        return {key: value for key, value in record.items() if key not in ("owner", "cancel_requested")}
+
+    def _owner_alive(self, record):
+        owner = record.get("owner")
+        if owner == os.getpid():
+            return record["id"] in self._local
+        try:
+            os.kill(owner, 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, TypeError):
+            return owner is not None
+        return True
+
+    def _mark_orphaned(self, record):
+        """Report a job whose process exited mid-run as failed"""
+        record.update(state='error', phase='error', message='Sync process exited before finishing',
+                      finished=record.get("finished") or time.time())
+
+    def _find(self, state, job_id):
+        return next((record for record in state["jobs"] if record["id"] == job_id), None)
+
+    def _read(self):
+        try:
+            state = json.loads(self.state_path.read_bytes())
+            if isinstance(state.get("jobs"), list):
+                state.setdefault("active", None)
+                return state
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {"active": None, "jobs": []}
+
+    def _write(self, state):
+        """Atomically replace the job file; caller holds the file lock"""
+        active = state["active"]
+        jobs = state["jobs"]
+        while len(jobs) > self.HISTORY_SIZE:
+            index = next(i for i, record in enumerate(jobs) if record["id"] != active)
+            jobs.pop(index)
+
+        fd, temp_name = tempfile.mkstemp(suffix='.json', dir=str(self.state_dir))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+                json.dump(state, temp_file, separators=(',', ':'))
+            os.replace(temp_name, self.state_path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Serialize job file updates across threads and worker processes"""
+        self.state_dir.mkdir(exist_ok=True)
+        if fcntl is None:
+            with self._lock:
+                yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset_after_fork(self):
+        # The worker thread does not survive a fork; neither do its jobs
+        self._lock = threading.Condition()
+        self._local = {}
+        self._queue = []
+        self._worker = None
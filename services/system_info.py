@@ -0,0 +1,148 @@
+"""
+System Information Collector for WarmbOS
+Keeps a prebuilt system info snapshot refreshed by background threads
+"""
+
+import platform
+import shutil
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+class SystemInfoCollector:
+    """Serves system information from a snapshot with per-field refresh intervals
+
+    OS and Python facts are read once, disk usage and uptime are sampled on a
+    timer, and the FQDN is resolved on its own thread so a slow resolver never
+    blocks a request. Nothing is collected until the first snapshot or the
+    sampler thread needs it, which keeps psutil and platform.processor()
+    (which may run uname) out of startup.
+    """
+
+    VERSION = '1.0.0-dev'
+    SAMPLE_INTERVAL = 1       # server time and uptime
+    DISK_INTERVAL = 10        # disk usage
+    HOSTNAME_INTERVAL = 300   # hostname and FQDN
+
+    def __init__(self, disk_path='.'):
+        self.disk_path = disk_path
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+        self._collect_lock = threading.Lock()
+        self._snapshot = None
+
+    def snapshot(self):
+        """Get the latest system info snapshot"""
+        self.start()
+        self._collect_initial()
+        return self._snapshot
+
+    def start(self):
+        """Start the background refresh threads once"""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            for target in (self._sample_loop, self._resolve_loop):
+                thread = threading.Thread(target=target)
+                thread.daemon = True
+                thread.start()
+            self._started = True
+
+    def stop(self):
+        """Stop the background refresh threads"""
+        self._stop.set()
+
+    def _collect_initial(self):
+        """Take the first snapshot once, from whichever thread needs it first"""
+        if self._snapshot is not None:
+            return
+        with self._collect_lock:
+            if self._snapshot is not None:
+                return
+            import psutil
+
+            self._static = self._collect_static()
+            self._boot_time = psutil.boot_time()
+            self._disk = self._collect_disk()
+            hostname = socket.gethostname()
+            self._network = {'hostname': hostname, 'fqdn': hostname}
+            self._snapshot = self._build_snapshot()
+
+    def _sample_loop(self):
+        """Refresh time, uptime and disk usage"""
+        self._collect_initial()
+        last_disk = time.monotonic()
+        while not self._stop.wait(self.SAMPLE_INTERVAL):
+            try:
+                if time.monotonic() - last_disk >= self.DISK_INTERVAL:
+                    self._disk = self._collect_disk()
+                    last_disk = time.monotonic()
+                self._snapshot = self._build_snapshot()
+            except Exception as e:
+                print(f"System info sample error: {e}")
+
+    def _resolve_loop(self):
+        """Resolve hostname and FQDN off the request path"""
+        self._collect_initial()
+        while True:
+            hostname = socket.gethostname()
+            try:
+                fqdn = socket.getfqdn()
+            except Exception:
+                fqdn = hostname
+            self._network = {'hostname': hostname, 'fqdn': fqdn}
+            self._snapshot = self._build_snapshot()
+
+            if self._stop.wait(self.HOSTNAME_INTERVAL):
+                return
+
+    def _collect_static(self):
+        """Facts that do not change while the process runs"""
+        # Get processor info with fallback
+        processor = platform.processor()
+        if not processor:
+            processor = 'Unknown'
+
+        return {
+            'os': {
+                'system': platform.system(),
+                'release': platform.release(),
+                'version': platform.version(),
+                'machine': platform.machine(),
+                'processor': processor
+            },
+            'python': {
+                'version': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'executable': sys.executable
+            }
+        }
+
+    def _collect_disk(self):
+        """Disk usage for the working directory's filesystem"""
+        total, used, free = shutil.disk_usage(self.disk_path)
+        return {
+            'total_gb': round(total / (1024**3), 1),
+            'used_gb': round(used / (1024**3), 1),
+            'free_gb': round(free / (1024**3), 1),
+            'percent': round((used / total) * 100, 1)
+        }
+
+    def _build_snapshot(self):
+        """Assemble a new snapshot; callers swap it in with one assignment"""
+        uptime = timedelta(seconds=int(time.time() - self._boot_time))
+        return {
+            **self._static,
+            'disk': self._disk,
+            'network': self._network,
+            'warmbos': {
+                'version': self.VERSION,
+                'server_time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+                'uptime': str(uptime)
+            }
+        }
@@ -0,0 +1,263 @@
+"""
+Wallpaper Pipeline for WarmbOS
+Fetches the background image once and serves downscaled, recompressed
+variants per viewport width plus a tiny blurred placeholder
+"""
+
+import base64
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from utils.http_client import FetchError, HttpConnectionPool
+from utils.http_utils import content_hash
+from utils.lazy_imports import optional_module
+
+VARIANT_NAME = re.compile(r'^[0-9a-f]{16}\.(webp|jpg)$')
+
+class WallpaperPipeline:
+    """Downscaled copies of wallpapers, built in the background
+
+    prepare(url) fetches a remote image (or reads a local file under root)
+    and writes one variant per width in WIDTHS that is smaller than the
+    source, plus one at the source width capped to the largest, as WebP
+    when Pillow supports it and as JPEG. Variant files are named by their
+    content hash so they can be cached as immutable. A manifest per
+    wallpaper lists them with a blurred placeholder small enough to inline
+    as a data URI. Only the KEEP_WALLPAPERS most recently built
+    wallpapers are kept.
+
+    Requires Pillow; without it manifest() is always None and the desktop
+    keeps loading the original image.
+    """
+
+    WIDTHS = (640, 1280, 1920, 2560, 3840)
+    DEFAULT_WIDTH = 1920
+    PLACEHOLDER_WIDTH = 32
+    MAX_SOURCE_BYTES = 64 * 1024 * 1024
+    KEEP_WALLPAPERS = 3
+    # A failed build is not retried sooner, since every desktop load asks for it
+    RETRY_AFTER = 300
+    WEBP_QUALITY = 80
+    JPEG_QUALITY = 82
+    USER_AGENT = 'WarmbOS-Wallpaper/1.0'
+
+    def __init__(self, cache_dir, root='.', allow_private=False, timeout=30):
+        self.cache_dir = Path(cache_dir)
+        self.root = Path(root)
+        self.allow_private = allow_private
+        self.pool = HttpConnectionPool(max_per_host=2, timeout=timeout)
+        self._lock = threading.Lock()
+        self._building = set()
+        self._failed = {}
+        self._manifests = {}
+
+    @property
+    def available(self):
+        return optional_module('PIL.Image') is not None
+
+    def manifest(self, url):
+        """The manifest for a wallpaper URL, or None until it has been built"""
+        key = self._key(url)
+        if key is None:
+            return None
+        manifest = self._manifests.get(key)
+        if manifest is not None:
+            return manifest
+        try:
+            manifest = json.loads((self.cache_dir / f"{key}.json").read_bytes())
+        except (OSError, ValueError):
+            return None
+        self._manifests[key] = manifest
+        return manifest
+
+    def prepare(self, url):
+        """Build the variants for url in a background thread unless already done or underway
+
+        Returns False without doing anything for a URL that cannot be
+        built, such as an empty one or a local path that is not a file.
+        """
+        if not self.available or self._key(url) is None or self.manifest(url) is not None:
+            return False
+        with self._lock:
+            if url in self._building or time.monotonic() - self._failed.get(url, -self.RETRY_AFTER) < self.RETRY_AFTER:
+                return False
+            self._building.add(url)
+
+        def run():
+            try:
+                self._build(url)
+            except Exception as e:
+                print(f"Wallpaper processing failed for {url}: {e}")
+                with self._lock:
+                    self._failed[url] = time.monotonic()
+            finally:
+                with self._lock:
+                    self._building.discard(url)
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def choose(self, manifest, width=None, webp=False):
+        """Smallest variant at least width pixels wide (the largest if none is)"""
+        width = width or self.DEFAULT_WIDTH
+        formats = ('webp', 'jpg') if webp else ('jpg',)
+        for image_format in formats:
+            candidates = sorted(
+                (v for v in manifest["variants"] if v["format"] == image_format),
+                key=lambda v: v["width"]
+            )
+            if candidates:
+                return next((v for v in candidates if v["width"] >= width), candidates[-1])
+        return None
+
+    def variant_path(self, name):
+        """Path of a variant file, or None if the name is not one"""
+        if not VARIANT_NAME.match(name):
+            return None
+        path = self.cache_dir / name
+        return path if path.is_file() else None
+
+    def _key(self, url):
+        """Cache key for a wallpaper; local files include mtime and size so edits rebuild"""
+        if not isinstance(url, str) or not url:
+            return None
+        if url.lower().startswith(('http://', 'https://')):
+            return content_hash(url.encode('utf-8'))
+        path = self._local_path(url)
+        if path is None:
+            return None
+        stat = path.stat()
+        return content_hash(f"{url}|{stat.st_mtime_ns}|{stat.st_size}".encode('utf-8'))
+
+    def _local_path(self, url):
+        """A root-relative URL path as a file under root, or None"""
+        if not url.startswith('/') or url.startswith('//'):
+            return None
+        root = self.root.resolve()
+        path = (root / url.split('?', 1)[0].lstrip('/')).resolve()
+        if root not in path.parents or not path.is_file():
+            return None
+        return path
+
+    def _read_source(self, url):
+        if not url.lower().startswith(('http://', 'https://')):
+            path = self._local_path(url)
+            if path is None:
+                raise ValueError("not a local image file")
+            return path.read_bytes()
+
+        headers = {'User-Agent': self.USER_AGENT, 'Accept': 'image/*'}
+        status, _headers, body = self.pool.fetch(url, headers, self.MAX_SOURCE_BYTES, allow_private=self.allow_private)
+        if status != 200:
+            raise FetchError(f"Origin answered {status}")
+        return body
+
+    def _build(self, url):
+        Image = optional_module('PIL.Image')
+        ImageFilter = optional_module('PIL.ImageFilter')
+        ImageOps = optional_module('PIL.ImageOps')
+        features = optional_module('PIL.features')
+
+        start = time.perf_counter()
+        key = self._key(url)
+        source = self._read_source(url)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        with Image.open(io.BytesIO(source)) as opened:
+            image = ImageOps.exif_transpose(opened).convert('RGB')
+        source_width, source_height = image.size
+
+        widths = [w for w in self.WIDTHS if w < source_width]
+        widths.append(min(source_width, self.WIDTHS[-1]))
+        formats = ['jpg']
+        if features is not None and features.check('webp'):
+            formats.insert(0, 'webp')
+
+        variants = []
+        # Largest first, each scaled from the previous one, which is much
+        # faster than resampling the full source every time
+        scaled = image
+        for width in sorted(set(widths), reverse=True):
+            height = max(1, round(source_height * width / source_width))
+            if scaled.size != (width, height):
+                scaled = scaled.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            for image_format in formats:
+                data = self._encode(scaled, image_format)
+                name = f"{content_hash(data)}.{image_format}"
+                self._write_atomic(self.cache_dir / name, data)
+                variants.append({
+                    "width": width,
+                    "height": height,
+                    "format": image_format,
+                    "name": name,
+                    "bytes": len(data)
+                })
+
+        placeholder_height = max(1, round(source_height * self.PLACEHOLDER_WIDTH / source_width))
+        tiny = scaled.resize((self.PLACEHOLDER_WIDTH, placeholder_height), Image.BOX)
+        tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        tiny.save(buffer, 'JPEG', quality=40)
+
+        manifest = {
+            "source": url,
+            "width": source_width,
+            "height": source_height,
+            "source_bytes": len(source),
+            "placeholder": "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode('ascii'),
+            "variants": sorted(variants, key=lambda v: (v["width"], v["format"]))
+        }
+        self._write_atomic(self.cache_dir / f"{key}.json", json.dumps(manifest).encode('utf-8'))
+        self._manifests[key] = manifest
+        self._prune()
+
+        smallest = min(v["bytes"] for v in variants)
+        print(f"Prepared wallpaper {url}: {len(variants)} variants from {len(source) / 1048576:.1f} MB "
+              f"(smallest {smallest / 1024:.0f} KB) in {time.perf_counter() - start:.1f}s")
+        return manifest
+
+    def _encode(self, image, image_format):
+        buffer = io.BytesIO()
+        if image_format == 'webp':
+            image.save(buffer, 'WEBP', quality=self.WEBP_QUALITY, method=4)
+        else:
+            image.save(buffer, 'JPEG', quality=self.JPEG_QUALITY, optimize=True, progressive=True)
+        return buffer.getvalue()
+
+    def _prune(self):
+        """Drop all but the newest manifests and any old variant none of them use
+
+        Recent files are spared because a build in progress writes its
+        variants before its manifest.
+        """
+        manifests = sorted(self.cache_dir.glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+        keep = set()
+        for path in manifests[:self.KEEP_WALLPAPERS]:
+            try:
+                keep.update(v["name"] for v in json.loads(path.read_bytes())["variants"])
+            except (OSError, ValueError, KeyError):
+                continue
+        for path in manifests[self.KEEP_WALLPAPERS:]:
+            self._manifests.pop(path.stem, None)
+            path.unlink(missing_ok=True)
+        cutoff = time.time() - 600
+        for path in self.cache_dir.iterdir():
+            if VARIANT_NAME.match(path.name) and path.name not in keep and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+
+    def _write_atomic(self, path, data):
+        fd, temp_name = tempfile.mkstemp(dir=str(self.cache_dir))
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_name, path)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
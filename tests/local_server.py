@@ -0,0 +1,75 @@
+"""
+Local HTTP origin for WarmbOS tests
+A threaded http.server on 127.0.0.1 whose responses the test controls
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class LocalOrigin:
+    """Serves registered paths and records every request it gets
+
+    routes maps a path to (content type, body); responses carry an ETag
+    and answer If-None-Match with 304. delay slows every response down,
+    so concurrent requests overlap.
+    """
+
+    def __init__(self, delay=0):
+        self.routes = {}
+        self.requests = []
+        self.delay = delay
+        self._lock = threading.Lock()
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with origin._lock:
+                    origin.requests.append((self.path, dict(self.headers)))
+                if origin.delay:
+                    time.sleep(origin.delay)
+                route = origin.routes.get(self.path)
+                if route is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                content_type, body = route
+                etag = f'"{len(body)}-{hash(body) & 0xffffffff:x}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def hits(self, path):
+        """Headers of each request made for path"""
+        with self._lock:
+            return [headers for request_path, headers in self.requests if request_path == path]
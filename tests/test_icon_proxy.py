@@ -0,0 +1,99 @@
+"""
+Icon Proxy tests for WarmbOS
+Cache misses, hits, revalidation, coalescing and eviction against a local origin
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+
+from services.icon_proxy import IconProxy, IconProxyError
+from tests.local_server import LocalOrigin
+
+ICON = b'<svg xmlns="http://www.w3.org/2000/svg"/>'
+
+class IconProxyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.origin = LocalOrigin()
+        self.origin.__enter__()
+        self.addCleanup(self.origin.__exit__)
+        self.proxy = IconProxy(self.cache_dir.name, allow_private=True, timeout=5)
+
+    def test_miss_then_hit_then_revalidate(self):
+        self.origin.routes['/a.svg'] = ('image/svg+xml', ICON)
+        url = self.origin.url('/a.svg')
+
+        key, meta = self.proxy.fetch(url)
+        self.assertEqual(meta["content_type"], 'image/svg+xml')
+        with open(os.path.join(self.cache_dir.name, f"{key}.bin"), 'rb') as f:
+            self.assertEqual(f.read(), ICON)
+        self.assertEqual(len(self.origin.hits('/a.svg')), 1)
+
+        # Fresh copy: served without contacting the origin
+        self.proxy.fetch(url)
+        self.assertEqual(len(self.origin.hits('/a.svg')), 1)
+
+        # Stale copy: conditional GET, answered 304, body kept
+        self.proxy.REVALIDATE_AFTER = 0
+        _key, revalidated = self.proxy.fetch(url)
+        hits = self.origin.hits('/a.svg')
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(hits[1].get('If-None-Match'), meta["etag"])
+        self.assertEqual(revalidated["hash"], meta["hash"])
+        self.assertGreaterEqual(revalidated["checked"], meta["checked"])
+
+    def test_concurrent_misses_share_one_fetch(self):
+        self.origin.delay = 0.3
+        self.origin.routes['/slow.svg'] = ('image/svg+xml', ICON)
+        url = self.origin.url('/slow.svg')
+        results = []
+        start = threading.Barrier(8)
+
+        def fetch():
+            start.wait()
+            results.append(self.proxy.fetch(url)[1]["hash"])
+
+        threads = [threading.Thread(target=fetch) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(self.origin.hits('/slow.svg')), 1)
+
+    def test_least_recently_served_icon_is_evicted(self):
+        body = b'x' * 1000
+        for name in ('a', 'b', 'c'):
+            self.origin.routes[f'/{name}.png'] = ('image/png', body)
+        self.proxy.max_bytes = 2500
+
+        key_a, _meta = self.proxy.fetch(self.origin.url('/a.png'))
+        key_b, _meta = self.proxy.fetch(self.origin.url('/b.png'))
+        self.proxy.fetch(self.origin.url('/a.png'))
+        key_c, _meta = self.proxy.fetch(self.origin.url('/c.png'))
+
+        cached = {name[:-4] for name in os.listdir(self.cache_dir.name) if name.endswith('.bin')}
+        self.assertEqual(cached, {key_a, key_c})
+        self.assertNotIn(key_b, cached)
+
+    def test_non_image_is_refused(self):
+        self.origin.routes['/page'] = ('text/html', b'<html></html>')
+        with self.assertRaises(IconProxyError) as raised:
+            self.proxy.fetch(self.origin.url('/page'))
+        self.assertEqual(raised.exception.status, 502)
+
+    def test_private_address_is_refused_by_default(self):
+        proxy = IconProxy(self.cache_dir.name)
+        with self.assertRaises(IconProxyError) as raised:
+            proxy.fetch(self.origin.url('/a.svg'))
+        self.assertEqual(raised.exception.status, 403)
+        self.assertEqual(self.origin.requests, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Wallpaper Pipeline tests for WarmbOS
+Variants and placeholder built from an image served by a local origin
+"""
+
+import base64
+import io
+import tempfile
+import time
+import unittest
+
+from services.wallpaper_pipeline import WallpaperPipeline
+from tests.local_server import LocalOrigin
+from utils.lazy_imports import optional_module
+
+Image = optional_module('PIL.Image')
+features = optional_module('PIL.features')
+
+def sample_jpeg(width, height):
+    image = Image.new('RGB', (width, height))
+    for x in range(0, width, 50):
+        image.paste((x % 256, 80, 160), (x, 0, min(x + 50, width), height))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+@unittest.skipUnless(Image is not None, "Pillow is not installed")
+class WallpaperPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.origin = LocalOrigin()
+        self.origin.__enter__()
+        self.addCleanup(self.origin.__exit__)
+        self.pipeline = WallpaperPipeline(self.cache_dir.name, allow_private=True, timeout=5)
+
+    def wait_for_manifest(self, url, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            manifest = self.pipeline.manifest(url)
+            if manifest is not None:
+                return manifest
+            time.sleep(0.05)
+        self.fail(f"No manifest for {url} after {timeout}s")
+
+    def test_builds_variants_and_placeholder(self):
+        self.origin.routes['/wall.jpg'] = ('image/jpeg', sample_jpeg(3000, 1500))
+        url = self.origin.url('/wall.jpg')
+
+        self.assertTrue(self.pipeline.prepare(url))
+        manifest = self.wait_for_manifest(url)
+        self.assertEqual((manifest["width"], manifest["height"]), (3000, 1500))
+
+        formats = {'jpg', 'webp'} if features.check('webp') else {'jpg'}
+        widths = [640, 1280, 1920, 2560, 3000]
+        self.assertEqual(
+            sorted((v["width"], v["format"]) for v in manifest["variants"]),
+            sorted((w, f) for w in widths for f in formats)
+        )
+        for variant in manifest["variants"]:
+            self.assertEqual(variant["height"], variant["width"] // 2)
+            path = self.pipeline.variant_path(variant["name"])
+            self.assertIsNotNone(path)
+            with Image.open(path) as image:
+                self.assertEqual(image.size, (variant["width"], variant["height"]))
+
+        prefix = 'data:image/jpeg;base64,'
+        self.assertTrue(manifest["placeholder"].startswith(prefix))
+        placeholder = base64.b64decode(manifest["placeholder"][len(prefix):])
+        with Image.open(io.BytesIO(placeholder)) as image:
+            self.assertEqual(image.size, (WallpaperPipeline.PLACEHOLDER_WIDTH, 16))
+
+        # Fetched once; a second prepare is a no-op
+        self.assertFalse(self.pipeline.prepare(url))
+        self.assertEqual(len(self.origin.hits('/wall.jpg')), 1)
+
+    def test_choose_picks_smallest_covering_variant(self):
+        self.origin.routes['/wall.jpg'] = ('image/jpeg', sample_jpeg(2000, 1000))
+        url = self.origin.url('/wall.jpg')
+        self.pipeline.prepare(url)
+        manifest = self.wait_for_manifest(url)
+
+        self.assertEqual(self.pipeline.choose(manifest, 1000)["width"], 1280)
+        self.assertEqual(self.pipeline.choose(manifest, 5000)["width"], 2000)
+        self.assertEqual(self.pipeline.choose(manifest, 640, webp=False)["format"], 'jpg')
+
+    def test_unbuildable_urls_are_not_prepared(self):
+        for url in ('', None, '/missing-wallpaper.jpg'):
+            self.assertFalse(self.pipeline.prepare(url))
+            self.assertIsNone(self.pipeline.manifest(url))
+
+    def test_failed_fetch_builds_nothing(self):
+        url = self.origin.url('/missing.jpg')
+        self.assertTrue(self.pipeline.prepare(url))
+        deadline = time.monotonic() + 10
+        while url in self.pipeline._building and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIsNone(self.pipeline.manifest(url))
+        # Not retried before RETRY_AFTER
+        self.assertFalse(self.pipeline.prepare(url))
+
+if __name__ == '__main__':
+    unittest.main()
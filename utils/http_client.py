@@ -0,0 +1,136 @@
+"""
+HTTP client utilities for WarmbOS
+Pooled keep-alive connections for fetching remote icons and wallpapers
+"""
+
+import ipaddress
+import socket
+import threading
+from urllib.parse import urljoin, urlsplit
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+class FetchError(Exception):
+    """Raised when a remote resource cannot be fetched; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+def check_public_address(url):
+    """Resolve url's host and return an address to connect to
+
+    Refuses hosts with any address on a private network, so a fetch
+    cannot reach internal services. Connecting to the returned address,
+    rather than resolving the name again, keeps a DNS answer that changes
+    between the check and the connection from slipping past it.
+    """
+    parts = urlsplit(url)
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, parts.port or 443, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise FetchError(f"Cannot resolve {parts.hostname}: {e}") from None
+    for address in addresses:
+        if not ipaddress.ip_address(address[4][0].split('%')[0]).is_global:
+            raise FetchError(f"Refusing to fetch from {parts.hostname}: not a public address", 403)
+    return addresses[0][4][0]
+
+class HttpConnectionPool:
+    """Keep-alive HTTP(S) connections reused across fetches, a few per host"""
+
+    def __init__(self, max_per_host=4, timeout=10):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, url, headers, max_bytes, max_redirects=3, allow_private=False):
+        """GET following redirects; returns (status, headers, body)
+
+        Every hop must be http(s) and, unless allow_private, resolve to a
+        public address, which is then the one connected to.
+        """
+        for _hop in range(max_redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                raise FetchError("url must be an absolute http(s) URL", 400)
+            address = None if allow_private else check_public_address(url)
+            status, response_headers, body = self.get(url, headers, max_bytes, address)
+            location = response_headers.get('Location')
+            if status not in REDIRECT_STATUSES or not location:
+                return status, response_headers, body
+            url = urljoin(url, location)
+        raise FetchError("Too many redirects")
+
+    def get(self, url, headers, max_bytes, address=None):
+        """GET url and return (status, headers, body), refusing bodies over max_bytes
+
+        With address, connect there instead of resolving the host; the
+        Host header and TLS server name still use the host.
+        """
+        # Imported here so processes that never fetch skip loading ssl
+        import http.client
+
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port, address)
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        conn, reused = self._checkout(key)
+        try:
+            try:
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection; retry once on a new one
+                conn.close()
+                if not reused:
+                    raise
+                conn = self._connect(key)
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+
+            body = response.read(max_bytes + 1)
+            if len(body) > max_bytes:
+                conn.close()
+                raise FetchError(f"Response is larger than {max_bytes} bytes")
+            if response.will_close or not response.isclosed():
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            return response.status, response.headers, body
+        except http.client.HTTPException as e:
+            conn.close()
+            raise FetchError(f"Bad response from {parts.hostname}: {e!r}") from None
+        except BaseException:
+            conn.close()
+            raise
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._connect(key), False
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _connect(self, key):
+        import http.client
+
+        scheme, host, port, address = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        if address is not None:
+            # connect() passes (host, port) here; swap in the checked address
+            conn._create_connection = (
+                lambda target, timeout, source_address: socket.create_connection((address, target[1]), timeout, source_address)
+            )
+        return conn
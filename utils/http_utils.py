@@ -0,0 +1,115 @@
+"""
+HTTP utilities for WarmbOS
+Handles content-hash ETags and precompressed file variants
+"""
+
+import gzip
+import hashlib
+import mimetypes
+from pathlib import Path
+
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Client encoding name -> file suffix, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+_etag_cache = {}
+
+def content_hash(data, length=16):
+    """Short hex digest used for ETags and hashed filenames"""
+    return hashlib.sha256(data).hexdigest()[:length]
+
+def file_etag(path):
+    """Content-hash ETag for a file, cached by mtime and size"""
+    path = Path(path)
+    stat = path.stat()
+    key = str(path)
+    cached = _etag_cache.get(key)
+    if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+
+    with open(path, 'rb') as f:
+        etag = content_hash(f.read())
+    _etag_cache[key] = ((stat.st_mtime_ns, stat.st_size), etag)
+    return etag
+
+def write_precompressed(path, data):
+    """Write data plus .gz (and .br when brotli is installed) siblings"""
+    path = Path(path)
+    path.write_bytes(data)
+    for encoding, suffix in ENCODINGS:
+        compressed = compress(data, encoding)
+        if compressed is not None:
+            path.with_name(path.name + suffix).write_bytes(compressed)
+
+def compress(data, encoding):
+    """Compress data for an encoding, or None if no encoder is available"""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data)
+    return None
+
+def send_precompressed(path, etag=None, max_age=0, immutable=False, variants=None):
+    """Send a file, preferring a precompressed variant the client accepts
+
+    variants maps encoding names to files; by default .br/.gz siblings of
+    path are used. Answers If-None-Match with 304 using a content-hash ETag.
+    """
+    path = Path(path)
+    etag = etag or file_etag(path)
+    mimetype = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+    if variants is None:
+        variants = {}
+        for name, suffix in ENCODINGS:
+            candidate = path.with_name(path.name + suffix)
+            if candidate.exists():
+                variants[name] = candidate
+
+    chosen, encoding = path, None
+    for name, _suffix in ENCODINGS:
+        if request.accept_encodings[name] and name in variants:
+            chosen, encoding = variants[name], name
+            break
+
+    # Encoded variants are different representations and need their own tag
+    variant_etag = f"{etag}-{encoding}" if encoding else etag
+
+    response = send_file(chosen, mimetype=mimetype, etag=variant_etag, conditional=True,
+                         download_name=path.name)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    # max_age 0 means always revalidate; otherwise let the client reuse it
+    response.cache_control.no_cache = None if max_age else True
+    return response
+
+def send_precompressed_bytes(data, mimetype, etag, variants=None, max_age=0, immutable=False):
+    """Like send_precompressed, for a body and encoded variants held in memory"""
+    body, encoding = data, None
+    for name, _suffix in ENCODINGS:
+        if request.accept_encodings[name] and variants and name in variants:
+            body, encoding = variants[name], name
+            break
+
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    response.cache_control.no_cache = None if max_age else True
+    return response.make_conditional(request)
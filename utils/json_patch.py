@@ -0,0 +1,115 @@
+"""
+JSON Patch utilities for WarmbOS
+Applies RFC 6902 patches (add, remove, replace, move, copy, test)
+"""
+
+import copy
+import re
+
+# RFC 6901 array index: ASCII digits without leading zeros
+ARRAY_INDEX = re.compile(r'0|[1-9][0-9]*')
+
+class JsonPatchError(ValueError):
+    """Raised for a malformed patch or one that does not fit the document"""
+
+def parse_pointer(pointer):
+    """Split an RFC 6901 JSON pointer into unescaped reference tokens"""
+    if pointer == '':
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise JsonPatchError(f"invalid JSON pointer: {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def _array_index(container, token, allow_end=False):
+    if token == '-' and allow_end:
+        return len(container)
+    if not ARRAY_INDEX.fullmatch(token):
+        raise JsonPatchError(f"invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"array index out of range: {index}")
+    return index
+
+def _resolve(document, tokens):
+    """The value a list of tokens points at"""
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise JsonPatchError(f"path not found: /{'/'.join(tokens)}")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_array_index(value, token)]
+        else:
+            raise JsonPatchError(f"path not found: /{'/'.join(tokens)}")
+    return value
+
+def _add(document, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, tokens[-1], allow_end=True), value)
+    else:
+        raise JsonPatchError(f"cannot add to a {type(parent).__name__}")
+    return document
+
+def _remove(document, tokens):
+    if not tokens:
+        raise JsonPatchError("cannot remove the whole document")
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise JsonPatchError(f"path not found: /{'/'.join(tokens)}")
+        return document, parent.pop(tokens[-1])
+    if isinstance(parent, list):
+        return document, parent.pop(_array_index(parent, tokens[-1]))
+    raise JsonPatchError(f"cannot remove from a {type(parent).__name__}")
+
+def apply_patch(document, operations):
+    """Return a patched copy of document; the original is left untouched
+
+    Operations are applied in order and the patch is atomic: any failing
+    operation, including a failed test, raises JsonPatchError.
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("a patch must be a list of operations")
+
+    document = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+            raise JsonPatchError(f"invalid operation: {operation!r}")
+        op = operation['op']
+        tokens = parse_pointer(operation['path'])
+
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise JsonPatchError(f"{op} needs a value")
+        if op in ('move', 'copy') and 'from' not in operation:
+            raise JsonPatchError(f"{op} needs a from path")
+
+        if op == 'add':
+            document = _add(document, tokens, copy.deepcopy(operation['value']))
+        elif op == 'remove':
+            document, _value = _remove(document, tokens)
+        elif op == 'replace':
+            if tokens:
+                _resolve(document, tokens)
+                document, _value = _remove(document, tokens)
+            document = _add(document, tokens, copy.deepcopy(operation['value']))
+        elif op == 'move':
+            source = parse_pointer(operation['from'])
+            if tokens[:len(source)] == source and tokens != source:
+                raise JsonPatchError("cannot move a value into itself")
+            document, value = _remove(document, source)
+            document = _add(document, tokens, value)
+        elif op == 'copy':
+            value = copy.deepcopy(_resolve(document, parse_pointer(operation['from'])))
+            document = _add(document, tokens, value)
+        elif op == 'test':
+            if _resolve(document, tokens) != operation['value']:
+                raise JsonPatchError(f"test failed at {operation['path']}")
+        else:
+            raise JsonPatchError(f"unknown operation: {op!r}")
+    return document
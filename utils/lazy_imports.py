@@ -0,0 +1,25 @@
+"""
+Lazy Imports for WarmbOS
+Defers heavy optional modules until the code that needs them first runs
+"""
+
+import importlib
+
+_modules = {}
+
+def optional_module(name):
+    """Import a module on first use; None if it is not installed
+    
+    Keeps Pillow and friends out of startup for processes that never
+    resize or bundle an icon. Later calls are a dict lookup.
+    """
+    try:
+        return _modules[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _modules[name] = module
+    return module
@@ -0,0 +1,157 @@
+"""
+Minification utilities for WarmbOS
+Conservative JS and CSS minifiers for the frontend bundle
+"""
+
+import re
+
+# A '/' after one of these starts a regex literal rather than a division
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await'
+}
+
+def _skip_string(source, i, quote):
+    """Index just past the string literal starting at i"""
+    i += 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == quote:
+            return i + 1
+        i += 1
+    return i
+
+def _skip_regex(source, i):
+    """Index just past the regex literal (with flags) starting at i"""
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '\n':
+            break
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(source) and (source[i].isalnum() or source[i] == '_'):
+        i += 1
+    return i
+
+def _starts_regex(output):
+    """Whether a '/' following the emitted output begins a regex literal"""
+    text = ''.join(output[-3:]).rstrip()
+    if not text:
+        return True
+    if text[-1] in REGEX_PRECEDERS:
+        return True
+    match = re.search(r'[A-Za-z_$][\w$]*$', ''.join(output[-20:]).rstrip())
+    return bool(match) and match.group(0) in REGEX_KEYWORDS
+
+def minify_js(source):
+    """Strip comments, indentation, blank lines and repeated spaces
+
+    Line breaks between statements are kept, so automatic semicolon
+    insertion behaves exactly as in the original. Strings, template
+    literals (including ${} expressions) and regex literals are copied
+    unchanged.
+    """
+    output = []
+    # One entry per open template literal: brace depth of its ${} expression
+    templates = []
+    i = 0
+    length = len(source)
+
+    def emit_space(text):
+        """Collapse whitespace to one newline or one space"""
+        if not output or output[-1] in ('\n', ' '):
+            if text == '\n' and output and output[-1] == ' ':
+                output[-1] = '\n'
+            return
+        output.append(text)
+
+    while i < length:
+        char = source[i]
+
+        if char in ' \t\r':
+            emit_space(' ')
+            i += 1
+        elif char == '\n':
+            emit_space('\n')
+            i += 1
+        elif char in '\'"':
+            end = _skip_string(source, i, char)
+            output.append(source[i:end])
+            i = end
+        elif char == '`' or (char == '}' and templates and templates[-1] == 0):
+            # Template text runs until the closing backtick or the next ${
+            if char == '}':
+                templates.pop()
+            j = i + 1
+            while j < length:
+                if source[j] == '\\':
+                    j += 2
+                    continue
+                if source[j] == '`':
+                    j += 1
+                    break
+                if source.startswith('${', j):
+                    j += 2
+                    templates.append(0)
+                    break
+                j += 1
+            output.append(source[i:j])
+            i = j
+        elif char == '/' and source.startswith('//', i):
+            end = source.find('\n', i)
+            i = length if end == -1 else end
+        elif char == '/' and source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+            emit_space('\n' if '\n' in source[i:end] else ' ')
+            i = end
+        elif char == '/' and _starts_regex(output):
+            end = _skip_regex(source, i)
+            output.append(source[i:end])
+            i = end
+        else:
+            if templates and char == '{':
+                templates[-1] += 1
+            elif templates and char == '}':
+                templates[-1] -= 1
+            if output and output[-1] == ' ' and char in '(){}[];,:=' and len(output) > 1 \
+                    and output[-2][-1:] in '(){}[];,:=':
+                output.pop()
+            output.append(char)
+            i += 1
+
+    return ''.join(output).strip() + '\n'
+
+def minify_css(source):
+    """Strip comments, indentation and blank lines, keeping strings intact"""
+    output = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char in '\'"':
+            end = _skip_string(source, i, char)
+            output.append(source[i:end])
+            i = end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+        else:
+            output.append(char)
+            i += 1
+
+    lines = (line.strip() for line in ''.join(output).splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'